@@ -6,6 +6,44 @@ CLAUDE_CONFIG = {
     "temperature": 0.7,
     "top_p": 0.95,
     "context_window": 100000,
+    "best_of": 1,  # Candidates sampled per generate_code call (first valid wins)
+    "constrained_decoding": False,  # Mask tokens that break Python syntax while decoding
+    "refactor_mode": "auto",     # "edit", "chunked", "rewrite" or "auto"
+    "edit_mode_min_lines": 200,  # "auto" uses edit hunks for files this long
+    "chunk_batch_size": 4,       # Units refactored per batch in "chunked" mode
+    "sessions": {
+        "idle_timeout": 600,  # Seconds before an idle session's KV cache is evicted
+        "max_cached": 16,     # Sessions holding a KV cache in memory
+        "spill_dir": None,    # Directory to spill evicted caches to (None drops them)
+    },
+    "adaptive_max_tokens": {
+        "enabled": False,     # Predict output lengths for server admission (max_tokens_in_flight)
+        "quantile": 0.95,     # Quantile of recorded output lengths used as the budget
+        "margin": 1.25,       # Safety factor on top of the quantile
+        "min_samples": 20,    # Outputs recorded before predictions are used
+        "min_budget": 64,     # Smallest predicted budget
+    },
+    "offload": {
+        "enabled": False,       # Keep decoder layers that do not fit in RAM on disk (CPU only)
+        "ram_budget_gb": None,  # Memory for weights (None: 80% of available memory)
+        "offload_dir": None,    # Offloaded weights of non-safetensors checkpoints (None: a temp directory)
+        "prefetch_layers": 1,   # Offloaded layers loaded ahead of the running layer (0 disables)
+    },
+    "kv_cache": {
+        "quantization": None,      # "int8" stores keys and values of long prompts as int8
+        "min_prompt_tokens": 1024, # Shorter prompts keep a full-precision cache
+        "residual_length": 128,    # Recent tokens kept in full precision
+    },
+    "sandbox": {
+        "workers": 2,            # Pre-started interpreters running behavioral checks
+        "timeout": 5.0,          # Seconds per check
+        "memory_limit_mb": 512,  # Address space limit per check
+    },
+    "semantic_cache": {
+        "enabled": False,     # Reuse results for near-duplicate generation prompts
+        "threshold": 0.92,    # Minimum cosine similarity for a cache hit
+        "max_entries": 1024,  # Entries kept per language (LRU eviction)
+    },
     "system_prompt": """You are an AI coding assistant. Your task is to help users by:
     1. Generating high-quality, efficient code in Python and C++
     2. Explaining code functionality and implementation details
@@ -20,6 +58,44 @@ QWEN_CONFIG = {
     "temperature": 0.7,
     "top_p": 0.95,
     "context_window": 32768,
+    "best_of": 1,
+    "constrained_decoding": False,
+    "refactor_mode": "auto",
+    "edit_mode_min_lines": 200,
+    "chunk_batch_size": 4,
+    "sessions": {
+        "idle_timeout": 600,
+        "max_cached": 16,
+        "spill_dir": None,
+    },
+    "adaptive_max_tokens": {
+        "enabled": False,
+        "quantile": 0.95,
+        "margin": 1.25,
+        "min_samples": 20,
+        "min_budget": 64,
+    },
+    "offload": {
+        "enabled": False,
+        "ram_budget_gb": None,
+        "offload_dir": None,
+        "prefetch_layers": 1,
+    },
+    "kv_cache": {
+        "quantization": None,
+        "min_prompt_tokens": 1024,
+        "residual_length": 128,
+    },
+    "sandbox": {
+        "workers": 2,
+        "timeout": 5.0,
+        "memory_limit_mb": 512,
+    },
+    "semantic_cache": {
+        "enabled": False,
+        "threshold": 0.92,
+        "max_entries": 1024,
+    },
     "system_prompt": """You are an AI coding assistant. Your task is to help users by:
     1. Generating high-quality, efficient code in Python and C++
     2. Explaining code functionality and implementation details
@@ -41,6 +117,31 @@ CPP_CONFIG = {
     "standard": "c++17",
 }
 
+# HTTP server settings
+SERVER_CONFIG = {
+    "host": "127.0.0.1",
+    "port": 8000,
+    "max_queue_size": 64,     # Pending requests before returning 429
+    "num_workers": 1,         # Concurrent generate() calls
+    "max_tokens_in_flight": None,  # Predicted output tokens running requests may reserve (None: no limit)
+    "batch_watermark": 0.5,   # Fraction of the queue batch requests may use
+    "coalesce_requests": True,  # Share results of identical in-flight requests
+}
+
+# Hedged requests across agents (--agent hedged)
+HEDGING_CONFIG = {
+    "hedge_delay": 0.5,  # Seconds before the backup agent starts (0 runs both at once)
+}
+
+# Complexity-based routing (--agent routed): small model first, escalate on invalid code
+ROUTER_CONFIG = {
+    "thresholds": [1.0],      # Scores above this start at the large model
+    "min_success_rate": 0.6,  # Skip the small model for request kinds it keeps failing
+    "min_samples": 10,        # Outcomes recorded before the success rate is used
+    "window": 50,             # Recent outcomes the success rate is computed from
+    "probe_interval": 20,     # Send every n-th skipping request to the small model anyway
+}
+
 # Logging configuration
 LOGGING_CONFIG = {
     "version": 1,
@@ -49,6 +150,9 @@ LOGGING_CONFIG = {
         "standard": {
             "format": "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
         },
+        "json": {
+            "()": "src.utils.logging_utils.JsonFormatter",
+        },
     },
     "handlers": {
         "default": {
@@ -59,8 +163,8 @@ LOGGING_CONFIG = {
         },
         "file": {
             "level": "INFO",
-            "formatter": "standard",
             "class": "logging.FileHandler",
+            "formatter": "json",
             "filename": "ai_agent.log",
             "mode": "a",
         },
@@ -73,3 +177,9 @@ LOGGING_CONFIG = {
         },
     },
 }
+
+# Records are handed to the handlers above by a background listener thread;
+# when more than max_size records are pending new ones are dropped and counted
+LOGGING_QUEUE_CONFIG = {
+    "max_size": 10000,
+}
@@ -1,15 +1,19 @@
 #!/usr/bin/env python3
 """
 Script to download and prepare AI models for local inference.
-This script handles downloading models from Hugging Face and preparing them for local use.
+This script fetches model files in parallel from Hugging Face or a local mirror,
+verifies them by checksum and optionally converts PyTorch weights to safetensors.
 """
 
 import argparse
+import fnmatch
+import hashlib
+import json
 import os
 import logging
+import shutil
 import sys
-from huggingface_hub import snapshot_download
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Configure logging
 logging.basicConfig(
@@ -21,52 +25,325 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def download_model(model_name, output_dir, model_type):
+IGNORE_PATTERNS = ["*.h5", "*.ot", "*.msgpack"]  # Ignore large unnecessary files
+MANIFEST_NAME = "download_manifest.json"
+CHUNK_SIZE = 8 * 1024 * 1024
+
+def file_sha256(path):
+    """
+    Compute the SHA-256 of a file without reading it into memory at once.
+
+    Args:
+        path: Path to the file
+
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def git_blob_sha1(path):
+    """
+    Compute the git blob id of a file (used by the Hub for non-LFS files).
+
+    Args:
+        path: Path to the file
+
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.sha1()
+    digest.update(f"blob {os.path.getsize(path)}\0".encode())
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def list_hub_files(model_name):
     """
-    Download a model from Hugging Face Hub.
-    
+    List the files of a Hub repository with their sizes and checksums.
+
+    Args:
+        model_name: Name of the model on Hugging Face Hub
+
+    Returns:
+        Dictionary mapping file names to {"size", "sha256"} or {"size", "blob_id"}
+    """
+    from huggingface_hub import HfApi
+
+    info = HfApi().model_info(model_name, files_metadata=True)
+    files = {}
+    for sibling in info.siblings:
+        entry = {"size": sibling.size}
+        if sibling.lfs is not None:
+            lfs = sibling.lfs
+            entry["sha256"] = lfs["sha256"] if isinstance(lfs, dict) else lfs.sha256
+        else:
+            entry["blob_id"] = sibling.blob_id
+        files[sibling.rfilename] = entry
+    return files
+
+def list_mirror_files(mirror_dir):
+    """
+    List the files of a local mirror directory.
+
+    Checksums are taken from the mirror's own manifest when it has one, so
+    mirrors created by this script are verified end to end.
+
+    Args:
+        mirror_dir: Directory containing the model files
+
+    Returns:
+        Dictionary mapping relative file names to {"size"} or {"size", "sha256"}
+    """
+    manifest_path = os.path.join(mirror_dir, MANIFEST_NAME)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    files = {}
+    for root, _, names in os.walk(mirror_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, mirror_dir)
+            if relative == MANIFEST_NAME:
+                continue
+            files[relative] = manifest.get(relative, {"size": os.path.getsize(path)})
+    return files
+
+def manifest_entry(path, sha256, expected):
+    """
+    Build the manifest entry recording a verified file.
+
+    Args:
+        path: Path to the local file
+        sha256: SHA-256 of the file
+        expected: Expected size and checksum it was verified against
+
+    Returns:
+        Dictionary with size, checksums and modification time
+    """
+    stat = os.stat(path)
+    entry = {"size": stat.st_size, "sha256": sha256, "mtime_ns": stat.st_mtime_ns}
+    if "blob_id" in expected:
+        entry["blob_id"] = expected["blob_id"]
+    return entry
+
+def matches_manifest(path, expected, recorded):
+    """
+    Check whether a file is unchanged since an earlier run verified it.
+
+    Args:
+        path: Path to the local file
+        expected: Expected size and checksum
+        recorded: Manifest entry written by the earlier run
+
+    Returns:
+        True if the file's size and modification time are as recorded and
+        the recorded checksums are the expected ones
+    """
+    if not recorded or "mtime_ns" not in recorded:
+        return False
+    stat = os.stat(path)
+    if (stat.st_size, stat.st_mtime_ns) != (recorded.get("size"), recorded["mtime_ns"]):
+        return False
+    if expected.get("size") is not None and expected["size"] != stat.st_size:
+        return False
+    if "sha256" in expected and expected["sha256"] != recorded.get("sha256"):
+        return False
+    if "blob_id" in expected and expected["blob_id"] != recorded.get("blob_id"):
+        return False
+    return True
+
+def verify_file(path, expected, recorded=None):
+    """
+    Check a downloaded file against its expected size and checksum.
+
+    Files recorded in the manifest of an earlier run with the same size,
+    modification time and checksums are not hashed again.
+
+    Args:
+        path: Path to the local file
+        expected: Dictionary with "size" and optionally "sha256" or "blob_id"
+        recorded: Manifest entry of the file from an earlier run
+
+    Returns:
+        SHA-256 of the file if it matches, None otherwise
+    """
+    if not os.path.exists(path):
+        return None
+    if expected.get("size") is not None and os.path.getsize(path) != expected["size"]:
+        return None
+    if matches_manifest(path, expected, recorded):
+        return recorded["sha256"]
+    if "blob_id" in expected and git_blob_sha1(path) != expected["blob_id"]:
+        return None
+    sha256 = file_sha256(path)
+    if "sha256" in expected and sha256 != expected["sha256"]:
+        return None
+    return sha256
+
+def fetch_file(filename, expected, output_dir, model_name=None, mirror_dir=None, recorded=None):
+    """
+    Fetch one file unless a verified copy already exists.
+
+    Hub downloads resume from partial ``.incomplete`` files left by an
+    interrupted run.
+
+    Args:
+        filename: File name relative to the repository root
+        expected: Expected size and checksum
+        output_dir: Directory to save the model
+        model_name: Name of the model on Hugging Face Hub
+        mirror_dir: Local mirror directory used instead of the Hub
+        recorded: Manifest entry of the file from an earlier run
+
+    Returns:
+        Tuple of (filename, sha256, skipped)
+    """
+    destination = os.path.join(output_dir, filename)
+    sha256 = verify_file(destination, expected, recorded)
+    if sha256 is not None:
+        return filename, sha256, True
+
+    if mirror_dir is not None:
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        partial = destination + ".incomplete"
+        shutil.copyfile(os.path.join(mirror_dir, filename), partial)
+        os.replace(partial, destination)
+    else:
+        from huggingface_hub import hf_hub_download
+        hf_hub_download(repo_id=model_name, filename=filename, local_dir=output_dir)
+
+    sha256 = verify_file(destination, expected)
+    if sha256 is None:
+        raise ValueError(f"Checksum mismatch for {filename}")
+    return filename, sha256, False
+
+def convert_to_safetensors(output_dir):
+    """
+    Convert PyTorch ``.bin`` weight files to safetensors, one shard at a time.
+
+    Args:
+        output_dir: Directory containing the downloaded model
+
+    Returns:
+        Dictionary mapping converted file names to their safetensors files
+    """
+    import torch
+    from safetensors.torch import save_file
+
+    shards = sorted(
+        name for name in os.listdir(output_dir)
+        if name.startswith("pytorch_model") and name.endswith(".bin")
+    )
+    if not shards:
+        logger.info("No PyTorch weight files to convert")
+        return {}
+
+    renamed = {}
+    for shard in shards:
+        target = shard.replace("pytorch_model", "model").replace(".bin", ".safetensors")
+        logger.info(f"Converting {shard} -> {target}")
+        state_dict = torch.load(
+            os.path.join(output_dir, shard),
+            map_location="cpu",
+            mmap=True,
+            weights_only=True
+        )
+        # safetensors does not allow shared storage between tensors
+        state_dict = {name: tensor.contiguous().clone() for name, tensor in state_dict.items()}
+        save_file(state_dict, os.path.join(output_dir, target), metadata={"format": "pt"})
+        del state_dict
+        os.remove(os.path.join(output_dir, shard))
+        renamed[shard] = target
+
+    index_path = os.path.join(output_dir, "pytorch_model.bin.index.json")
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            index = json.load(f)
+        index["weight_map"] = {name: renamed.get(shard, shard) for name, shard in index["weight_map"].items()}
+        with open(os.path.join(output_dir, "model.safetensors.index.json"), "w") as f:
+            json.dump(index, f, indent=2)
+        os.remove(index_path)
+        renamed["pytorch_model.bin.index.json"] = "model.safetensors.index.json"
+
+    return renamed
+
+def download_model(model_name, output_dir, model_type, mirror_dir=None, workers=8, convert=False):
+    """
+    Download a model from Hugging Face Hub or a local mirror.
+
+    Files are fetched in parallel and verified by checksum; weights are
+    never loaded. Files that are already present and verified are skipped,
+    so an interrupted run can simply be restarted; files unchanged since
+    the manifest of an earlier run was written are not even re-hashed.
+
     Args:
         model_name: Name of the model on Hugging Face Hub
         output_dir: Directory to save the model
         model_type: Type of model (claude or qwen)
+        mirror_dir: Local mirror directory used instead of the Hub
+        workers: Number of files fetched concurrently
+        convert: Convert PyTorch weights to safetensors after download
     """
-    logger.info(f"Downloading {model_type} model: {model_name}")
-    
+    source = mirror_dir or model_name
+    logger.info(f"Downloading {model_type} model from {source}")
+
     # Create the output directory
     os.makedirs(output_dir, exist_ok=True)
-    
+
     try:
-        # Download the model files
-        snapshot_download(
-            repo_id=model_name,
-            local_dir=output_dir,
-            local_dir_use_symlinks=False,
-            ignore_patterns=["*.h5", "*.ot", "*.msgpack"]  # Ignore large unnecessary files
-        )
-        
-        logger.info(f"Model files downloaded to {output_dir}")
-        
-        # Load and save the model and tokenizer to ensure they work
-        logger.info("Verifying model and tokenizer...")
-        
-        trust_remote_code = model_type.lower() == "qwen"
-        
-        tokenizer = AutoTokenizer.from_pretrained(
-            output_dir, 
-            trust_remote_code=trust_remote_code
-        )
-        model = AutoModelForCausalLM.from_pretrained(
-            output_dir,
-            low_cpu_mem_usage=True,
-            trust_remote_code=trust_remote_code
-        )
-        
-        # Save the model and tokenizer
-        tokenizer.save_pretrained(output_dir)
-        model.save_pretrained(output_dir)
-        
+        files = list_mirror_files(mirror_dir) if mirror_dir else list_hub_files(model_name)
+        files = {
+            name: entry for name, entry in files.items()
+            if not any(fnmatch.fnmatch(name, pattern) for pattern in IGNORE_PATTERNS)
+        }
+
+        # Files converted by an earlier run are not fetched again
+        manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+        previous = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                previous = json.load(f)
+        manifest = {}
+        for name in list(files):
+            converted = previous.get(name, {}).get("converted_to")
+            if converted and os.path.exists(os.path.join(output_dir, converted)):
+                manifest[name] = previous[name]
+                manifest[converted] = previous[converted]
+                del files[name]
+
+        total_bytes = sum(entry.get("size") or 0 for entry in files.values())
+        logger.info(f"Fetching {len(files)} files ({total_bytes / 1e9:.2f} GB) with {workers} workers")
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(fetch_file, name, entry, output_dir, model_name, mirror_dir, previous.get(name))
+                for name, entry in files.items()
+            ]
+            for future in as_completed(futures):
+                filename, sha256, skipped = future.result()
+                manifest[filename] = manifest_entry(os.path.join(output_dir, filename), sha256, files[filename])
+                logger.info(f"{'Verified existing' if skipped else 'Fetched'} {filename}")
+
+        logger.info(f"Model files downloaded and verified in {output_dir}")
+
+        if convert:
+            for source_name, target in convert_to_safetensors(output_dir).items():
+                target_path = os.path.join(output_dir, target)
+                manifest[source_name]["converted_to"] = target
+                manifest[target] = manifest_entry(target_path, file_sha256(target_path), {})
+
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+
         logger.info(f"Successfully downloaded and verified {model_type} model")
-        
+
     except Exception as e:
         logger.error(f"Error downloading model: {str(e)}")
         raise
@@ -89,11 +366,33 @@ def main():
         required=True,
         help="Directory to save the model"
     )
-    
+    parser.add_argument(
+        "--mirror-dir",
+        help="Local directory mirroring the model, used instead of the Hub"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help="Number of files fetched in parallel"
+    )
+    parser.add_argument(
+        "--convert-safetensors",
+        action="store_true",
+        help="Convert PyTorch .bin weights to safetensors for faster loading"
+    )
+
     args = parser.parse_args()
-    
+
     try:
-        download_model(args.model_name, args.output_dir, args.model_type)
+        download_model(
+            args.model_name,
+            args.output_dir,
+            args.model_type,
+            mirror_dir=args.mirror_dir,
+            workers=args.workers,
+            convert=args.convert_safetensors
+        )
     except Exception as e:
         logger.error(f"Failed to download model: {str(e)}")
         sys.exit(1)
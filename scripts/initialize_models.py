@@ -1,16 +1,21 @@
 #!/usr/bin/env python3
 """
 Script to initialize and test AI models after downloading.
-This script verifies that models can be loaded and used for inference.
+This script verifies that models can be loaded and used for inference, and can
+calibrate inference settings for the current machine.
 """
 
 import argparse
 import os
 import logging
 import sys
+import time
 import torch
 from transformers import AutoTokenizer, AutoModelForCausalLM
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.utils.perf_profile import save_performance_profile
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -86,6 +91,223 @@ def test_model(model_path, model_type):
         logger.error(f"Error testing model: {str(e)}")
         return False
 
+CALIBRATION_TEXT = (
+    "def quicksort(items):\n"
+    "    if len(items) <= 1:\n"
+    "        return items\n"
+    "    pivot = items[len(items) // 2]\n"
+    "    left = [x for x in items if x < pivot]\n"
+    "    right = [x for x in items if x > pivot]\n"
+    "    return quicksort(left) + [x for x in items if x == pivot] + quicksort(right)\n"
+)
+
+def candidate_thread_counts():
+    """
+    Get the thread counts to try on this machine.
+    
+    Returns:
+        Sorted list of thread counts
+    """
+    logical = os.cpu_count() or 1
+    try:
+        import psutil
+        physical = psutil.cpu_count(logical=False) or logical
+    except ImportError:
+        physical = logical
+    counts = {logical, physical}
+    n = 1
+    while n < logical:
+        counts.add(n)
+        n *= 2
+    return sorted(counts)
+
+def measure_throughput(model, input_ids, decode_tokens, repeats=2):
+    """
+    Measure prefill and decode throughput for a batch of prompts.
+    
+    Args:
+        model: Loaded causal language model
+        input_ids: Prompt token ids of shape (batch, prompt_tokens)
+        decode_tokens: Number of tokens to decode per sequence
+        repeats: Number of timed runs; the fastest is kept
+        
+    Returns:
+        Dictionary with prefill and decode tokens per second
+    """
+    batch_size, prompt_tokens = input_ids.shape
+    attention_mask = torch.ones_like(input_ids)
+    prefill_time = decode_time = float("inf")
+    
+    with torch.no_grad():
+        # Warm-up run so lazy initialization is not measured
+        model(input_ids, attention_mask=attention_mask)
+        
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model(input_ids, attention_mask=attention_mask)
+            prefill = time.perf_counter() - start
+            prefill_time = min(prefill_time, prefill)
+            
+            start = time.perf_counter()
+            model.generate(
+                input_ids,
+                attention_mask=attention_mask,
+                max_new_tokens=decode_tokens,
+                min_new_tokens=decode_tokens,
+                do_sample=False,
+                pad_token_id=model.config.eos_token_id
+            )
+            decode_time = min(decode_time, max(time.perf_counter() - start - prefill, 1e-9))
+    
+    return {
+        "prefill_tokens_per_second": batch_size * prompt_tokens / prefill_time,
+        "decode_tokens_per_second": batch_size * decode_tokens / decode_time,
+    }
+
+def autotune_model(model_path, model_type, prompt_tokens=128, decode_tokens=32, batch_sizes=(1, 2, 4, 8)):
+    """
+    Sweep CPU inference settings and write the best ones to a profile.
+    
+    Settings are tuned one at a time: dtype, then thread count, then core
+    affinity (all cores or pinned to as many cores as threads), then batch
+    size. Single-sequence decode throughput is the objective for the first
+    three since it dominates interactive latency; the batch size is the one
+    with the highest aggregate decode throughput that keeps per-sequence
+    speed within half of unbatched decoding.
+    
+    Args:
+        model_path: Path to the model directory
+        model_type: Type of model (claude or qwen)
+        prompt_tokens: Prompt length used for measurements
+        decode_tokens: Tokens decoded per measurement
+        batch_sizes: Batch sizes to try
+        
+    Returns:
+        The written profile
+        
+    Raises:
+        RuntimeError: If the model fails to load or run with every dtype
+    """
+    logger.info(f"Autotuning {model_type} model at {model_path}")
+    trust_remote_code = model_type.lower() == "qwen"
+    tokenizer = AutoTokenizer.from_pretrained(model_path, trust_remote_code=trust_remote_code)
+    
+    token_ids = tokenizer(CALIBRATION_TEXT, return_tensors="pt").input_ids[0]
+    prompt = token_ids.repeat(prompt_tokens // len(token_ids) + 1)[:prompt_tokens].unsqueeze(0)
+    original_affinity = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else None
+    measurements = []
+    
+    def run(model, settings):
+        torch.set_num_threads(settings["num_threads"])
+        if original_affinity is not None:
+            os.sched_setaffinity(0, settings["cpu_affinity"] or original_affinity)
+        try:
+            result = measure_throughput(model, prompt.repeat(settings["batch_size"], 1), decode_tokens)
+        finally:
+            if original_affinity is not None:
+                os.sched_setaffinity(0, original_affinity)
+        measurements.append({**settings, **result})
+        logger.info(f"{settings}: prefill {result['prefill_tokens_per_second']:.1f} tok/s, "
+                    f"decode {result['decode_tokens_per_second']:.1f} tok/s")
+        return result
+    
+    best = {"dtype": "float32", "num_threads": torch.get_num_threads(), "cpu_affinity": None, "batch_size": 1}
+    
+    # dtype
+    best_score, best_model = -1.0, None
+    for dtype in ["float32", "bfloat16"]:
+        try:
+            model = AutoModelForCausalLM.from_pretrained(
+                model_path,
+                torch_dtype=getattr(torch, dtype),
+                low_cpu_mem_usage=True,
+                trust_remote_code=trust_remote_code
+            )
+            score = run(model, {**best, "dtype": dtype})["decode_tokens_per_second"]
+        except Exception as e:
+            logger.warning(f"Skipping dtype {dtype}: {str(e)}")
+            continue
+        if score > best_score:
+            best_score, best_model, best["dtype"] = score, model, dtype
+        else:
+            del model
+    if best_model is None:
+        raise RuntimeError("No dtype could be loaded and benchmarked (see the warnings above)")
+    model = best_model
+    
+    # Threads and affinity
+    for num_threads in candidate_thread_counts():
+        score = run(model, {**best, "num_threads": num_threads})["decode_tokens_per_second"]
+        if score > best_score:
+            best_score, best["num_threads"] = score, num_threads
+    
+    if original_affinity is not None and best["num_threads"] < len(original_affinity):
+        pinned = sorted(original_affinity)[:best["num_threads"]]
+        score = run(model, {**best, "cpu_affinity": pinned})["decode_tokens_per_second"]
+        if score > best_score:
+            best_score, best["cpu_affinity"] = score, pinned
+    
+    # Batch size
+    single = best_score
+    best_throughput = single
+    for batch_size in batch_sizes:
+        if batch_size == 1:
+            continue
+        throughput = run(model, {**best, "batch_size": batch_size})["decode_tokens_per_second"]
+        if throughput > best_throughput and throughput / batch_size >= 0.5 * single:
+            best_throughput, best["batch_size"] = throughput, batch_size
+    
+    profile = {
+        **best,
+        "torch_version": torch.__version__,
+        "prompt_tokens": prompt_tokens,
+        "decode_tokens": decode_tokens,
+        "measurements": measurements,
+    }
+    path = save_performance_profile(model_path, profile)
+    logger.info(f"Tuned settings: {best}")
+    logger.info(f"Performance profile written to {path}")
+    return profile
+
+def report_kv_cache(model_path, model_type, context_tokens=2048, residual_length=128):
+    """
+    Measure memory savings and quality loss of the int8 KV cache.
+    
+    The first half of a long calibration prompt is prefilled and the second
+    half is decoded token by token against a full-precision and an int8
+    cache.
+    
+    Args:
+        model_path: Path to the model directory
+        model_type: Type of model (claude or qwen)
+        context_tokens: Length of the measured context
+        residual_length: Recent tokens kept in full precision by the int8 cache
+        
+    Returns:
+        Measurements from measure_kv_quantization
+    """
+    from src.utils.kv_cache import measure_kv_quantization
+    
+    logger.info(f"Measuring int8 KV cache of {model_type} model at {model_path} over {context_tokens} tokens")
+    trust_remote_code = model_type.lower() == "qwen"
+    tokenizer = AutoTokenizer.from_pretrained(model_path, trust_remote_code=trust_remote_code)
+    model = AutoModelForCausalLM.from_pretrained(
+        model_path,
+        low_cpu_mem_usage=True,
+        trust_remote_code=trust_remote_code
+    )
+    model.eval()
+    
+    token_ids = tokenizer(CALIBRATION_TEXT, return_tensors="pt").input_ids[0]
+    input_ids = token_ids.repeat(context_tokens // len(token_ids) + 1)[:context_tokens].unsqueeze(0)
+    result = measure_kv_quantization(model, input_ids, residual_length=residual_length)
+    
+    logger.info(f"KV cache: {result['full_bytes'] / 2**20:.1f} MiB full precision, "
+                f"{result['int8_bytes'] / 2**20:.1f} MiB int8 ({result['memory_ratio']:.0%})")
+    logger.info(f"Perplexity: {result['full_perplexity']:.3f} full precision, {result['int8_perplexity']:.3f} int8; "
+                f"top-1 agreement {result['top1_agreement']:.1%}, max logit difference {result['max_logit_diff']:.4f}")
+    return result
+
 def main():
     parser = argparse.ArgumentParser(description="Test AI models for local inference")
     parser.add_argument(
@@ -100,9 +322,50 @@ def main():
         help="Path to the model directory"
     )
     
+    parser.add_argument(
+        "--autotune",
+        action="store_true",
+        help="Calibrate CPU inference settings and write a performance profile"
+    )
+    parser.add_argument(
+        "--prompt-tokens",
+        type=int,
+        default=128,
+        help="Prompt length used for autotuning measurements"
+    )
+    parser.add_argument(
+        "--decode-tokens",
+        type=int,
+        default=32,
+        help="Tokens decoded per autotuning measurement"
+    )
+    parser.add_argument(
+        "--kv-cache-report",
+        action="store_true",
+        help="Measure memory savings and quality loss of the int8 KV cache"
+    )
+    parser.add_argument(
+        "--context-tokens",
+        type=int,
+        default=2048,
+        help="Context length used for the KV cache report"
+    )
+    
     args = parser.parse_args()
     
     success = test_model(args.model_path, args.model_type)
+    if success and args.autotune:
+        try:
+            autotune_model(args.model_path, args.model_type, args.prompt_tokens, args.decode_tokens)
+        except Exception as e:
+            logger.error(f"Autotuning failed: {str(e)}")
+            success = False
+    if success and args.kv_cache_report:
+        try:
+            report_kv_cache(args.model_path, args.model_type, args.context_tokens)
+        except Exception as e:
+            logger.error(f"KV cache report failed: {str(e)}")
+            success = False
     sys.exit(0 if success else 1)
 
 if __name__ == "__main__":
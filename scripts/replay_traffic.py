@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Script to replay a recorded request log against the agents and report
+throughput, time to first token, end-to-end latency percentiles and queue
+depth over time.
+
+Requests either run in-process on a locally loaded model (a small model
+works for quick checks) or are sent to a running API server.
+"""
+
+import argparse
+import copy
+import json
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from configs.agent_config import CLAUDE_CONFIG, QWEN_CONFIG
+from src.utils.traffic_replay import (
+    HttpTarget,
+    InProcessTarget,
+    LoadTester,
+    arrival_offsets,
+    load_request_log,
+)
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s",
+    handlers=[
+        logging.StreamHandler(sys.stdout)
+    ]
+)
+logger = logging.getLogger(__name__)
+
+def create_target(args):
+    """
+    Create the target requests are sent to.
+    
+    Args:
+        args: Parsed command line arguments
+    
+    Returns:
+        InProcessTarget or HttpTarget
+    """
+    if args.url:
+        return HttpTarget(args.url, stream=not args.no_stream)
+    
+    if args.agent == "claude":
+        from src.agents.claude_agent import ClaudeAgent as agent_class
+        config = copy.deepcopy(CLAUDE_CONFIG)
+    else:
+        from src.agents.qwen_agent import QwenAgent as agent_class
+        config = copy.deepcopy(QWEN_CONFIG)
+    if args.max_tokens is not None:
+        config["max_tokens"] = args.max_tokens
+    return InProcessTarget(agent_class(args.model_path, config), stream=not args.no_stream)
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded traffic and measure latency")
+    parser.add_argument(
+        "log",
+        help="JSONL request log (action, language, input, arrival_time per line)"
+    )
+    parser.add_argument(
+        "--url",
+        help="Address of a running API server (requests run in-process if omitted)"
+    )
+    parser.add_argument(
+        "--agent",
+        choices=["claude", "qwen"],
+        default="claude",
+        help="Agent used for in-process runs"
+    )
+    parser.add_argument(
+        "--model-path",
+        help="Path to the model directory for in-process runs"
+    )
+    parser.add_argument(
+        "--max-tokens",
+        type=int,
+        help="Override the agent's max_tokens for in-process runs"
+    )
+    
+    parser.add_argument(
+        "--qps",
+        type=float,
+        help="Send at this rate instead of the recorded arrival times"
+    )
+    parser.add_argument(
+        "--poisson",
+        action="store_true",
+        help="With --qps, use Poisson arrivals instead of even spacing"
+    )
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="Replay recorded arrival times this many times faster"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Requests in flight at once"
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        help="Replay only the first N requests"
+    )
+    parser.add_argument(
+        "--no-stream",
+        action="store_true",
+        help="Do not stream responses (no time to first token, but caches stay in use)"
+    )
+    parser.add_argument(
+        "--sample-interval",
+        type=float,
+        default=0.5,
+        help="Seconds between queue depth samples"
+    )
+    parser.add_argument(
+        "--output",
+        help="Write the full report (including the queue depth timeline) as JSON"
+    )
+    
+    args = parser.parse_args()
+    if not args.url and not args.model_path:
+        parser.error("--model-path is required without --url")
+    
+    requests = load_request_log(args.log)[:args.limit]
+    offsets = arrival_offsets(requests, qps=args.qps, speed=args.speed, poisson=args.poisson)
+    logger.info(f"Replaying {len(requests)} requests over {offsets[-1] if offsets else 0:.1f}s")
+    
+    tester = LoadTester(create_target(args), concurrency=args.concurrency, sample_interval=args.sample_interval)
+    report = tester.run(requests, offsets)
+    print(report.format())
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report.to_dict(), f, indent=2)
+        logger.info(f"Report written to {args.output}")
+    sys.exit(0 if report.failed == 0 else 1)
+
+if __name__ == "__main__":
+    main()
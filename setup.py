@@ -3,11 +3,11 @@ from setuptools import setup, find_packages
 setup(
     name="ai-coding-agent",
     version="0.1.0",
-    packages=find_packages(where="src"),
-    package_dir={"": "src"},
+    packages=find_packages(include=["src", "src.*", "configs"]),
     install_requires=[
-        "torch>=2.0.0",
-        "transformers>=4.30.0",
+        "torch>=2.1.0",
+        "transformers>=4.39.0",
+        "safetensors>=0.3.1",
         "accelerate>=0.20.0",
         "bitsandbytes>=0.39.0",
         "sentencepiece>=0.1.99",
@@ -39,6 +39,7 @@ setup(
     entry_points={
         "console_scripts": [
             "ai-code=src.main:main",
+            "ai-code-server=src.server.app:main",
         ],
     },
     author="AI Coding Agent Team",
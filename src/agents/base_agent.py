@@ -1,6 +1,20 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Optional, Any
+from typing import Dict, Optional, Any, List
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import hashlib
 import logging
+import os
+import tempfile
+import threading
+import time
+import torch
+
+from ..utils.cancellation import CancellationCriteria, GenerationCancelled, token_from_kwargs
+from ..utils.offload import LayerPrefetcher, plan_offload
+from ..utils.output_length import OutputLengthPredictor
+from ..utils.sandbox import ExecutionResult, SandboxPool
+from ..utils.semantic_cache import SemanticCache
+from .session import SessionManager
 
 class BaseAgent(ABC):
     """Base class for AI coding agents."""
@@ -17,6 +31,50 @@ class BaseAgent(ABC):
         self.config = config
         self.logger = logging.getLogger(self.__class__.__name__)
         
+        # Optional cache serving paraphrased generation prompts
+        cache_config = config.get("semantic_cache", {})
+        self.semantic_cache = None
+        if cache_config.get("enabled", False):
+            self.semantic_cache = SemanticCache(
+                threshold=cache_config.get("threshold", 0.92),
+                max_entries=cache_config.get("max_entries", 1024)
+            )
+        
+        # Per-request token budgets predicted from earlier output lengths
+        length_config = config.get("adaptive_max_tokens", {})
+        self.output_lengths = None
+        if length_config.get("enabled", False):
+            self.output_lengths = OutputLengthPredictor(
+                quantile=length_config.get("quantile", 0.95),
+                margin=length_config.get("margin", 1.25),
+                min_samples=length_config.get("min_samples", 20),
+                min_budget=length_config.get("min_budget", 64)
+            )
+        
+        # Quantized KV cache for long prompts
+        self.kv_cache_config = config.get("kv_cache", {})
+        if self.kv_cache_config.get("quantization") not in (None, "int8"):
+            raise ValueError(f"Unsupported KV cache quantization: {self.kv_cache_config['quantization']}")
+        
+        # Multi-turn sessions keeping their KV cache between turns
+        session_config = config.get("sessions", {})
+        self.sessions = SessionManager(
+            idle_timeout=session_config.get("idle_timeout", 600),
+            max_cached=session_config.get("max_cached", 16),
+            spill_dir=session_config.get("spill_dir")
+        )
+        
+        # Sandbox workers for behavioral checks, started on first use
+        self._sandbox = None
+        self._sandbox_lock = threading.Lock()
+        
+        # Tuned settings for this machine, set by _load_model if available
+        self.performance_profile = None
+        
+        # Disk offload of layers that do not fit in RAM, set by _load_model if enabled
+        self.offload_plan = None
+        self.prefetcher = None
+        
         # Initialize the model
         self.model = self._load_model()
         
@@ -69,6 +127,639 @@ class BaseAgent(ABC):
         """
         pass
     
+    def _offload_load_kwargs(self, torch_dtype: torch.dtype, trust_remote_code: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Plan disk offload for a model that does not fit in the RAM budget.
+        
+        Args:
+            torch_dtype: Dtype the weights are loaded in
+            trust_remote_code: Allow custom model code
+            
+        Returns:
+            ``device_map`` and ``offload_folder`` arguments for
+            ``from_pretrained``, or None if offload is disabled or not needed
+        """
+        offload_config = self.config.get("offload", {})
+        if self.device.type != "cpu" or not offload_config.get("enabled", False):
+            return None
+        
+        if offload_config.get("ram_budget_gb") is not None:
+            budget = int(offload_config["ram_budget_gb"] * 2**30)
+        else:
+            import psutil
+            budget = int(psutil.virtual_memory().available * 0.8)
+        plan = plan_offload(
+            self.model_path,
+            budget,
+            torch_dtype,
+            prefetch_layers=offload_config.get("prefetch_layers", 1),
+            trust_remote_code=trust_remote_code
+        )
+        self.logger.info("Weight placement: %s", plan.describe())
+        if plan.offloaded_layers == 0:
+            return None
+        
+        self.offload_plan = plan
+        offload_dir = offload_config.get("offload_dir") or os.path.join(
+            tempfile.gettempdir(),
+            "ai-code-offload",
+            hashlib.sha256(os.path.abspath(self.model_path).encode()).hexdigest()[:16]
+        )
+        return {"device_map": plan.device_map, "offload_folder": offload_dir}
+    
+    def _attach_prefetcher(self, model):
+        """Prefetch offloaded layers of a model loaded with ``_offload_load_kwargs``."""
+        depth = self.config.get("offload", {}).get("prefetch_layers", 1)
+        if depth > 0:
+            self.prefetcher = LayerPrefetcher(model, depth=depth)
+    
+    def predict_max_tokens(self, action: str, text: str, language: str = "") -> int:
+        """
+        Predict how many tokens a request will generate.
+        
+        The server reserves this many tokens of its in-flight budget while
+        the request runs. Generation itself is still limited only by
+        ``max_tokens``.
+        
+        Args:
+            action: "generate", "explain" or "refactor"
+            text: Prompt or code the request operates on
+            language: Programming language ("" if unknown)
+            
+        Returns:
+            Predicted number of generated tokens, ``max_tokens`` while
+            adaptive budgets are disabled or lack samples
+        """
+        max_tokens = self.config.get("max_tokens", 2048)
+        if self.output_lengths is None:
+            return max_tokens
+        return self.output_lengths.predict(action, language, len(text), max_tokens)
+    
+    def _generation_kwargs(self, **kwargs) -> Dict[str, Any]:
+        """
+        Build the keyword arguments shared by all ``generate()`` calls.
+        
+        Args:
+            **kwargs: Agent call parameters (``cancel_token``, ``deadline``,
+                ``logits_processor``)
+            
+        Returns:
+            Dictionary of generation arguments
+            
+        Raises:
+            GenerationCancelled: If the request was cancelled before starting
+        """
+        from transformers import LogitsProcessorList, StoppingCriteriaList
+        
+        generate_kwargs = dict(
+            max_new_tokens=self.config.get("max_tokens", 2048),
+            temperature=self.config.get("temperature", 0.7),
+            top_p=self.config.get("top_p", 0.95),
+            do_sample=True
+        )
+        
+        # Checked after every decode step so cancelled requests stop promptly
+        token = token_from_kwargs(kwargs)
+        if token is not None:
+            if token.stop_reason is not None:
+                raise GenerationCancelled(token.stop_reason)
+            generate_kwargs["stopping_criteria"] = StoppingCriteriaList([CancellationCriteria(token)])
+        if kwargs.get("logits_processor") is not None:
+            generate_kwargs["logits_processor"] = LogitsProcessorList([kwargs["logits_processor"]])
+        return generate_kwargs
+    
+    def _grammar_processor(self, language: str, constrained: Optional[bool] = None, start_in_text: bool = False):
+        """
+        Create a constrained-decoding logits processor if enabled.
+        
+        Args:
+            language: Language being generated
+            constrained: Per-call override of ``config["constrained_decoding"]``
+            start_in_text: The output is markdown with fenced code blocks
+            
+        Returns:
+            PythonGrammarProcessor, or None when constrained decoding is off
+            or not supported for the language
+        """
+        from ..utils.code_utils import normalize_fence_language
+        
+        if constrained is None:
+            constrained = self.config.get("constrained_decoding", False)
+        if not constrained:
+            return None
+        if normalize_fence_language(language or "") != "python":
+            return None
+        from ..utils.constrained import PythonGrammarProcessor
+        return PythonGrammarProcessor(self.model["tokenizer"], start_in_text=start_in_text)
+    
+    @staticmethod
+    def _stopped_early(generate_kwargs: Dict[str, Any]) -> bool:
+        """Check whether a cancellation stopped the last ``generate()`` call."""
+        return any(
+            isinstance(criteria, CancellationCriteria) and criteria.triggered
+            for criteria in generate_kwargs.get("stopping_criteria", [])
+        )
+    
+    def _check_cancelled(self, generate_kwargs: Dict[str, Any], partial_output: Any, **kwargs):
+        """
+        Raise if generation was stopped early, unless partial output was requested.
+        
+        Args:
+            generate_kwargs: Arguments returned by :meth:`_generation_kwargs`
+            partial_output: Output generated before the stop
+            **kwargs: Agent call parameters (``return_partial``)
+            
+        Raises:
+            GenerationCancelled: If generation was stopped and
+                ``return_partial`` is not set
+        """
+        for criteria in generate_kwargs.get("stopping_criteria", []):
+            if isinstance(criteria, CancellationCriteria) and criteria.triggered:
+                reason = criteria.token.stop_reason
+                if not kwargs.get("return_partial", False):
+                    raise GenerationCancelled(reason, partial_output)
+                self.logger.info("Returning partial output (generation %s)", reason)
+    
+    def _new_kv_cache(self, prompt_tokens: int):
+        """
+        Create the KV cache for a request, quantized if configured and the prompt is long.
+        
+        Args:
+            prompt_tokens: Number of prompt tokens
+        
+        Returns:
+            Int8KVCache, or None to let ``generate`` create a full-precision cache
+        """
+        if self.kv_cache_config.get("quantization") != "int8":
+            return None
+        if prompt_tokens < self.kv_cache_config.get("min_prompt_tokens", 1024):
+            return None
+        from ..utils.kv_cache import Int8KVCache
+        
+        return Int8KVCache(
+            self.model["model"].config,
+            residual_length=self.kv_cache_config.get("residual_length", 128)
+        )
+    
+    def _generate(self, full_prompt: str, **kwargs) -> str:
+        """
+        Run the loaded model on a fully formatted prompt.
+        
+        When ``length_key`` is given as (action, language, input size) and
+        adaptive budgets are enabled, the output length is recorded for
+        :meth:`predict_max_tokens`.
+        Prompts of at least ``kv_cache.min_prompt_tokens`` tokens use an
+        int8 KV cache when ``kv_cache.quantization`` is ``"int8"``.
+        
+        Args:
+            full_prompt: Prompt text including the system prompt
+            **kwargs: Additional generation parameters (e.g. ``streamer``,
+                ``length_key``)
+            
+        Returns:
+            Generated text with the prompt removed
+        """
+        tokenizer = self.model["tokenizer"]
+        generate_kwargs = self._generation_kwargs(**kwargs)
+        
+        # Tokenize input
+        inputs = tokenizer(full_prompt, return_tensors="pt").to(self.device)
+        prompt_tokens = inputs.input_ids.shape[-1]
+        
+        # Generate response
+        start = time.perf_counter()
+        with torch.no_grad():
+            cache = self._new_kv_cache(prompt_tokens)
+            if cache is not None:
+                generate_kwargs["past_key_values"] = cache
+            sequences = self.model["model"].generate(
+                inputs.input_ids,
+                pad_token_id=tokenizer.eos_token_id,
+                streamer=kwargs.get("streamer"),
+                **generate_kwargs
+            )
+        elapsed = time.perf_counter() - start
+        
+        generated = len(sequences[0]) - prompt_tokens
+        # Outputs cut short by a cancellation or deadline would bias the budgets low
+        length_key = kwargs.get("length_key")
+        if length_key is not None and self.output_lengths is not None and not self._stopped_early(generate_kwargs):
+            self.output_lengths.record(*length_key, generated)
+        
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(
+                "Generation finished in %.2fs",
+                elapsed,
+                extra={
+                    "duration_ms": round(elapsed * 1000, 1),
+                    "prompt_tokens": prompt_tokens,
+                    "output_tokens": generated,
+                }
+            )
+        
+        # Decode the response and remove the prompt
+        generated_text = tokenizer.decode(sequences[0], skip_special_tokens=True)[len(full_prompt):]
+        self._check_cancelled(generate_kwargs, generated_text, **kwargs)
+        return generated_text
+    
+    def _generate_candidates(self, full_prompt: str, num_candidates: int, **kwargs) -> List[str]:
+        """
+        Sample several completions for a prompt in one batched call.
+        
+        The prompt is prefilled once and its KV cache is replicated across
+        the batch, so only the decode steps are paid per candidate.
+        
+        Args:
+            full_prompt: Prompt text including the system prompt
+            num_candidates: Number of completions to sample
+            **kwargs: Additional generation parameters
+            
+        Returns:
+            List of generated texts with the prompt removed
+        """
+        tokenizer = self.model["tokenizer"]
+        model = self.model["model"]
+        input_ids = tokenizer(full_prompt, return_tensors="pt").to(self.device).input_ids
+        generate_kwargs = self._generation_kwargs(**kwargs)
+        generate_kwargs["pad_token_id"] = tokenizer.eos_token_id
+        
+        with torch.no_grad():
+            cache = None
+            if input_ids.shape[1] > 1:
+                cache = model(input_ids[:, :-1], use_cache=True).past_key_values
+            
+            if hasattr(cache, "batch_repeat_interleave"):
+                cache.batch_repeat_interleave(num_candidates)
+                batch_ids = input_ids.repeat(num_candidates, 1)
+                output = model.generate(
+                    batch_ids,
+                    attention_mask=torch.ones_like(batch_ids),
+                    past_key_values=cache,
+                    **generate_kwargs
+                )
+            else:
+                # Models with legacy caches fall back to a batched prefill
+                output = model.generate(
+                    input_ids,
+                    num_return_sequences=num_candidates,
+                    **generate_kwargs
+                )
+        
+        candidates = [
+            tokenizer.decode(sequence, skip_special_tokens=True)[len(full_prompt):]
+            for sequence in output
+        ]
+        self._check_cancelled(generate_kwargs, candidates, **kwargs)
+        return candidates
+    
+    def _generate_batch(self, prompts: List[str], **kwargs) -> List[str]:
+        """
+        Generate completions for several prompts in one batched call.
+        
+        Args:
+            prompts: Fully formatted prompts
+            **kwargs: Additional generation parameters
+            
+        Returns:
+            Generated texts in prompt order
+        """
+        tokenizer = self.model["tokenizer"]
+        generate_kwargs = self._generation_kwargs(**kwargs)
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        
+        # Left padding keeps every prompt adjacent to its generated tokens
+        padding_side = tokenizer.padding_side
+        tokenizer.padding_side = "left"
+        try:
+            inputs = tokenizer(prompts, return_tensors="pt", padding=True).to(self.device)
+        finally:
+            tokenizer.padding_side = padding_side
+        
+        with torch.no_grad():
+            output = self.model["model"].generate(
+                inputs.input_ids,
+                attention_mask=inputs.attention_mask,
+                pad_token_id=tokenizer.pad_token_id,
+                **generate_kwargs
+            )
+        
+        new_tokens = output[:, inputs.input_ids.shape[1]:]
+        outputs = tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+        self._check_cancelled(generate_kwargs, outputs, **kwargs)
+        return outputs
+    
+    def _select_valid_candidate(self, candidates: List[str], language: str, tests: Optional[str] = None) -> str:
+        """
+        Format and validate candidates in parallel and pick a valid one.
+        
+        Args:
+            candidates: Generated code candidates
+            language: Programming language of the candidates
+            tests: Python tests a candidate must also pass, if any
+            
+        Returns:
+            The first candidate to pass validation, or the first candidate
+            if none is valid
+        """
+        if tests and language.lower() != "python":
+            self.logger.warning("Tests are only run for Python code, not %s", language)
+        def process(candidate: str):
+            code = self.format_code(candidate.strip(), language)
+            valid = self.validate_code(code, language)
+            if valid and tests and language.lower() == "python":
+                valid = self.run_tests(code, tests).passed
+            return code, valid
+        
+        with ThreadPoolExecutor(max_workers=len(candidates)) as executor:
+            futures = {executor.submit(process, c): i for i, c in enumerate(candidates)}
+            processed = {}
+            for future in as_completed(futures):
+                code, valid = future.result()
+                if valid:
+                    self.logger.info("Candidate %d of %d passed validation", futures[future] + 1, len(candidates))
+                    for pending in futures:
+                        pending.cancel()
+                    return code
+                processed[futures[future]] = code
+        
+        self.logger.warning("None of %d candidates passed validation", len(candidates))
+        return processed[0]
+    
+    def _refactor_mode(self, code: str, **kwargs) -> str:
+        """
+        Decide whether to refactor by edit hunks or by full rewrite.
+        
+        Args:
+            code: Code to refactor
+            **kwargs: May contain ``mode`` ("edit", "chunked", "rewrite" or "auto")
+            
+        Returns:
+            "edit", "chunked" or "rewrite"
+        """
+        mode = kwargs.get("mode", self.config.get("refactor_mode", "rewrite"))
+        if mode == "auto":
+            min_lines = self.config.get("edit_mode_min_lines", 200)
+            return "edit" if code.count("\n") + 1 >= min_lines else "rewrite"
+        return mode
+    
+    def _refactor_in_chunks(self, code: str, instructions: str, **kwargs) -> Optional[str]:
+        """
+        Refactor a large file unit by unit.
+        
+        The file is split into top-level functions and classes, which are
+        refactored in batches with the file's imports and the signatures of
+        the other units as shared context. Latency is then bounded by the
+        largest unit rather than the whole file.
+        
+        Args:
+            code: Code to refactor
+            instructions: Refactoring instructions
+            **kwargs: Additional parameters (``language`` is required)
+            
+        Returns:
+            Refactored code, or None if the file cannot be split or the
+            reassembled result failed validation
+        """
+        from ..utils.code_utils import extract_code_blocks, normalize_fence_language, split_code_units
+        
+        language = kwargs.get("language", "")
+        try:
+            segments = split_code_units(code, language)
+        except (SyntaxError, ValueError) as e:
+            self.logger.warning("Cannot split code into units: %s", e)
+            return None
+        
+        units = [segment for segment in segments if segment.is_unit]
+        if len(units) < 2:
+            return None
+        
+        # Shared context: everything outside the units plus unit signatures
+        context = "".join(segment.text for segment in segments if not segment.is_unit).strip()
+        signatures = "\n".join(unit.text.strip().splitlines()[0] for unit in units)
+        system_prompt = self.config.get("system_prompt", "")
+        prompts = [
+            f"{system_prompt}\n\n"
+            f"Refactor the following code according to these instructions: {instructions}\n"
+            "It is one part of a larger file. Keep its name and interface unchanged and "
+            "reply with the refactored part only, in a single code block.\n\n"
+            f"File context:\n```{language}\n{context}\n{signatures}\n```\n\n"
+            f"Part to refactor:\n```{language}\n{unit.text.strip()}\n```\n\n"
+            for unit in units
+        ]
+        
+        batch_size = (self.performance_profile or {}).get("batch_size") or self.config.get("chunk_batch_size", 4)
+        self.logger.info("Refactoring %d units in batches of %d", len(units), batch_size)
+        outputs = []
+        for start in range(0, len(prompts), batch_size):
+            outputs.extend(self._generate_batch(prompts[start:start + batch_size], **kwargs))
+        
+        wanted = normalize_fence_language(language)
+        for unit, output in zip(units, outputs):
+            # Blocks tagged with another language (e.g. a usage example) are not the unit
+            blocks = [
+                block
+                for lang, blocks in extract_code_blocks(output).items() if lang in ("", wanted)
+                for block in blocks
+            ]
+            if not blocks:
+                self.logger.warning("No code returned for unit %s; keeping original", unit.name)
+                continue
+            # Python units are standalone statements and can be checked alone
+            if language.lower() == "python" and not self.validate_code(blocks[0], language):
+                self.logger.warning("Refactored unit %s is invalid; keeping original", unit.name)
+                continue
+            trailing = unit.text[len(unit.text.rstrip()):]
+            unit.text = blocks[0] + trailing
+        
+        refactored_code = "".join(segment.text for segment in segments)
+        if not self.validate_code(refactored_code, language):
+            self.logger.warning("Reassembled code failed validation")
+            return None
+        return self.format_code(refactored_code, language)
+    
+    def _refactor_with_edits(self, code: str, instructions: str, **kwargs) -> Optional[str]:
+        """
+        Refactor code by asking the model for targeted edit hunks.
+        
+        Only the changed regions are decoded, which is far cheaper than
+        re-emitting a large file.
+        
+        Args:
+            code: Code to refactor
+            instructions: Refactoring instructions
+            **kwargs: Additional parameters (e.g. ``language``)
+            
+        Returns:
+            Refactored code, or None if the hunks could not be applied or the
+            result failed validation
+        """
+        from ..utils.code_utils import (
+            EDIT_DIVIDER_MARKER,
+            EDIT_REPLACE_MARKER,
+            EDIT_SEARCH_MARKER,
+            EditApplyError,
+            apply_edit_hunks,
+            parse_edit_hunks,
+        )
+        
+        language = kwargs.get("language", "")
+        system_prompt = self.config.get("system_prompt", "")
+        refactor_prompt = (
+            f"Refactor the following code according to these instructions: {instructions}\n"
+            "Do not rewrite the whole file. Reply only with edit hunks that copy the "
+            "original lines exactly, in this format:\n"
+            f"{EDIT_SEARCH_MARKER}\n<original lines>\n{EDIT_DIVIDER_MARKER}\n"
+            f"<replacement lines>\n{EDIT_REPLACE_MARKER}"
+        )
+        full_prompt = f"{system_prompt}\n\n{refactor_prompt}\n\n```\n{code}\n```\n\n"
+        
+        generated_text = self._generate(full_prompt, **kwargs)
+        
+        try:
+            hunks = parse_edit_hunks(generated_text)
+            if not hunks:
+                raise EditApplyError("No edit hunks in model output")
+            refactored_code = apply_edit_hunks(code, hunks)
+        except EditApplyError as e:
+            self.logger.warning("Edit mode failed: %s", e)
+            return None
+        
+        if language and not self.validate_code(refactored_code, language):
+            self.logger.warning("Edited code failed validation")
+            return None
+        
+        self.logger.info("Applied %d edit hunks", len(hunks))
+        return self.format_code(refactored_code, language) if language else refactored_code
+    
+    def _embed_prompt(self, text: str):
+        """
+        Embed a prompt for semantic cache lookups.
+        
+        The embedding is the mean of the model's last hidden states over the
+        prompt tokens, so it only costs a prefill of the user prompt.
+        
+        Args:
+            text: Prompt to embed
+            
+        Returns:
+            1-D numpy array
+        """
+        tokenizer = self.model["tokenizer"]
+        inputs = tokenizer(text, return_tensors="pt").to(self.device)
+        with torch.no_grad():
+            output = self.model["model"](inputs.input_ids, output_hidden_states=True)
+        return output.hidden_states[-1][0].float().mean(dim=0).cpu().numpy()
+    
+    def _post_process_block(self, code: str, language: str) -> str:
+        """
+        Format and validate a code block extracted from model output.
+        
+        Args:
+            code: Code block contents
+            language: Programming language of the block
+            
+        Returns:
+            Formatted code (unchanged for unsupported languages)
+        """
+        if language.lower() not in ("python", "cpp", "c++"):
+            return code
+        code = self.format_code(code, language)
+        if not self.validate_code(code, language):
+            self.logger.warning("Generated %s block failed validation", language)
+        return code
+    
+    def start_session(self) -> str:
+        """
+        Start a multi-turn session.
+        
+        Returns:
+            Session id to pass to :meth:`chat`
+        """
+        return self.sessions.create().session_id
+    
+    def chat(self, session_id: str, message: str, **kwargs) -> str:
+        """
+        Send a message in a session and get the model's reply.
+        
+        The session keeps the KV cache of the conversation, so only the new
+        message is prefilled. If the cache was evicted it is reloaded from
+        disk or rebuilt from the conversation tokens.
+        
+        Args:
+            session_id: Id returned by :meth:`start_session`
+            message: User message
+            **kwargs: Additional generation parameters (e.g. ``streamer``)
+            
+        Returns:
+            The model's reply
+            
+        Raises:
+            KeyError: If the session does not exist
+            ValueError: If the conversation exceeds the context window
+        """
+        from transformers import DynamicCache
+        
+        session = self.sessions.get(session_id)
+        with session.lock:
+            tokenizer = self.model["tokenizer"]
+            if session.token_ids is None:
+                system_prompt = self.config.get("system_prompt", "")
+                turn = tokenizer(f"{system_prompt}\n\nUser: {message}\n\nAssistant:", return_tensors="pt")
+            else:
+                turn = tokenizer(f"\n\nUser: {message}\n\nAssistant:", return_tensors="pt", add_special_tokens=False)
+            
+            new_ids = turn.input_ids.to(self.device)
+            if session.token_ids is not None:
+                new_ids = torch.cat([session.token_ids, new_ids], dim=-1)
+            
+            context_window = self.config.get("context_window")
+            if context_window and new_ids.shape[-1] >= context_window:
+                raise ValueError(f"Session {session_id} exceeds the context window")
+            
+            generate_kwargs = self._generation_kwargs(**kwargs)
+            cache = self.sessions.load_cache(session, self.device)
+            if cache is None:
+                if session.token_ids is not None:
+                    self.logger.info("Rebuilding evicted cache for session %s", session_id)
+                cache = DynamicCache()
+            cached_tokens = cache.get_seq_length()
+            
+            with torch.no_grad():
+                output = self.model["model"].generate(
+                    new_ids,
+                    attention_mask=torch.ones_like(new_ids),
+                    past_key_values=cache,
+                    pad_token_id=tokenizer.eos_token_id,
+                    streamer=kwargs.get("streamer"),
+                    **generate_kwargs
+                )
+            reply = tokenizer.decode(output[0, new_ids.shape[-1]:], skip_special_tokens=True).strip()
+            
+            try:
+                self._check_cancelled(generate_kwargs, reply, **kwargs)
+            except GenerationCancelled:
+                # Discard the interrupted turn so the session stays consistent
+                if hasattr(cache, "crop"):
+                    cache.crop(cached_tokens)
+                    session.cache = cache
+                else:
+                    session.cache = None
+                raise
+            
+            session.token_ids = output
+            session.cache = cache
+            return reply
+    
+    def end_session(self, session_id: str):
+        """
+        End a session and release its cache.
+        
+        Args:
+            session_id: Id returned by :meth:`start_session`
+        """
+        self.sessions.close(session_id)
+    
     def validate_code(self, code: str, language: str) -> bool:
         """
         Validate the syntax of generated code.
@@ -97,6 +788,47 @@ class BaseAgent(ABC):
         # Implementation will depend on the language
         raise NotImplementedError
     
+    def run_tests(self, code: str, tests: str, timeout: Optional[float] = None) -> ExecutionResult:
+        """
+        Run Python code against tests in the sandbox pool.
+        
+        Args:
+            code: Python code under test
+            tests: Asserts and/or ``test_*`` functions exercising the code
+            timeout: Wall-clock limit in seconds (defaults to the sandbox config)
+            
+        Returns:
+            ExecutionResult with pass/fail and timing per test
+        """
+        with self._sandbox_lock:
+            if self._sandbox is None:
+                sandbox_config = self.config.get("sandbox", {})
+                self._sandbox = SandboxPool(
+                    size=sandbox_config.get("workers", 2),
+                    timeout=sandbox_config.get("timeout", 5.0),
+                    memory_limit_mb=sandbox_config.get("memory_limit_mb", 512)
+                )
+        result = self._sandbox.run(code, tests, timeout)
+        self.logger.info(
+            "Sandbox run %s in %.1f ms",
+            "passed" if result.passed else "failed",
+            result.duration * 1000
+        )
+        return result
+    
+    def close(self):
+        """Release the model weights and sandbox workers."""
+        with self._sandbox_lock:
+            if self._sandbox is not None:
+                self._sandbox.close()
+                self._sandbox = None
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+            self.prefetcher = None
+        self.model = None
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    
     def get_model_info(self) -> Dict[str, Any]:
         """
         Get information about the loaded model.
@@ -106,5 +838,11 @@ class BaseAgent(ABC):
         """
         return {
             "model_path": self.model_path,
-            "config": self.config
+            "config": self.config,
+            "performance_profile": self.performance_profile,
+            "output_lengths": self.output_lengths.get_stats() if self.output_lengths else None,
+            "offload": {
+                "placement": self.offload_plan.describe(),
+                "prefetch": self.prefetcher.get_stats() if self.prefetcher else None,
+            } if self.offload_plan else None
         }
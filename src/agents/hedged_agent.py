@@ -0,0 +1,191 @@
+"""Hedged requests across several agents."""
+
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+from ..utils.cancellation import CancellationToken, GenerationCancelled, token_from_kwargs
+from ..utils.latency import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+
+class HedgedAgent:
+    """
+    Run a request on several agents and return the first valid result.
+    
+    The primary agent starts immediately; each further agent starts after
+    ``hedge_delay`` seconds if no valid result has arrived yet (a delay of 0
+    runs all agents concurrently). Generated or refactored code must pass
+    the producing agent's ``validate_code``; explanations only need to be
+    non-empty. Once a result is accepted the remaining agents are
+    cancelled at their next decode step.
+    
+    If the caller cancels or its deadline passes, every running agent is
+    stopped and, like a single agent, the call either returns the partial
+    output (``return_partial``) or raises :class:`GenerationCancelled`
+    carrying it. Partial output comes from the most preferred agent that
+    produced any.
+    """
+    
+    def __init__(self, agents: List, hedge_delay: float = 0.0):
+        """
+        Initialize the hedged agent.
+        
+        Args:
+            agents: Agents in order of preference (e.g. [ClaudeAgent, QwenAgent])
+            hedge_delay: Seconds to wait before starting each backup agent
+        """
+        if not agents:
+            raise ValueError("HedgedAgent needs at least one agent")
+        self.agents = agents
+        self.hedge_delay = hedge_delay
+        self.latency = LatencyTracker()
+        self._executor = ThreadPoolExecutor(
+            max_workers=4 * len(agents),
+            thread_name_prefix="hedged-agent"
+        )
+        self._wins: Dict[str, int] = {}
+    
+    @staticmethod
+    def _name(agent) -> str:
+        return agent.config.get("model_name", agent.__class__.__name__)
+    
+    def _race(self, call: Callable[..., str], code_language: Optional[str], **kwargs) -> str:
+        caller_token = token_from_kwargs(kwargs)
+        kwargs.pop("cancel_token", None)
+        if kwargs.get("streamer") is not None:
+            # A token stream can only come from one agent
+            return call(self.agents[0], cancel_token=caller_token, **kwargs)
+        
+        start = time.perf_counter()
+        # Each agent gets its own token so losers can be cancelled, sharing the caller's deadline
+        deadline = caller_token.deadline if caller_token is not None else None
+        tokens = [CancellationToken(deadline) for _ in self.agents]
+        
+        def run(index: int):
+            agent = self.agents[index]
+            result = call(agent, cancel_token=tokens[index], **kwargs)
+            self.latency.record(self._name(agent), time.perf_counter() - start)
+            valid = bool(result.strip()) if code_language is None else agent.validate_code(result, code_language)
+            return result, valid
+        
+        futures = {self._executor.submit(run, 0): 0}
+        next_agent = 1
+        fallback, error = None, None
+        try:
+            while futures:
+                if next_agent < len(self.agents):
+                    timeout = max(0.0, start + self.hedge_delay * next_agent - time.perf_counter())
+                else:
+                    timeout = 0.05 if caller_token is not None else None
+                done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+                
+                if caller_token is not None and caller_token.stop_reason is not None:
+                    return self._stop(caller_token.stop_reason, futures, tokens, **kwargs)
+                
+                for future in done:
+                    index = futures.pop(future)
+                    try:
+                        result, valid = future.result()
+                    except Exception as e:
+                        logger.warning("Agent %s failed: %s", self._name(self.agents[index]), e)
+                        error = e
+                        continue
+                    if valid:
+                        name = self._name(self.agents[index])
+                        self._wins[name] = self._wins.get(name, 0) + 1
+                        self.latency.record("hedged", time.perf_counter() - start)
+                        return result
+                    if fallback is None:
+                        fallback = result
+                
+                # Start the next backup once its delay has passed (or everything failed)
+                due = start + self.hedge_delay * next_agent <= time.perf_counter()
+                if next_agent < len(self.agents) and (due or not futures):
+                    logger.debug("Hedging request to %s", self._name(self.agents[next_agent]))
+                    futures[self._executor.submit(run, next_agent)] = next_agent
+                    next_agent += 1
+        finally:
+            for token in tokens:
+                token.cancel()
+        
+        self.latency.record("hedged", time.perf_counter() - start)
+        if fallback is not None:
+            logger.warning("No agent produced a valid result; returning the first result")
+            return fallback
+        raise error
+    
+    def _stop(self, reason: str, futures: Dict, tokens: List[CancellationToken], **kwargs) -> str:
+        """
+        Stop the running agents and return or raise their partial output.
+        
+        Args:
+            reason: Why the caller stopped ("cancelled" or "timed out")
+            futures: Running agent calls mapped to their agent index
+            tokens: Cancellation tokens of the agents
+            **kwargs: Agent call parameters (``return_partial``)
+            
+        Returns:
+            Partial output, if ``return_partial`` is set
+            
+        Raises:
+            GenerationCancelled: If ``return_partial`` is not set
+        """
+        for token in tokens:
+            token.cancel()
+        # Agents stop at their next decode step
+        wait(futures)
+        
+        partials = {}
+        for future, index in futures.items():
+            try:
+                partials[index] = future.result()[0]
+            except GenerationCancelled as e:
+                partials[index] = e.partial_output
+            except Exception as e:
+                logger.warning("Agent %s failed: %s", self._name(self.agents[index]), e)
+        partial_output = next((partials[index] for index in sorted(partials) if partials[index]), "")
+        
+        if not kwargs.get("return_partial", False):
+            raise GenerationCancelled(reason, partial_output)
+        logger.info("Returning partial output (generation %s)", reason)
+        return partial_output
+    
+    def generate_code(self, prompt: str, language: str, **kwargs) -> str:
+        """Generate code with the first agent to produce valid code."""
+        return self._race(lambda agent, **kw: agent.generate_code(prompt, language, **kw), language, **kwargs)
+    
+    def explain_code(self, code: str, **kwargs) -> str:
+        """Explain code with the first agent to answer."""
+        return self._race(lambda agent, **kw: agent.explain_code(code, **kw), None, **kwargs)
+    
+    def refactor_code(self, code: str, instructions: str, **kwargs) -> str:
+        """Refactor code with the first agent to produce valid code."""
+        language = kwargs.get("language") or None
+        return self._race(
+            lambda agent, **kw: agent.refactor_code(code, instructions, **kw), language, **kwargs
+        )
+    
+    def validate_code(self, code: str, language: str) -> bool:
+        """Validate code with the primary agent."""
+        return self.agents[0].validate_code(code, language)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get hedging statistics.
+        
+        Returns:
+            Dictionary with latency percentiles (overall as "hedged" and per
+            agent) and the number of races each agent won
+        """
+        return {"latency": self.latency.get_stats(), "wins": dict(self._wins)}
+    
+    def close(self):
+        """Shut down the worker threads and release every agent."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        for agent in self.agents:
+            close = getattr(agent, "close", None)
+            if callable(close):
+                close()
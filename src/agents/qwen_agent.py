@@ -4,84 +4,121 @@ from transformers import AutoModelForCausalLM, AutoTokenizer
 import os
 import logging
 from .base_agent import BaseAgent
+from ..utils.perf_profile import apply_performance_profile, load_performance_profile, profile_dtype
 
 class QwenAgent(BaseAgent):
     """Implementation of AI coding agent using Qwen"""
     
     def __init__(self, model_path: str, config: Dict[str, Any]):
-        super().__init__(model_path, config)
+        # The device must be known before the base class loads the model
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.logger.info(f"Using device: {self.device}")
+        super().__init__(model_path, config)
+        self.logger.info("Using device: %s", self.device)
         
     def _load_model(self):
         """Load Qwen model."""
         try:
-            self.logger.info(f"Loading Qwen model from {self.model_path}")
+            self.logger.info("Loading Qwen model from %s", self.model_path)
             
             if not os.path.exists(self.model_path):
                 raise FileNotFoundError(f"Model path does not exist: {self.model_path}")
                 
+            # Apply settings measured by initialize_models.py --autotune
+            torch_dtype = torch.float16 if self.device.type == "cuda" else torch.float32
+            if self.device.type == "cpu":
+                self.performance_profile = load_performance_profile(self.model_path)
+                if self.performance_profile is not None:
+                    apply_performance_profile(self.performance_profile)
+                    torch_dtype = profile_dtype(self.performance_profile, torch_dtype)
+                
             # Load tokenizer and model
             tokenizer = AutoTokenizer.from_pretrained(
                 self.model_path, 
                 trust_remote_code=True
             )
+            # Keep layers beyond the RAM budget on disk if offload is enabled
+            offload_kwargs = self._offload_load_kwargs(torch_dtype, trust_remote_code=True)
             model = AutoModelForCausalLM.from_pretrained(
                 self.model_path,
-                torch_dtype=torch.float16 if self.device.type == "cuda" else torch.float32,
+                torch_dtype=torch_dtype,
                 low_cpu_mem_usage=True,
-                device_map="auto" if self.device.type == "cuda" else None,
-                trust_remote_code=True
+                trust_remote_code=True,
+                **(offload_kwargs or {"device_map": "auto" if self.device.type == "cuda" else None})
             )
             
-            model.to(self.device)
+            if offload_kwargs is None:
+                model.to(self.device)
+            else:
+                self._attach_prefetcher(model)
             self.logger.info("Qwen model loaded successfully")
             
             return {"model": model, "tokenizer": tokenizer}
         except Exception as e:
-            self.logger.error(f"Failed to load Qwen model: {str(e)}")
+            self.logger.error("Failed to load Qwen model: %s", e)
             raise
     
     def generate_code(self, prompt: str, language: str, **kwargs) -> str:
         """Generate code using Qwen"""
         try:
-            self.logger.info(f"Generating {language} code from prompt")
+            self.logger.info("Generating %s code from prompt", language)
+            
+            best_of = kwargs.get("best_of", self.config.get("best_of", 1))
+            
+            # Serve paraphrases of earlier prompts from the semantic cache.
+            # Cached code was only syntax-checked, so requests whose tests
+            # will run (Python only) or asking for best-of-N selection are
+            # always generated.
+            runs_tests = bool(kwargs.get("tests")) and language.lower() == "python"
+            embedding = None
+            if self.semantic_cache is not None and kwargs.get("streamer") is None:
+                embedding = self._embed_prompt(prompt)
+                if best_of <= 1 and not runs_tests:
+                    cached = self.semantic_cache.lookup(language, embedding)
+                    if cached is not None:
+                        self.logger.info("Serving generated code from semantic cache")
+                        return cached
             
             # Prepare the prompt with appropriate formatting
             system_prompt = self.config.get("system_prompt", "")
             language_prompt = f"Generate {language} code for the following task:"
             full_prompt = f"{system_prompt}\n\n{language_prompt}\n\n{prompt}\n\n"
             
-            # Tokenize input
-            inputs = self.model["tokenizer"](full_prompt, return_tensors="pt").to(self.device)
-            
-            # Generate response
-            with torch.no_grad():
-                output = self.model["model"].generate(
-                    inputs.input_ids,
-                    max_new_tokens=self.config.get("max_tokens", 2048),
-                    temperature=self.config.get("temperature", 0.7),
-                    top_p=self.config.get("top_p", 0.95),
-                    do_sample=True,
-                    pad_token_id=self.model["tokenizer"].eos_token_id
-                )
-            
-            # Decode the response
-            generated_text = self.model["tokenizer"].decode(output[0], skip_special_tokens=True)
-            
-            # Extract just the generated code (remove the prompt)
-            code = generated_text[len(full_prompt):].strip()
-            
-            # Format the code
-            from ..utils.code_utils import format_python_code, format_cpp_code
-            if language.lower() == "python":
-                code = format_python_code(code, self.config)
-            elif language.lower() in ["cpp", "c++"]:
-                code = format_cpp_code(code, self.config)
+            # Optionally mask tokens that would break the syntax
+            kwargs = {
+                **kwargs,
+                "logits_processor": self._grammar_processor(language, kwargs.get("constrained")),
+                "length_key": ("generate", language, len(prompt)),
+            }
+            
+            if best_of > 1 and kwargs.get("streamer") is None:
+                # Sample candidates in one batch and keep the first valid one
+                candidates = self._generate_candidates(full_prompt, best_of, **kwargs)
+                code = self._select_valid_candidate(candidates, language, kwargs.get("tests"))
+            elif kwargs.get("tests"):
+                # A single candidate is checked against the tests the same way
+                generated_text = self._generate(full_prompt, **kwargs)
+                code = self._select_valid_candidate([generated_text], language, kwargs["tests"])
+            else:
+                # Generate response (prompt removed)
+                generated_text = self._generate(full_prompt, **kwargs)
+                
+                # Extract just the generated code (remove the prompt)
+                code = generated_text.strip()
+                
+                # Format the code
+                from ..utils.code_utils import format_python_code, format_cpp_code
+                if language.lower() == "python":
+                    code = format_python_code(code, self.config)
+                elif language.lower() in ["cpp", "c++"]:
+                    code = format_cpp_code(code, self.config)
+            
+            # Only validated results are reused for later prompts
+            if embedding is not None and self.validate_code(code, language):
+                self.semantic_cache.add(language, embedding, code)
                 
             return code
         except Exception as e:
-            self.logger.error(f"Code generation failed: {str(e)}")
+            self.logger.error("Code generation failed: %s", e)
             raise
     
     def explain_code(self, code: str, **kwargs) -> str:
@@ -94,29 +131,18 @@ class QwenAgent(BaseAgent):
             explanation_prompt = "Explain the following code in detail, including its purpose, functionality, and any notable patterns or techniques used:"
             full_prompt = f"{system_prompt}\n\n{explanation_prompt}\n\n```\n{code}\n```\n\n"
             
-            # Tokenize input
-            inputs = self.model["tokenizer"](full_prompt, return_tensors="pt").to(self.device)
-            
-            # Generate response
-            with torch.no_grad():
-                output = self.model["model"].generate(
-                    inputs.input_ids,
-                    max_new_tokens=self.config.get("max_tokens", 2048),
-                    temperature=self.config.get("temperature", 0.7),
-                    top_p=self.config.get("top_p", 0.95),
-                    do_sample=True,
-                    pad_token_id=self.model["tokenizer"].eos_token_id
-                )
-            
-            # Decode the response
-            generated_text = self.model["tokenizer"].decode(output[0], skip_special_tokens=True)
+            # Generate response (prompt removed)
+            generated_text = self._generate(
+                full_prompt,
+                **{**kwargs, "length_key": ("explain", kwargs.get("language", ""), len(code))}
+            )
             
             # Extract just the explanation (remove the prompt)
-            explanation = generated_text[len(full_prompt):].strip()
+            explanation = generated_text.strip()
                 
             return explanation
         except Exception as e:
-            self.logger.error(f"Code explanation failed: {str(e)}")
+            self.logger.error("Code explanation failed: %s", e)
             raise
     
     def refactor_code(self, code: str, instructions: str, **kwargs) -> str:
@@ -124,55 +150,62 @@ class QwenAgent(BaseAgent):
         try:
             self.logger.info("Refactoring code")
             
+            # Large files are refactored through targeted edit hunks or unit by
+            # unit, falling back to a full rewrite if that fails
+            mode = self._refactor_mode(code, **kwargs)
+            if mode in ("edit", "chunked"):
+                if mode == "edit":
+                    refactored_code = self._refactor_with_edits(code, instructions, **kwargs)
+                else:
+                    refactored_code = self._refactor_in_chunks(code, instructions, **kwargs)
+                if refactored_code is not None:
+                    return refactored_code
+                self.logger.info("Falling back to full rewrite")
+            
             # Prepare the prompt
             system_prompt = self.config.get("system_prompt", "")
             refactor_prompt = f"Refactor the following code according to these instructions: {instructions}"
             full_prompt = f"{system_prompt}\n\n{refactor_prompt}\n\n```\n{code}\n```\n\n"
             
-            # Tokenize input
-            inputs = self.model["tokenizer"](full_prompt, return_tensors="pt").to(self.device)
-            
-            # Generate response
-            with torch.no_grad():
-                output = self.model["model"].generate(
-                    inputs.input_ids,
-                    max_new_tokens=self.config.get("max_tokens", 2048),
-                    temperature=self.config.get("temperature", 0.7),
-                    top_p=self.config.get("top_p", 0.95),
-                    do_sample=True,
-                    pad_token_id=self.model["tokenizer"].eos_token_id
-                )
-            
-            # Decode the response
-            generated_text = self.model["tokenizer"].decode(output[0], skip_special_tokens=True)
-            
-            # Extract just the refactored code (remove the prompt)
-            from ..utils.code_utils import extract_code_blocks
-            code_blocks = extract_code_blocks(generated_text[len(full_prompt):])
+            # Format and validate each code block as soon as it is closed,
+            # overlapping post-processing with the rest of generation. Blocks
+            # are handled in their fence's language; untagged ones in the target's
+            from ..utils.code_utils import normalize_fence_language
+            from ..utils.streaming import CodeBlockStreamer
+            language = kwargs.get("language", "")
+            block_streamer = CodeBlockStreamer(
+                self.model["tokenizer"],
+                lambda lang, block: self._post_process_block(block, lang or language),
+                downstream=kwargs.get("streamer")
+            )
+            generated_text = self._generate(
+                full_prompt,
+                **{
+                    **kwargs,
+                    "streamer": block_streamer,
+                    "length_key": ("refactor", language, len(code)),
+                    "logits_processor": self._grammar_processor(
+                        language, kwargs.get("constrained"), start_in_text=True
+                    ),
+                }
+            )
+            code_blocks = block_streamer.results(generated_text)
             
             # Get the refactored code
-            language = kwargs.get("language", "")
-            if language and language in code_blocks:
-                refactored_code = code_blocks[language][0]
-            else:
+            wanted = normalize_fence_language(language)
+            matching = [block for lang, block in code_blocks if wanted and lang == wanted]
+            if matching:
+                refactored_code = matching[0]
+            elif code_blocks:
                 # If language not specified or not found, use the first code block
-                for lang, blocks in code_blocks.items():
-                    refactored_code = blocks[0]
-                    break
-                else:
-                    # If no code blocks found, use the entire generated text
-                    refactored_code = generated_text[len(full_prompt):].strip()
-            
-            # Format the code
-            from ..utils.code_utils import format_python_code, format_cpp_code
-            if language.lower() == "python":
-                refactored_code = format_python_code(refactored_code, self.config)
-            elif language.lower() in ["cpp", "c++"]:
-                refactored_code = format_cpp_code(refactored_code, self.config)
+                refactored_code = code_blocks[0][1]
+            else:
+                # If no code blocks found, use the entire generated text
+                refactored_code = self._post_process_block(generated_text.strip(), language)
                 
             return refactored_code
         except Exception as e:
-            self.logger.error(f"Code refactoring failed: {str(e)}")
+            self.logger.error("Code refactoring failed: %s", e)
             raise
     
     def validate_code(self, code: str, language: str) -> bool:
@@ -184,7 +217,7 @@ class QwenAgent(BaseAgent):
         elif language.lower() in ["cpp", "c++"]:
             return validate_cpp_syntax(code)
         else:
-            self.logger.warning(f"Validation not implemented for language: {language}")
+            self.logger.warning("Validation not implemented for language: %s", language)
             return True
     
     def format_code(self, code: str, language: str) -> str:
@@ -196,5 +229,5 @@ class QwenAgent(BaseAgent):
         elif language.lower() in ["cpp", "c++"]:
             return format_cpp_code(code, self.config)
         else:
-            self.logger.warning(f"Formatting not implemented for language: {language}")
+            self.logger.warning("Formatting not implemented for language: %s", language)
             return code
@@ -0,0 +1,239 @@
+"""Complexity-based routing between small and large agents."""
+
+import ast
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Relative cost of each action before looking at the input
+ACTION_WEIGHTS = {"explain": 0.0, "generate": 0.3, "refactor": 0.6}
+
+
+def count_ast_nodes(code: str, language: str) -> int:
+    """
+    Estimate the structural size of a piece of code.
+    
+    Args:
+        code: Source code
+        language: Programming language
+        
+    Returns:
+        Number of AST nodes for Python, or non-empty lines otherwise (also
+        used when the Python code does not parse)
+    """
+    if language == "python":
+        try:
+            return sum(1 for _ in ast.walk(ast.parse(code)))
+        except (SyntaxError, ValueError):
+            pass
+    return sum(1 for line in code.splitlines() if line.strip())
+
+
+class RoutedAgent:
+    """
+    Send each request to the smallest agent expected to handle it.
+    
+    A request is scored from its input token count, the AST size of any
+    code it carries and its action. Low scores start at the smallest agent
+    and high scores skip straight to a larger one. Generated and refactored
+    code that fails ``validate_code`` is retried on the next larger agent.
+    Validation outcomes are tracked per agent, action and language over
+    the last ``window`` requests, and an agent whose success rate drops
+    below ``min_success_rate`` is skipped for that kind of request. Every
+    ``probe_interval``-th request that would skip it is sent to it anyway,
+    so the rate keeps being measured and the agent is used again once it
+    recovers.
+    """
+    
+    def __init__(
+        self,
+        agents: List,
+        thresholds: Optional[List[float]] = None,
+        min_success_rate: float = 0.6,
+        min_samples: int = 10,
+        window: int = 50,
+        probe_interval: int = 20
+    ):
+        """
+        Initialize the router.
+        
+        Args:
+            agents: Agents ordered from smallest to largest
+            thresholds: Score above which a request starts at agent i + 1
+                (one value per agent except the largest)
+            min_success_rate: Validation success rate below which an agent
+                is skipped for a given action and language
+            min_samples: Outcomes needed before the success rate is trusted
+            window: Most recent outcomes the success rate is computed from
+            probe_interval: Send every n-th request that would skip an agent
+                to it anyway (0 never probes)
+        """
+        if not agents:
+            raise ValueError("RoutedAgent needs at least one agent")
+        self.agents = agents
+        self.thresholds = thresholds if thresholds is not None else [1.0] * (len(agents) - 1)
+        if len(self.thresholds) != len(agents) - 1:
+            raise ValueError("Expected one threshold per agent except the largest")
+        self.min_success_rate = min_success_rate
+        self.min_samples = min_samples
+        self.window = window
+        self.probe_interval = probe_interval
+        self._lock = threading.Lock()
+        self._outcomes: Dict[Tuple[int, str, str], deque] = {}
+        self._skipped: Dict[Tuple[int, str, str], int] = {}
+        self._routed = [0] * len(agents)
+        self._escalations = 0
+        self._probes = 0
+    
+    def score(self, action: str, text: str, language: str = "", code: str = "") -> float:
+        """
+        Score how demanding a request is.
+        
+        Args:
+            action: "generate", "explain" or "refactor"
+            text: Full request text (prompt, code and instructions)
+            language: Programming language of the code, if known
+            code: Code carried by the request, if any
+            
+        Returns:
+            Score where roughly 1.0 or more calls for a larger model
+        """
+        tokenizer = self.agents[0].model["tokenizer"]
+        num_tokens = len(tokenizer(text, add_special_tokens=False)["input_ids"])
+        score = ACTION_WEIGHTS.get(action, 0.5) + num_tokens / 1024
+        if code:
+            score += count_ast_nodes(code, language) / 500
+        return score
+    
+    def _success_rate(self, index: int, action: str, language: str) -> Optional[float]:
+        with self._lock:
+            outcomes = self._outcomes.get((index, action, language), ())
+            if len(outcomes) < self.min_samples:
+                return None
+            return sum(outcomes) / len(outcomes)
+    
+    def _record(self, index: int, action: str, language: str, success: bool):
+        with self._lock:
+            outcomes = self._outcomes.setdefault((index, action, language), deque(maxlen=self.window))
+            outcomes.append(int(success))
+    
+    def _probe(self, index: int, action: str, language: str) -> bool:
+        """Count a request skipping an agent and decide whether to send it there anyway."""
+        if self.probe_interval <= 0:
+            return False
+        with self._lock:
+            key = (index, action, language)
+            self._skipped[key] = self._skipped.get(key, 0) + 1
+            if self._skipped[key] % self.probe_interval:
+                return False
+            self._probes += 1
+            return True
+    
+    def select(self, action: str, language: str, score: float) -> int:
+        """
+        Pick the agent a request starts at.
+        
+        Args:
+            action: Request action
+            language: Programming language
+            score: Request score from ``score``
+            
+        Returns:
+            Index into ``agents``
+        """
+        index = sum(1 for threshold in self.thresholds if score > threshold)
+        while index < len(self.agents) - 1:
+            rate = self._success_rate(index, action, language)
+            if rate is None or rate >= self.min_success_rate:
+                break
+            if self._probe(index, action, language):
+                logger.debug("Probing skipped agent %d with a %s request", index, action)
+                break
+            index += 1
+        return index
+    
+    def _route(
+        self,
+        action: str,
+        code_language: str,
+        text: str,
+        code: str,
+        call,
+        validate: bool,
+        **kwargs
+    ) -> str:
+        index = self.select(action, code_language, self.score(action, text, code_language, code))
+        with self._lock:
+            self._routed[index] += 1
+        
+        while True:
+            agent = self.agents[index]
+            result = call(agent, **kwargs)
+            if not validate or not code_language:
+                return result
+            
+            valid = agent.validate_code(result, code_language)
+            self._record(index, action, code_language, valid)
+            if valid or index == len(self.agents) - 1 or kwargs.get("streamer") is not None:
+                return result
+            
+            index += 1
+            with self._lock:
+                self._escalations += 1
+            logger.info(
+                "Escalating %s request to %s after failed validation",
+                action,
+                self.agents[index].config.get("model_name", "next agent")
+            )
+    
+    def generate_code(self, prompt: str, language: str, **kwargs) -> str:
+        """Generate code, escalating to a larger agent if it does not validate."""
+        return self._route(
+            "generate", language, prompt, "",
+            lambda agent, **kw: agent.generate_code(prompt, language, **kw),
+            True, **kwargs
+        )
+    
+    def explain_code(self, code: str, **kwargs) -> str:
+        """Explain code with the smallest adequate agent."""
+        return self._route(
+            "explain", kwargs.get("language", ""), code, code,
+            lambda agent, **kw: agent.explain_code(code, **kw),
+            False, **kwargs
+        )
+    
+    def refactor_code(self, code: str, instructions: str, **kwargs) -> str:
+        """Refactor code, escalating to a larger agent if it does not validate."""
+        return self._route(
+            "refactor", kwargs.get("language", ""), code + "\n" + instructions, code,
+            lambda agent, **kw: agent.refactor_code(code, instructions, **kw),
+            True, **kwargs
+        )
+    
+    def validate_code(self, code: str, language: str) -> bool:
+        """Validate code with the smallest agent."""
+        return self.agents[0].validate_code(code, language)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get routing statistics.
+        
+        Returns:
+            Dictionary with requests routed to each agent, escalations,
+            probes of skipped agents and recent validation success rates per
+            agent, action and language
+        """
+        names = [agent.config.get("model_name", str(i)) for i, agent in enumerate(self.agents)]
+        with self._lock:
+            return {
+                "routed": dict(zip(names, self._routed)),
+                "escalations": self._escalations,
+                "probes": self._probes,
+                "success_rates": {
+                    f"{names[index]}/{action}/{language}": sum(outcomes) / len(outcomes)
+                    for (index, action, language), outcomes in self._outcomes.items()
+                },
+            }
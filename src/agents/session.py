@@ -0,0 +1,154 @@
+"""Multi-turn sessions that keep the conversation's KV cache between turns."""
+
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import torch
+from transformers import DynamicCache
+
+logger = logging.getLogger(__name__)
+
+
+def _cache_tensors(cache) -> List[Tuple[torch.Tensor, torch.Tensor]]:
+    """Get per-layer (key, value) tensors from a cache."""
+    if hasattr(cache, "layers"):
+        return [(layer.keys, layer.values) for layer in cache.layers]
+    return list(zip(cache.key_cache, cache.value_cache))
+
+
+def _restore_cache(tensors: List[Tuple[torch.Tensor, torch.Tensor]]):
+    """Rebuild a cache from per-layer (key, value) tensors."""
+    if hasattr(DynamicCache, "from_legacy_cache"):
+        return DynamicCache.from_legacy_cache(tuple(tensors))
+    return DynamicCache(tensors)
+
+
+class Session:
+    """State of one conversation."""
+    
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.token_ids: Optional[torch.Tensor] = None  # Conversation so far, shape (1, n)
+        self.cache = None                               # KV cache covering token_ids[:, :-1]
+        self.spill_path: Optional[str] = None
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+    
+    @property
+    def num_tokens(self) -> int:
+        return 0 if self.token_ids is None else self.token_ids.shape[-1]
+
+
+class SessionManager:
+    """
+    Keep sessions and evict the KV caches of idle ones.
+    
+    When a session has been idle for ``idle_timeout`` seconds, or more than
+    ``max_cached`` sessions hold a cache, its cache is either spilled to
+    ``spill_dir`` or dropped. A dropped cache is rebuilt by re-prefilling the
+    conversation on the next turn, so eviction never loses history.
+    """
+    
+    def __init__(self, idle_timeout: float = 600, max_cached: int = 16, spill_dir: Optional[str] = None):
+        """
+        Initialize the session manager.
+        
+        Args:
+            idle_timeout: Seconds of inactivity before a cache is evicted
+            max_cached: Maximum number of sessions holding a cache in memory
+            spill_dir: Directory for spilled caches; caches are dropped if None
+        """
+        self.idle_timeout = idle_timeout
+        self.max_cached = max_cached
+        self.spill_dir = spill_dir
+        self._sessions: Dict[str, Session] = {}
+        self._lock = threading.Lock()
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+    
+    def create(self) -> Session:
+        """Create a new, empty session."""
+        session = Session(uuid.uuid4().hex)
+        with self._lock:
+            self._sessions[session.session_id] = session
+        return session
+    
+    def get(self, session_id: str) -> Session:
+        """
+        Get a session, evicting other idle caches first.
+        
+        Raises:
+            KeyError: If the session does not exist
+        """
+        self.evict_idle(exclude=session_id)
+        with self._lock:
+            session = self._sessions[session_id]
+        session.last_used = time.monotonic()
+        return session
+    
+    def close(self, session_id: str):
+        """Delete a session and any spilled cache."""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None and session.spill_path and os.path.exists(session.spill_path):
+            os.remove(session.spill_path)
+    
+    def load_cache(self, session: Session, device: Optional[torch.device] = None):
+        """
+        Get a session's cache, reloading it from disk if it was spilled.
+        
+        Args:
+            session: Session whose cache to load
+            device: Device to load a spilled cache onto
+            
+        Returns:
+            The cache, or None if it has to be rebuilt
+        """
+        if session.cache is None and session.spill_path:
+            tensors = torch.load(session.spill_path, map_location=device, weights_only=True)
+            session.cache = _restore_cache(tensors)
+            os.remove(session.spill_path)
+            session.spill_path = None
+            logger.debug("Reloaded spilled cache for session %s", session.session_id)
+        return session.cache
+    
+    def evict_idle(self, exclude: Optional[str] = None):
+        """
+        Evict caches of sessions that are idle or beyond ``max_cached``.
+        
+        Args:
+            exclude: Session id that must not be evicted
+        """
+        now = time.monotonic()
+        with self._lock:
+            cached = sorted(
+                (s for s in self._sessions.values() if s.cache is not None and s.session_id != exclude),
+                key=lambda s: s.last_used
+            )
+        excess = len(cached) - self.max_cached + (1 if exclude else 0)
+        for index, session in enumerate(cached):
+            if index < excess or now - session.last_used > self.idle_timeout:
+                self._evict(session)
+    
+    def _evict(self, session: Session):
+        # Sessions in use are skipped rather than waited for
+        if not session.lock.acquire(blocking=False):
+            return
+        try:
+            if session.cache is None:
+                return
+            if self.spill_dir:
+                session.spill_path = os.path.join(self.spill_dir, f"{session.session_id}.pt")
+                tensors = [(k.cpu(), v.cpu()) for k, v in _cache_tensors(session.cache)]
+                torch.save(tensors, session.spill_path)
+            session.cache = None
+            logger.debug("Evicted cache of session %s", session.session_id)
+        finally:
+            session.lock.release()
+    
+    def __len__(self) -> int:
+        return len(self._sessions)
@@ -2,38 +2,131 @@
 
 import argparse
 import logging
-import logging.config
+import os
 import sys
 from typing import Optional
 
-from agents.claude_agent import ClaudeAgent
-from agents.qwen_agent import QwenAgent
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.agents.claude_agent import ClaudeAgent
+from src.agents.hedged_agent import HedgedAgent
+from src.agents.qwen_agent import QwenAgent
+from src.agents.routed_agent import RoutedAgent
 from configs.agent_config import (
     CLAUDE_CONFIG,
     QWEN_CONFIG,
+    HEDGING_CONFIG,
+    ROUTER_CONFIG,
     LOGGING_CONFIG,
+    LOGGING_QUEUE_CONFIG,
     PYTHON_CONFIG,
     CPP_CONFIG,
 )
+from src.utils.logging_utils import setup_logging
+from src.utils.pipeline import PIPELINE_ACTIONS, DirectoryPipeline, default_journal_path, discover_files
+from src.utils.watch import WATCH_MODES, IncrementalAnalyzer, UnitResultStore, watch_directory
 
-# Configure logging
-logging.config.dictConfig(LOGGING_CONFIG)
 logger = logging.getLogger(__name__)
 
-def create_agent(agent_type: str, model_path: str):
+def create_agent(
+    agent_type: str,
+    model_path: str,
+    secondary_model_path: Optional[str] = None,
+    small_model_path: Optional[str] = None
+):
     """Create an AI coding agent instance."""
     if agent_type.lower() == "claude":
         return ClaudeAgent(model_path, CLAUDE_CONFIG)
     elif agent_type.lower() == "qwen":
         return QwenAgent(model_path, QWEN_CONFIG)
+    elif agent_type.lower() == "hedged":
+        if secondary_model_path is None:
+            raise ValueError("The hedged agent requires --secondary-model-path")
+        return HedgedAgent(
+            [ClaudeAgent(model_path, CLAUDE_CONFIG), QwenAgent(secondary_model_path, QWEN_CONFIG)],
+            hedge_delay=HEDGING_CONFIG["hedge_delay"]
+        )
+    elif agent_type.lower() == "routed":
+        if small_model_path is None:
+            raise ValueError("The routed agent requires --small-model-path")
+        return RoutedAgent(
+            [QwenAgent(small_model_path, QWEN_CONFIG), ClaudeAgent(model_path, CLAUDE_CONFIG)],
+            **ROUTER_CONFIG
+        )
     else:
         raise ValueError(f"Unknown agent type: {agent_type}")
 
+def run_chat(agent, first_message: Optional[str] = None):
+    """Run an interactive multi-turn session on the terminal."""
+    from transformers import TextStreamer
+    
+    session_id = agent.start_session()
+    streamer = TextStreamer(agent.model["tokenizer"], skip_prompt=True, skip_special_tokens=True)
+    print("Interactive session. Type /reset to start over or /exit to quit.")
+    
+    message = first_message
+    try:
+        while True:
+            if message is None:
+                try:
+                    message = input("\n>>> ").strip()
+                except EOFError:
+                    break
+            if message == "/exit":
+                break
+            if message == "/reset":
+                agent.end_session(session_id)
+                session_id = agent.start_session()
+            elif message:
+                agent.chat(session_id, message, streamer=streamer)
+            message = None
+    finally:
+        agent.end_session(session_id)
+
+def run_watch(agent, directory: str, mode: str, interval: float, cache_file: Optional[str] = None):
+    """Watch a directory and print analyses of changed functions and classes."""
+    store = UnitResultStore(cache_file)
+    analyzer = IncrementalAnalyzer(agent, mode, store)
+    
+    def report(path, analyses):
+        print(f"\n{path}")
+        for analysis in analyses:
+            if analysis.error is not None:
+                status = "INVALID" if analysis.result is False else "ERROR"
+                print(f"  {analysis.name}: {status} ({analysis.error})")
+            elif mode == "validate":
+                status = "valid" if analysis.result else "INVALID"
+                print(f"  {analysis.name}: {status}{' (unchanged)' if analysis.reused else ''}")
+            elif not analysis.reused:
+                print(f"  {analysis.name}:\n{analysis.result}\n")
+    
+    print(f"Watching {directory} ({mode}). Press Ctrl+C to stop.")
+    try:
+        watch_directory(directory, analyzer, report, interval)
+    except KeyboardInterrupt:
+        store.save()
+
+def run_directory(agent, args):
+    """Run an action over every matching file of a directory, resuming from the journal."""
+    journal = args.journal or default_journal_path(args.directory)
+    # Results written inside the tree must not be picked up as input by a rerun
+    files = discover_files(args.directory, args.pattern, exclude=[args.output_dir] if args.output_dir else None)
+    pipeline = DirectoryPipeline(
+        agent,
+        args.action,
+        journal,
+        output_dir=args.output_dir,
+        instructions=args.instructions
+    )
+    print(f"Processing {len(files)} files in {args.directory} (journal: {journal})")
+    report = pipeline.run(args.directory, files)
+    print(report.format())
+
 def main():
     parser = argparse.ArgumentParser(description="AI Coding Agent CLI")
     parser.add_argument(
         "--agent",
-        choices=["claude", "qwen"],
+        choices=["claude", "qwen", "hedged", "routed"],
         default="claude",
         help="Type of AI agent to use"
     )
@@ -42,50 +135,123 @@ def main():
         required=True,
         help="Path to the model weights"
     )
+    parser.add_argument(
+        "--secondary-model-path",
+        help="Path to the Qwen model weights when using the hedged agent"
+    )
+    parser.add_argument(
+        "--small-model-path",
+        help="Path to the small (Qwen) model weights when using the routed agent"
+    )
     parser.add_argument(
         "--language",
         choices=["python", "cpp"],
-        required=True,
-        help="Target programming language"
+        help="Target programming language (detected per file in watch mode)"
     )
     parser.add_argument(
         "action",
-        choices=["generate", "explain", "refactor"],
+        choices=["generate", "explain", "refactor", "validate", "chat", "watch"],
         help="Action to perform"
     )
     parser.add_argument(
         "input",
-        help="Input text (prompt for generation, code for explanation/refactoring)"
+        nargs="?",
+        help="Input text (prompt for generation, code for explanation/refactoring, "
+             "first chat message, directory to watch)"
+    )
+    parser.add_argument(
+        "--watch-mode",
+        choices=WATCH_MODES,
+        default="validate",
+        help="Analysis re-run on changed functions and classes in watch mode"
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=1.0,
+        help="Seconds between change scans in watch mode"
+    )
+    parser.add_argument(
+        "--cache-file",
+        help="JSON file keeping watch results between runs"
+    )
+    parser.add_argument(
+        "--directory",
+        help="Run explain, refactor or validate over the files of this directory"
+    )
+    parser.add_argument(
+        "--pattern",
+        help="File name pattern selecting files in --directory (e.g. \"*.py\")"
+    )
+    parser.add_argument(
+        "--instructions",
+        default="Improve code quality and efficiency",
+        help="Refactoring instructions"
+    )
+    parser.add_argument(
+        "--journal",
+        help="JSONL progress journal for --directory runs (default: under ~/.cache/ai-code/journals)"
+    )
+    parser.add_argument(
+        "--output-dir",
+        help="Directory receiving refactored files and explanations from --directory runs"
     )
     
     args = parser.parse_args()
+    # Configure logging (handlers run on a background listener thread)
+    setup_logging(LOGGING_CONFIG, LOGGING_QUEUE_CONFIG)
+    if args.directory is not None and args.action not in PIPELINE_ACTIONS:
+        parser.error(f"--directory is not supported with {args.action}")
+    if args.directory is not None and args.action == "refactor" and args.output_dir is None:
+        parser.error("refactoring a directory requires --output-dir")
+    if args.input is None and args.action != "chat" and args.directory is None:
+        parser.error(f"{args.action} requires an input")
+    if args.language is None and args.action in ("generate", "explain", "refactor", "validate") and args.directory is None:
+        parser.error(f"{args.action} requires --language")
+    if args.agent in ("hedged", "routed") and args.action == "chat":
+        parser.error(f"chat is not supported with the {args.agent} agent")
     
     try:
         # Create AI agent
-        agent = create_agent(args.agent, args.model_path)
-        logger.info(f"Created {args.agent} agent successfully")
+        agent = create_agent(
+            args.agent, args.model_path, args.secondary_model_path, args.small_model_path
+        )
+        logger.info("Created %s agent successfully", args.agent)
         
         # Perform requested action
-        if args.action == "generate":
+        if args.directory is not None:
+            run_directory(agent, args)
+        
+        elif args.action == "generate":
             result = agent.generate_code(args.input, args.language)
             print("\nGenerated Code:")
             print("=" * 80)
             print(result)
         
         elif args.action == "explain":
-            result = agent.explain_code(args.input)
+            result = agent.explain_code(args.input, language=args.language)
             print("\nCode Explanation:")
             print("=" * 80)
             print(result)
         
         elif args.action == "refactor":
-            result = agent.refactor_code(args.input, "Improve code quality and efficiency")
+            result = agent.refactor_code(args.input, args.instructions, language=args.language)
             print("\nRefactored Code:")
             print("=" * 80)
             print(result)
         
+        elif args.action == "validate":
+            valid = agent.validate_code(args.input, args.language)
+            print("Code is valid" if valid else "Code is invalid")
+        
+        elif args.action == "chat":
+            run_chat(agent, args.input)
+        
+        elif args.action == "watch":
+            run_watch(agent, args.input, args.watch_mode, args.interval, args.cache_file)
+        
     except Exception as e:
-        logger.error(f"Error: {str(e)}")
+        logger.error("Error: %s", e)
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -0,0 +1,310 @@
+"""Asynchronous HTTP API exposing the coding agents."""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+from transformers import TextStreamer
+
+from ..agents.base_agent import BaseAgent
+from ..agents.claude_agent import ClaudeAgent
+from ..agents.qwen_agent import QwenAgent
+from ..utils.cancellation import CancellationToken, GenerationCancelled
+from ..utils.logging_utils import request_context, setup_logging
+from ..utils.single_flight import CoalescingAgent
+from .host import AgentHost
+from .scheduler import Priority, QueueFullError, RequestScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class GenerateRequest(BaseModel):
+    prompt: str
+    language: str
+    priority: str = "interactive"
+    stream: bool = False
+    timeout: Optional[float] = None
+    return_partial: bool = False
+
+
+class ExplainRequest(BaseModel):
+    code: str
+    language: str = ""
+    priority: str = "interactive"
+    stream: bool = False
+    timeout: Optional[float] = None
+    return_partial: bool = False
+
+
+class RefactorRequest(BaseModel):
+    code: str
+    instructions: str = "Improve code quality and efficiency"
+    language: str = ""
+    priority: str = "interactive"
+    stream: bool = False
+    timeout: Optional[float] = None
+    return_partial: bool = False
+
+
+class ReloadRequest(BaseModel):
+    model_path: str
+
+
+class AsyncTokenStreamer(TextStreamer):
+    """Forward decoded text from a generation thread to an asyncio queue."""
+    
+    def __init__(self, tokenizer, loop: asyncio.AbstractEventLoop):
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue()
+    
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        if text:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, text)
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _parse_priority(value: str) -> Priority:
+    try:
+        return Priority[value.upper()]
+    except KeyError:
+        raise HTTPException(status_code=422, detail=f"Unknown priority: {value}")
+
+
+def create_app(
+    agent: BaseAgent,
+    config: Optional[Dict[str, Any]] = None,
+    loader: Optional[Callable[[str], BaseAgent]] = None
+) -> FastAPI:
+    """
+    Create the FastAPI application serving an agent.
+    
+    Args:
+        agent: Agent used to handle requests
+        config: Server configuration (see ``SERVER_CONFIG``)
+        loader: Creates an agent for a model path, enabling ``POST /admin/reload``
+        
+    Returns:
+        Configured FastAPI application
+    """
+    config = config or {}
+    host = AgentHost(
+        agent,
+        loader=loader,
+        wrap=CoalescingAgent if config.get("coalesce_requests", True) else None
+    )
+    scheduler = RequestScheduler(
+        max_queue_size=config.get("max_queue_size", 64),
+        num_workers=config.get("num_workers", 1),
+        batch_watermark=config.get("batch_watermark", 0.5),
+        max_tokens_in_flight=config.get("max_tokens_in_flight"),
+    )
+    
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        await scheduler.start()
+        yield
+        await scheduler.stop()
+    
+    app = FastAPI(title="AI Coding Agent", lifespan=lifespan)
+    app.state.host = host
+    app.state.scheduler = scheduler
+    
+    @app.middleware("http")
+    async def log_requests(request: Request, call_next):
+        with request_context(request.headers.get("X-Request-ID")) as request_id:
+            start = time.perf_counter()
+            response = await call_next(request)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            response.headers["X-Request-ID"] = request_id
+            logger.info(
+                "%s %s -> %d",
+                request.method,
+                request.url.path,
+                response.status_code,
+                extra={"duration_ms": round(elapsed_ms, 1), "status": response.status_code}
+            )
+            return response
+    
+    async def run(call: Callable[..., str], request: Request, body: BaseModel, action: str, text: str):
+        priority = _parse_priority(body.priority)
+        token = CancellationToken()
+        if body.timeout is not None:
+            token = CancellationToken.with_timeout(body.timeout)
+        options = {"cancel_token": token, "return_partial": body.return_partial}
+        
+        # Requests queued or running during a model swap finish on the model they started with
+        lease = host.acquire()
+        # Reserve the expected output length, not max_tokens, so more requests run at once
+        tokens = 0
+        if scheduler.max_tokens_in_flight is not None:
+            tokens = lease.agent.predict_max_tokens(action, text, body.language)
+        
+        if not body.stream:
+            try:
+                future = scheduler.submit(lambda: call(lease.agent, **options), priority, tokens)
+            except BaseException as e:
+                lease.release()
+                if isinstance(e, QueueFullError):
+                    return _queue_full_response(e)
+                raise
+            future.add_done_callback(lambda _: lease.release())
+            
+            # Stop generation if the client goes away
+            while not future.done():
+                await asyncio.wait({future}, timeout=0.5)
+                if not future.done() and await request.is_disconnected():
+                    token.cancel()
+            try:
+                return {"result": future.result()}
+            except GenerationCancelled as e:
+                status = 504 if e.reason == "timed out" else 499
+                return JSONResponse(
+                    status_code=status,
+                    content={"detail": str(e), "partial_output": e.partial_output}
+                )
+        
+        streamer = AsyncTokenStreamer(lease.agent.model["tokenizer"], asyncio.get_running_loop())
+        try:
+            future = scheduler.submit(lambda: call(lease.agent, streamer=streamer, **options), priority, tokens)
+        except BaseException as e:
+            lease.release()
+            if isinstance(e, QueueFullError):
+                return _queue_full_response(e)
+            raise
+        future.add_done_callback(lambda _: lease.release())
+        return StreamingResponse(
+            _stream_events(streamer, future, token),
+            media_type="text/event-stream"
+        )
+    
+    @app.post("/generate")
+    async def generate(body: GenerateRequest, request: Request):
+        call = lambda agent, **kw: agent.generate_code(body.prompt, body.language, **kw)
+        return await run(call, request, body, "generate", body.prompt)
+    
+    @app.post("/explain")
+    async def explain(body: ExplainRequest, request: Request):
+        call = lambda agent, **kw: agent.explain_code(body.code, language=body.language, **kw)
+        return await run(call, request, body, "explain", body.code)
+    
+    @app.post("/refactor")
+    async def refactor(body: RefactorRequest, request: Request):
+        call = lambda agent, **kw: agent.refactor_code(
+            body.code, body.instructions, language=body.language, **kw
+        )
+        return await run(call, request, body, "refactor", body.code)
+    
+    @app.get("/health")
+    async def health():
+        stats = {"status": "ok", "scheduler": scheduler.get_stats(), "model": host.get_stats()}
+        if isinstance(host.agent, CoalescingAgent):
+            stats["coalescing"] = host.agent.get_stats()
+        return stats
+    
+    @app.post("/admin/reload", status_code=202)
+    async def reload(body: ReloadRequest):
+        if not os.path.exists(body.model_path):
+            raise HTTPException(status_code=422, detail=f"Model path does not exist: {body.model_path}")
+        try:
+            host.reload(body.model_path)
+        except RuntimeError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        return host.get_stats()
+    
+    @app.get("/admin/model")
+    async def model_status():
+        return host.get_stats()
+    
+    return app
+
+
+def _queue_full_response(error: QueueFullError) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(error)},
+        headers={"Retry-After": str(max(1, round(error.retry_after)))}
+    )
+
+
+async def _stream_events(
+    streamer: AsyncTokenStreamer,
+    future: asyncio.Future,
+    token: CancellationToken
+) -> AsyncIterator[str]:
+    """Yield SSE events for streamed tokens followed by the final result."""
+    try:
+        while True:
+            getter = asyncio.ensure_future(streamer.queue.get())
+            done, _ = await asyncio.wait({getter, future}, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                yield _sse("token", {"text": getter.result()})
+                continue
+            
+            getter.cancel()
+            # Drain tokens emitted before the result was set
+            while not streamer.queue.empty():
+                yield _sse("token", {"text": streamer.queue.get_nowait()})
+            try:
+                yield _sse("done", {"result": future.result()})
+            except Exception as e:
+                logger.error("Streaming request failed: %s", e)
+                yield _sse("error", {"detail": str(e)})
+            return
+    finally:
+        # Closing the response early (client disconnect) stops generation
+        if not future.done():
+            token.cancel()
+
+
+def main():
+    from configs.agent_config import (
+        CLAUDE_CONFIG,
+        QWEN_CONFIG,
+        SERVER_CONFIG,
+        LOGGING_CONFIG,
+        LOGGING_QUEUE_CONFIG,
+    )
+    
+    parser = argparse.ArgumentParser(description="AI Coding Agent HTTP server")
+    parser.add_argument(
+        "--agent",
+        choices=["claude", "qwen"],
+        default="claude",
+        help="Type of AI agent to use"
+    )
+    parser.add_argument(
+        "--model-path",
+        required=True,
+        help="Path to the model weights"
+    )
+    parser.add_argument("--host", default=SERVER_CONFIG["host"], help="Address to bind")
+    parser.add_argument("--port", type=int, default=SERVER_CONFIG["port"], help="Port to bind")
+    
+    args = parser.parse_args()
+    
+    # Configure logging (handlers run on a background listener thread)
+    setup_logging(LOGGING_CONFIG, LOGGING_QUEUE_CONFIG)
+    
+    if args.agent == "claude":
+        loader = lambda model_path: ClaudeAgent(model_path, CLAUDE_CONFIG)
+    else:
+        loader = lambda model_path: QwenAgent(model_path, QWEN_CONFIG)
+    app = create_app(loader(args.model_path), SERVER_CONFIG, loader=loader)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""Long-lived holder of the serving agent, swapping models without downtime."""
+
+import gc
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+WARMUP_PROMPT = "def add(a, b):\n"
+
+
+def warm_up_agent(agent, max_new_tokens: int = 8):
+    """
+    Run a short generation so the first real request does not pay for
+    lazy initialization (allocator growth, kernel selection, page faults).
+    
+    Args:
+        agent: Agent with a loaded model
+        max_new_tokens: Tokens to generate
+    """
+    tokenizer = agent.model["tokenizer"]
+    model = agent.model["model"]
+    inputs = tokenizer(WARMUP_PROMPT, return_tensors="pt").to(agent.device)
+    with torch.no_grad():
+        model.generate(
+            inputs.input_ids,
+            attention_mask=inputs.attention_mask,
+            max_new_tokens=max_new_tokens,
+            do_sample=False,
+            pad_token_id=tokenizer.eos_token_id
+        )
+
+
+@dataclass
+class _Generation:
+    """One loaded model version and the requests using it."""
+    version: int
+    model_path: str
+    agent: Any          # Agent as loaded
+    serving: Any        # Agent (possibly wrapped) that handles requests
+    loaded_at: float
+    active: int = 0
+    retired: bool = False
+
+
+class AgentLease:
+    """Use of one model version by a request, released when the request ends."""
+    
+    def __init__(self, host: "AgentHost", generation: _Generation):
+        self._host = host
+        self._generation = generation
+        self._released = False
+    
+    @property
+    def agent(self):
+        return self._generation.serving
+    
+    @property
+    def version(self) -> int:
+        return self._generation.version
+    
+    def release(self):
+        """Stop using the model version (safe to call more than once)."""
+        if not self._released:
+            self._released = True
+            self._host._release(self._generation)
+    
+    def __enter__(self) -> "AgentLease":
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class AgentHost:
+    """
+    Serve requests from the current agent and replace it without downtime.
+    
+    ``reload`` loads and warms up a new checkpoint on a background thread
+    while the current model keeps serving. New requests then switch to the
+    new model in one step. Requests already holding a lease finish on the
+    old model, whose weights are released once the last of them ends.
+    Both models are in memory during the switch.
+    """
+    
+    def __init__(
+        self,
+        agent,
+        loader: Optional[Callable[[str], Any]] = None,
+        wrap: Optional[Callable[[Any], Any]] = None,
+        warmup: Optional[Callable[[Any], None]] = warm_up_agent
+    ):
+        """
+        Initialize the host.
+        
+        Args:
+            agent: Agent serving requests initially
+            loader: Creates an agent for a model path (required for ``reload``)
+            wrap: Optional wrapper applied to every agent before serving
+                (e.g. ``CoalescingAgent``)
+            warmup: Called with each newly loaded agent before it serves
+        """
+        self._loader = loader
+        self._wrap = wrap
+        self._warmup = warmup
+        self._lock = threading.Lock()
+        self._current = self._new_generation(1, agent)
+        self._draining: List[_Generation] = []
+        self._reload_thread: Optional[threading.Thread] = None
+        self._reload_done = threading.Event()
+        self._reload_done.set()
+        self._last_reload: Dict[str, Any] = {"state": "idle"}
+    
+    def _new_generation(self, version: int, agent) -> _Generation:
+        return _Generation(
+            version=version,
+            model_path=getattr(agent, "model_path", ""),
+            agent=agent,
+            serving=self._wrap(agent) if self._wrap is not None else agent,
+            loaded_at=time.time()
+        )
+    
+    @property
+    def agent(self):
+        """Agent currently serving new requests."""
+        return self._current.serving
+    
+    def acquire(self) -> AgentLease:
+        """
+        Start using the current model for a request.
+        
+        Returns:
+            AgentLease to release when the request has finished
+        """
+        with self._lock:
+            generation = self._current
+            generation.active += 1
+        return AgentLease(self, generation)
+    
+    def _release(self, generation: _Generation):
+        with self._lock:
+            generation.active -= 1
+            drained = generation.retired and generation.active == 0
+            if drained:
+                self._draining.remove(generation)
+        if drained:
+            self._unload(generation)
+    
+    def _unload(self, generation: _Generation):
+        logger.info("Releasing model version %d (%s)", generation.version, generation.model_path)
+        close = getattr(generation.agent, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception as e:
+                logger.warning("Closing model version %d failed: %s", generation.version, e)
+        generation.agent = generation.serving = None
+        gc.collect()
+    
+    def reload(self, model_path: str):
+        """
+        Load a new checkpoint in the background and switch to it.
+        
+        Args:
+            model_path: Path to the new model weights
+        
+        Raises:
+            RuntimeError: If no loader was given or a reload is in progress
+        """
+        if self._loader is None:
+            raise RuntimeError("This host cannot load models")
+        with self._lock:
+            if not self._reload_done.is_set():
+                raise RuntimeError("A reload is already in progress")
+            self._reload_done.clear()
+            self._last_reload = {"state": "loading", "model_path": model_path, "started_at": time.time()}
+        self._reload_thread = threading.Thread(
+            target=self._reload,
+            args=(model_path,),
+            name="model-reload",
+            daemon=True
+        )
+        self._reload_thread.start()
+    
+    def _reload(self, model_path: str):
+        start = time.perf_counter()
+        agent = None
+        try:
+            logger.info("Loading model from %s", model_path)
+            agent = self._loader(model_path)
+            if self._warmup is not None:
+                self._warmup(agent)
+            load_seconds = time.perf_counter() - start
+            
+            with self._lock:
+                old = self._current
+                self._current = self._new_generation(old.version + 1, agent)
+                old.retired = True
+                remaining = old.active
+                drained = remaining == 0
+                if not drained:
+                    self._draining.append(old)
+                self._last_reload = {
+                    "state": "done",
+                    "model_path": model_path,
+                    "version": self._current.version,
+                    "load_seconds": load_seconds,
+                }
+            logger.info(
+                "Switched to model version %d in %.1fs; %d requests finishing on version %d",
+                old.version + 1,
+                load_seconds,
+                remaining,
+                old.version
+            )
+            if drained:
+                self._unload(old)
+        except Exception as e:
+            logger.error("Reloading %s failed, keeping the current model: %s", model_path, e)
+            if agent is not None and callable(getattr(agent, "close", None)):
+                agent.close()
+            with self._lock:
+                self._last_reload = {"state": "failed", "model_path": model_path, "error": str(e)}
+        finally:
+            self._reload_done.set()
+    
+    def wait_for_reload(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for a reload in progress to finish.
+        
+        Args:
+            timeout: Seconds to wait (None waits indefinitely)
+        
+        Returns:
+            True if no reload is in progress anymore
+        """
+        return self._reload_done.wait(timeout)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get the serving state.
+        
+        Returns:
+            Dictionary with the current model version and path, requests
+            using it, older versions still finishing requests and the
+            outcome of the last reload
+        """
+        with self._lock:
+            return {
+                "version": self._current.version,
+                "model_path": self._current.model_path,
+                "loaded_at": self._current.loaded_at,
+                "active_requests": self._current.active,
+                "draining": [
+                    {"version": generation.version, "active_requests": generation.active}
+                    for generation in self._draining
+                ],
+                "reload": dict(self._last_reload),
+            }
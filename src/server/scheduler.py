@@ -0,0 +1,234 @@
+"""Priority request scheduler for serving agents under concurrent load."""
+
+import asyncio
+import contextvars
+import enum
+import itertools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(enum.IntEnum):
+    """Request priorities; lower values are served first."""
+    INTERACTIVE = 0
+    BATCH = 1
+
+
+class QueueFullError(Exception):
+    """Raised when the scheduler refuses a request because its queue is full."""
+    
+    def __init__(self, queue_depth: int, retry_after: float):
+        super().__init__(f"Request queue is full ({queue_depth} pending)")
+        self.queue_depth = queue_depth
+        self.retry_after = retry_after
+
+
+@dataclass(order=True)
+class _Job:
+    priority: int
+    sequence: int
+    fn: Callable[[], Any] = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    tokens: int = field(default=0, compare=False)
+
+
+class RequestScheduler:
+    """
+    Run blocking agent calls off the event loop in priority order.
+    
+    Requests are queued in a bounded priority queue and executed by a fixed
+    number of worker threads. When the queue is full new requests are
+    rejected immediately with :class:`QueueFullError` instead of letting
+    latency grow without bound. Batch requests are only admitted while the
+    queue is below ``batch_watermark`` of its capacity so that interactive
+    requests always have headroom.
+    
+    With ``max_tokens_in_flight`` set, each request reserves the number of
+    tokens it is expected to generate and a worker only starts it once the
+    reservations of running requests leave room for it. Requests are
+    started in queue order, and a request larger than the whole budget runs
+    on its own. Workers then bound the number of threads, while the token
+    budget bounds how many sequences decode at once.
+    """
+    
+    def __init__(
+        self,
+        max_queue_size: int = 64,
+        num_workers: int = 1,
+        batch_watermark: float = 0.5,
+        max_tokens_in_flight: Optional[int] = None,
+    ):
+        """
+        Initialize the scheduler.
+        
+        Args:
+            max_queue_size: Maximum number of pending requests
+            num_workers: Number of requests executed concurrently
+            batch_watermark: Fraction of the queue batch requests may fill
+            max_tokens_in_flight: Tokens running requests may reserve in
+                total (None admits by worker count only)
+        """
+        self.max_queue_size = max_queue_size
+        self.num_workers = num_workers
+        self.batch_watermark = batch_watermark
+        self.max_tokens_in_flight = max_tokens_in_flight
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._workers = []
+        self._sequence = itertools.count()
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._avg_service_time = 1.0
+        self._reserved_tokens = 0
+        self._admission: Optional[asyncio.Lock] = None
+        self._capacity: Optional[asyncio.Condition] = None
+    
+    async def start(self):
+        """Start the worker tasks on the running event loop."""
+        self._queue = asyncio.PriorityQueue()
+        self._admission = asyncio.Lock()
+        self._capacity = asyncio.Condition()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.num_workers,
+            thread_name_prefix="agent-worker"
+        )
+        self._workers = [
+            asyncio.create_task(self._worker()) for _ in range(self.num_workers)
+        ]
+        logger.info("Scheduler started with %d workers", self.num_workers)
+    
+    async def stop(self):
+        """Stop the workers and fail any requests still queued."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        
+        while self._queue is not None and not self._queue.empty():
+            job = self._queue.get_nowait()
+            if not job.future.done():
+                job.future.set_exception(RuntimeError("Scheduler stopped"))
+        
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        logger.info("Scheduler stopped")
+    
+    @property
+    def queue_depth(self) -> int:
+        """Number of requests waiting to be executed."""
+        return self._queue.qsize() if self._queue is not None else 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get scheduler statistics.
+        
+        Returns:
+            Dictionary with queue depth, running, completed and rejected
+            counts and the tokens reserved by running requests
+        """
+        return {
+            "queue_depth": self.queue_depth,
+            "max_queue_size": self.max_queue_size,
+            "running": self._running,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "avg_service_time": self._avg_service_time,
+            "reserved_tokens": self._reserved_tokens,
+            "max_tokens_in_flight": self.max_tokens_in_flight,
+        }
+    
+    def submit(
+        self,
+        fn: Callable[[], Any],
+        priority: Priority = Priority.INTERACTIVE,
+        tokens: int = 0
+    ) -> asyncio.Future:
+        """
+        Queue a blocking call for execution.
+        
+        Args:
+            fn: Zero-argument callable run on a worker thread
+            priority: Request priority
+            tokens: Tokens the request is expected to generate, reserved
+                while it runs if ``max_tokens_in_flight`` is set
+            
+        Returns:
+            Future resolved with the callable's result
+            
+        Raises:
+            QueueFullError: If the request cannot be admitted
+        """
+        if self._queue is None:
+            raise RuntimeError("Scheduler has not been started")
+        
+        depth = self._queue.qsize()
+        limit = self.max_queue_size
+        if priority >= Priority.BATCH:
+            limit = max(1, int(self.max_queue_size * self.batch_watermark))
+        if depth >= limit:
+            self._rejected += 1
+            retry_after = (depth + 1) * self._avg_service_time / self.num_workers
+            raise QueueFullError(depth, retry_after)
+        
+        # Run in the caller's context so request ids reach the worker thread
+        context = contextvars.copy_context()
+        future = asyncio.get_running_loop().create_future()
+        job = _Job(int(priority), next(self._sequence), lambda: context.run(fn), future, tokens)
+        self._queue.put_nowait(job)
+        return future
+    
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            if job.future.cancelled():
+                continue
+            
+            try:
+                await self._reserve(job.tokens)
+            except asyncio.CancelledError:
+                if not job.future.done():
+                    job.future.set_exception(RuntimeError("Scheduler stopped"))
+                raise
+            self._running += 1
+            start = loop.time()
+            try:
+                result = await loop.run_in_executor(self._executor, job.fn)
+                if not job.future.done():
+                    job.future.set_result(result)
+            except Exception as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            finally:
+                self._running -= 1
+                self._completed += 1
+                await self._unreserve(job.tokens)
+                elapsed = loop.time() - start
+                # Exponential moving average used for Retry-After hints
+                self._avg_service_time = 0.8 * self._avg_service_time + 0.2 * elapsed
+    
+    def _fits(self, tokens: int) -> bool:
+        return self._reserved_tokens == 0 or self._reserved_tokens + tokens <= self.max_tokens_in_flight
+    
+    async def _reserve(self, tokens: int):
+        """Wait until the token budget has room for a request, then reserve it."""
+        if self.max_tokens_in_flight is None:
+            return
+        # Held while waiting so later requests cannot overtake a large one
+        async with self._admission:
+            async with self._capacity:
+                await self._capacity.wait_for(lambda: self._fits(tokens))
+                self._reserved_tokens += tokens
+    
+    async def _unreserve(self, tokens: int):
+        if self.max_tokens_in_flight is None:
+            return
+        async with self._capacity:
+            self._reserved_tokens -= tokens
+            self._capacity.notify_all()
@@ -0,0 +1,129 @@
+"""Deadlines and cooperative cancellation for generation."""
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import torch
+from transformers import StoppingCriteria
+
+
+class GenerationCancelled(Exception):
+    """Raised when generation is stopped by a cancellation token or deadline."""
+    
+    def __init__(self, reason: str, partial_output: str = ""):
+        super().__init__(f"Generation {reason}")
+        self.reason = reason
+        self.partial_output = partial_output
+
+
+class CancellationToken:
+    """
+    Token used to stop a running generation from another thread.
+    
+    A token can also carry a deadline (``time.monotonic()`` value) after
+    which it counts as expired.
+    """
+    
+    def __init__(self, deadline: Optional[float] = None):
+        """
+        Initialize the token.
+        
+        Args:
+            deadline: Monotonic time after which generation should stop
+        """
+        self.deadline = deadline
+        self._event = threading.Event()
+    
+    @classmethod
+    def with_timeout(cls, seconds: float) -> "CancellationToken":
+        """Create a token that expires ``seconds`` from now."""
+        return cls(time.monotonic() + seconds)
+    
+    def cancel(self):
+        """Request cancellation."""
+        self._event.set()
+    
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+    
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+    
+    @property
+    def stop_reason(self) -> Optional[str]:
+        """"cancelled", "timed out" or None if generation may continue."""
+        if self.cancelled:
+            return "cancelled"
+        if self.expired:
+            return "timed out"
+        return None
+
+
+class SharedCancellationToken(CancellationToken):
+    """
+    Token for work shared by several callers.
+    
+    It only counts as stopped once every caller's token has stopped; a
+    caller without a token keeps the work alive.
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._members = []
+    
+    def add(self, token: Optional[CancellationToken]):
+        """Attach a caller's token (None for callers that cannot cancel)."""
+        with self._lock:
+            self._members.append(token)
+    
+    @property
+    def stop_reason(self) -> Optional[str]:
+        if self.cancelled:
+            return "cancelled"
+        with self._lock:
+            members = list(self._members)
+        reasons = [None if token is None else token.stop_reason for token in members]
+        if not reasons or None in reasons:
+            return None
+        return reasons[0]
+
+
+def token_from_kwargs(kwargs: Dict[str, Any]) -> Optional[CancellationToken]:
+    """
+    Build the cancellation token for an agent call.
+    
+    Agent methods accept ``cancel_token`` (a :class:`CancellationToken`)
+    and ``deadline`` (a ``time.monotonic()`` value for the whole request).
+    
+    Args:
+        kwargs: Keyword arguments of the agent call
+        
+    Returns:
+        Token combining the given options, or None if none were given
+    """
+    token = kwargs.get("cancel_token")
+    deadline = kwargs.get("deadline")
+    if deadline is None:
+        return token
+    if token is None:
+        return CancellationToken(deadline)
+    if token.deadline is None or deadline < token.deadline:
+        token.deadline = deadline
+    return token
+
+
+class CancellationCriteria(StoppingCriteria):
+    """Stop generation at the next decode step once a token is cancelled or expired."""
+    
+    def __init__(self, token: CancellationToken):
+        self.token = token
+        self.triggered = False
+    
+    def __call__(self, input_ids: torch.LongTensor, scores, **kwargs) -> torch.BoolTensor:
+        stop = self.token.stop_reason is not None
+        self.triggered = self.triggered or stop
+        return torch.full((input_ids.shape[0],), stop, dtype=torch.bool, device=input_ids.device)
@@ -1,7 +1,12 @@
 """Utility functions for code generation and manipulation."""
 
+import ast
+import hashlib
+import re
 import subprocess
-from typing import Optional, Dict, Any
+import tempfile
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, List, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
@@ -25,7 +30,7 @@ def format_python_code(code: str, config: Dict[str, Any]) -> str:
         )
         return black.format_str(code, mode=mode)
     except Exception as e:
-        logger.error(f"Failed to format Python code: {str(e)}")
+        logger.error("Failed to format Python code: %s", e)
         return code
 
 def format_cpp_code(code: str, config: Dict[str, Any]) -> str:
@@ -50,11 +55,11 @@ def format_cpp_code(code: str, config: Dict[str, Any]) -> str:
         )
         formatted_code, stderr = process.communicate(input=code)
         if process.returncode != 0:
-            logger.error(f"clang-format failed: {stderr}")
+            logger.error("clang-format failed: %s", stderr)
             return code
         return formatted_code
     except Exception as e:
-        logger.error(f"Failed to format C++ code: {str(e)}")
+        logger.error("Failed to format C++ code: %s", e)
         return code
 
 def validate_python_syntax(code: str) -> bool:
@@ -85,25 +90,41 @@ def validate_cpp_syntax(code: str, compiler: str = "g++") -> bool:
         True if syntax is valid, False otherwise
     """
     try:
-        with open("temp.cpp", "w") as f:
+        # A unique file per call so concurrent validations do not collide
+        with tempfile.NamedTemporaryFile("w", suffix=".cpp") as f:
             f.write(code)
-        
-        process = subprocess.run(
-            [compiler, "-fsyntax-only", "temp.cpp"],
-            capture_output=True,
-            text=True
-        )
+            f.flush()
+            
+            process = subprocess.run(
+                [compiler, "-fsyntax-only", f.name],
+                capture_output=True,
+                text=True
+            )
         return process.returncode == 0
     except Exception:
         return False
-    finally:
-        try:
-            import os
-            os.remove("temp.cpp")
-        except:
-            pass
 
-def extract_code_blocks(text: str) -> Dict[str, str]:
+FENCE_LANGUAGE_ALIASES = {
+    "c++": "cpp",
+    "cxx": "cpp",
+    "py": "python",
+    "python3": "python",
+}
+
+def normalize_fence_language(tag: str) -> str:
+    """
+    Normalize a code fence info string to a language name.
+    
+    Args:
+        tag: Text following the opening fence (e.g. "c++" or "Python")
+        
+    Returns:
+        Lower-case language name, or "" for untagged fences
+    """
+    tag = tag.strip().split(" ")[0].lower() if tag.strip() else ""
+    return FENCE_LANGUAGE_ALIASES.get(tag, tag)
+
+def extract_code_blocks(text: str) -> Dict[str, List[str]]:
     """
     Extract code blocks from markdown-style text.
     
@@ -111,24 +132,353 @@ def extract_code_blocks(text: str) -> Dict[str, str]:
         text: Text containing code blocks
         
     Returns:
-        Dictionary mapping language to code blocks
+        Dictionary mapping language to code blocks ("" for untagged blocks)
     """
-    import re
-    
     code_blocks = {}
-    pattern = r"```(\w+)\n(.*?)```"
-    matches = re.finditer(pattern, text, re.DOTALL)
-    
-    for match in matches:
-        language = match.group(1).lower()
-        code = match.group(2).strip()
-        if language in code_blocks:
-            code_blocks[language].append(code)
-        else:
-            code_blocks[language] = [code]
+    parser = CodeFenceParser()
+    for language, code in parser.feed(text) + parser.close():
+        code_blocks.setdefault(language, []).append(code)
     
     return code_blocks
 
+class CodeFenceParser:
+    """
+    Incremental parser for markdown code fences.
+    
+    Text can be fed in arbitrary chunks (e.g. as tokens are decoded) and
+    each code block is returned as soon as its closing fence is seen. As in
+    CommonMark, a block is only closed by a line holding nothing but a run
+    of backticks at least as long as the opening one, so fences inside the
+    code (e.g. in a string) do not end it.
+    """
+    
+    FENCE = "```"
+    
+    # Opening fence: three or more backticks and an info string without backticks
+    _OPEN_PATTERN = re.compile(r"(`{3,})([^`]*)")
+    
+    def __init__(self):
+        self._buffer = ""
+        self._language = None
+        self._fence = ""
+        self._lines = []
+    
+    @property
+    def in_block(self) -> bool:
+        """Whether the parser is inside an open code block."""
+        return self._language is not None
+    
+    def feed(self, text: str) -> List[Tuple[str, str]]:
+        """
+        Consume a chunk of text.
+        
+        Args:
+            text: Next chunk of the generated text
+            
+        Returns:
+            List of (language, code) tuples for blocks closed by this chunk
+        """
+        self._buffer += text
+        completed = []
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            block = self._feed_line(line)
+            if block is not None:
+                completed.append(block)
+        return completed
+    
+    def close(self) -> List[Tuple[str, str]]:
+        """
+        Signal the end of the text.
+        
+        Returns:
+            The final block if the text ended inside or at the end of one
+        """
+        completed = []
+        if self._buffer:
+            block = self._feed_line(self._buffer)
+            self._buffer = ""
+            if block is not None:
+                completed.append(block)
+        if self.in_block:
+            # Unterminated block, e.g. generation hit max_new_tokens
+            completed.append((self._language, "\n".join(self._lines).strip()))
+            self._language = None
+            self._lines = []
+        return completed
+    
+    def _feed_line(self, line: str) -> Optional[Tuple[str, str]]:
+        stripped = line.strip()
+        if not self.in_block:
+            match = self._OPEN_PATTERN.fullmatch(stripped)
+            if match is not None:
+                self._fence = match.group(1)
+                self._language = normalize_fence_language(match.group(2))
+                self._lines = []
+            return None
+        
+        if stripped.startswith(self._fence) and stripped == "`" * len(stripped):
+            block = (self._language, "\n".join(self._lines).strip())
+            self._language = None
+            self._lines = []
+            return block
+        
+        self._lines.append(line)
+        return None
+
+class EditApplyError(ValueError):
+    """Raised when edit hunks cannot be applied to the original code."""
+
+EDIT_SEARCH_MARKER = "<<<<<<< SEARCH"
+EDIT_DIVIDER_MARKER = "======="
+EDIT_REPLACE_MARKER = ">>>>>>> REPLACE"
+
+def parse_edit_hunks(text: str) -> List[Tuple[str, str]]:
+    """
+    Parse search/replace edit hunks from model output.
+    
+    Hunks have the form::
+    
+        <<<<<<< SEARCH
+        original lines
+        =======
+        replacement lines
+        >>>>>>> REPLACE
+    
+    Args:
+        text: Text containing edit hunks
+        
+    Returns:
+        List of (search, replace) tuples in order
+        
+    Raises:
+        EditApplyError: If a hunk is not terminated
+    """
+    hunks = []
+    search, replace, target = None, None, None
+    for line in text.splitlines():
+        marker = line.strip()
+        if marker == EDIT_SEARCH_MARKER:
+            search, replace, target = [], [], "search"
+        elif marker == EDIT_DIVIDER_MARKER and target == "search":
+            target = "replace"
+        elif marker == EDIT_REPLACE_MARKER and target == "replace":
+            hunks.append(("\n".join(search), "\n".join(replace)))
+            search, replace, target = None, None, None
+        elif target == "search":
+            search.append(line)
+        elif target == "replace":
+            replace.append(line)
+    
+    if target is not None:
+        raise EditApplyError("Unterminated edit hunk")
+    return hunks
+
+def _find_lines(lines: List[str], needle: List[str]) -> List[int]:
+    """Return the start indices where ``needle`` occurs in ``lines``, ignoring trailing whitespace."""
+    needle = [line.rstrip() for line in needle]
+    haystack = [line.rstrip() for line in lines]
+    size = len(needle)
+    return [
+        i for i in range(len(haystack) - size + 1)
+        if haystack[i:i + size] == needle
+    ]
+
+def apply_edit_hunks(code: str, hunks: List[Tuple[str, str]]) -> str:
+    """
+    Apply search/replace hunks to code.
+    
+    Each search block must match exactly one run of lines in the code
+    (trailing whitespace is ignored). Hunks are applied in order.
+    
+    Args:
+        code: Original code
+        hunks: List of (search, replace) tuples
+        
+    Returns:
+        Code with all hunks applied
+        
+    Raises:
+        EditApplyError: If a search block is empty, missing or ambiguous
+    """
+    lines = code.splitlines()
+    for number, (search, replace) in enumerate(hunks, 1):
+        search_lines = search.splitlines()
+        if not search_lines:
+            raise EditApplyError(f"Hunk {number} has an empty search block")
+        
+        matches = _find_lines(lines, search_lines)
+        if len(matches) != 1:
+            reason = "not found" if not matches else f"ambiguous ({len(matches)} matches)"
+            raise EditApplyError(f"Hunk {number} search block {reason}")
+        
+        start = matches[0]
+        lines[start:start + len(search_lines)] = replace.splitlines()
+    
+    result = "\n".join(lines)
+    return result + "\n" if code.endswith("\n") else result
+
+@dataclass
+class CodeSegment:
+    """A contiguous piece of a source file."""
+    text: str
+    name: Optional[str] = None  # Set for refactorable units, None for context
+    
+    @property
+    def is_unit(self) -> bool:
+        return self.name is not None
+
+def _split_python_units(code: str) -> List[CodeSegment]:
+    tree = ast.parse(code)
+    lines = code.splitlines(keepends=True)
+    segments = []
+    cursor = 0
+    for node in tree.body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        start = min([node.lineno] + [d.lineno for d in node.decorator_list]) - 1
+        end = node.end_lineno
+        if start > cursor:
+            segments.append(CodeSegment("".join(lines[cursor:start])))
+        segments.append(CodeSegment("".join(lines[start:end]), node.name))
+        cursor = end
+    if cursor < len(lines):
+        segments.append(CodeSegment("".join(lines[cursor:])))
+    return segments
+
+def _split_cpp_units(code: str) -> List[CodeSegment]:
+    """Split C++ at top-level braced definitions, skipping strings, comments and directives."""
+    spans = []
+    depth = 0
+    statement_start = None
+    i = 0
+    length = len(code)
+    while i < length:
+        char = code[i]
+        pair = code[i:i + 2]
+        if pair == "//" or (char == "#" and depth == 0 and code[code.rfind("\n", 0, i) + 1:i].strip() == ""):
+            # Line comments and preprocessor directives (with continuations)
+            while i < length and code[i] != "\n":
+                i += 2 if code[i] == "\\" else 1
+            continue
+        if pair == "/*":
+            end = code.find("*/", i + 2)
+            i = length if end == -1 else end + 2
+            continue
+        if char in "\"'":
+            i += 1
+            while i < length and code[i] != char:
+                i += 2 if code[i] == "\\" else 1
+            i += 1
+            continue
+        
+        if not char.isspace() and depth == 0 and statement_start is None:
+            statement_start = i
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                end = i + 1
+                # Include the trailing semicolon of class/struct/enum definitions
+                j = end
+                while j < length and code[j] in " \t":
+                    j += 1
+                if j < length and code[j] == ";":
+                    end = j + 1
+                spans.append((statement_start, end))
+                statement_start = None
+                i = end
+                continue
+        elif char == ";" and depth == 0:
+            statement_start = None
+        i += 1
+    
+    segments = []
+    cursor = 0
+    for start, end in spans:
+        # Extend units to whole lines when they do not share them
+        line_start = code.rfind("\n", 0, start) + 1
+        if code[line_start:start].strip() == "" and line_start >= cursor:
+            start = line_start
+        line_end = code.find("\n", end)
+        line_end = length if line_end == -1 else line_end + 1
+        if code[end:line_end].strip() == "":
+            end = line_end
+        if start > cursor:
+            segments.append(CodeSegment(code[cursor:start]))
+        header = code[start:code.find("{", start)]
+        segments.append(CodeSegment(code[start:end], " ".join(header.split())[:80]))
+        cursor = end
+    if cursor < length:
+        segments.append(CodeSegment(code[cursor:]))
+    return segments
+
+def split_code_units(code: str, language: str) -> List[CodeSegment]:
+    """
+    Split source code into top-level units and the context between them.
+    
+    Python is split with ``ast`` at top-level functions and classes; C++
+    at top-level braced definitions (functions, classes, namespaces).
+    Joining the ``text`` of all segments reproduces the input exactly.
+    
+    Args:
+        code: Source code
+        language: Programming language ("python" or "cpp")
+        
+    Returns:
+        List of segments in file order
+        
+    Raises:
+        SyntaxError: If Python code cannot be parsed
+        ValueError: If the language is not supported
+    """
+    language = normalize_fence_language(language)
+    if language == "python":
+        return _split_python_units(code)
+    if language == "cpp":
+        return _split_cpp_units(code)
+    raise ValueError(f"Splitting not supported for language: {language}")
+
+_CPP_COMMENT_OR_STRING = re.compile(
+    r'//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'',
+    re.DOTALL
+)
+
+def normalized_code_hash(code: str, language: str) -> str:
+    """
+    Hash code so that formatting and comment changes do not alter the hash.
+    
+    Python is hashed by its AST (without positions); C++ with comments
+    removed and whitespace collapsed. Python that does not parse falls back
+    to the C++-style normalization.
+    
+    Args:
+        code: Source code
+        language: Programming language
+        
+    Returns:
+        Hex SHA-256 digest
+    """
+    normalized = None
+    if normalize_fence_language(language) == "python":
+        try:
+            normalized = ast.dump(ast.parse(code), annotate_fields=False, include_attributes=False)
+        except (SyntaxError, ValueError):
+            pass
+    if normalized is None:
+        # Collapse whitespace and drop comments, keeping string literals intact
+        parts = []
+        cursor = 0
+        for match in _CPP_COMMENT_OR_STRING.finditer(code):
+            parts.append(" ".join(code[cursor:match.start()].split()))
+            if match.group(0)[0] != "/":
+                parts.append(match.group(0))
+            cursor = match.end()
+        parts.append(" ".join(code[cursor:].split()))
+        normalized = " ".join(part for part in parts if part)
+    return hashlib.sha256(f"{language}\0{normalized}".encode()).hexdigest()
+
 def get_language_from_file(filename: str) -> Optional[str]:
     """
     Determine programming language from file extension.
@@ -0,0 +1,301 @@
+"""
+Grammar-constrained decoding for Python.
+
+``PythonGrammarProcessor`` tracks the lexical structure of the text being
+generated (brackets, string literals, comments and markdown code fences)
+and masks tokens that would make it impossible to complete: mismatched
+closing brackets, newlines inside single-line strings, stray backticks and
+end-of-sequence while a bracket or string is still open. Indentation and
+statement-level grammar are left to the model and to ``validate_code``.
+
+Most tokens contain none of the characters the lexer cares about and are
+allowed in every state, so only the remaining tokens are checked per
+state. That split is computed once per tokenizer, and the resulting masks
+are cached per lexer state, so most decode steps reuse a cached mask.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import torch
+from transformers import LogitsProcessor
+
+# Characters that can change the lexer state beyond "some code was written"
+STRUCTURAL_CHARS = frozenset("()[]{}'\"#\\\n\r`")
+
+# Python accepts \n, \r and \r\n as line ends
+NEWLINES = "\n\r"
+
+OPENING = {"(": ")", "[": "]", "{": "}"}
+CLOSING = {")": "(", "]": "[", "}": "{"}
+
+# Lexer modes
+CODE, TEXT, FENCE_INFO, FENCE_CLOSE = range(4)
+
+# Cached masks per tokenizer vocabulary
+MAX_CACHED_MASKS = 512
+
+# Open brackets considered when computing a mask. Deeper nesting shares the
+# masks of its innermost levels, which only forbids tokens closing more
+# brackets than this at once.
+MASK_STACK_DEPTH = 4
+
+
+class LexState(NamedTuple):
+    """Lexical state of partially generated Python (optionally inside markdown)."""
+    mode: int = CODE
+    stack: str = ""         # Open brackets
+    quote: str = ""         # Delimiter of the open string literal
+    opening: str = ""       # Quote characters seen that may start a (triple) string
+    run: int = 0            # Consecutive quote characters inside a triple-quoted string
+    escape: bool = False    # Previous character was a backslash inside a string
+    comment: bool = False   # Inside a comment
+    line_ticks: int = 0     # Backticks at the start of the line, -1 after other content
+    has_code: bool = False  # Code was written since the mode started
+
+
+def advance(state: LexState, text: str) -> Optional[LexState]:
+    """
+    Feed text to the lexer.
+    
+    Args:
+        state: Current state
+        text: Text to append
+    
+    Returns:
+        New state, or None if the text cannot be part of a valid program
+    """
+    mode, stack, quote, opening, run, escape, comment, line_ticks, has_code = state
+    for char in text:
+        if mode == FENCE_INFO or mode == FENCE_CLOSE:
+            if char in NEWLINES:
+                mode = CODE if mode == FENCE_INFO else TEXT
+                line_ticks, has_code = 0, False
+            continue
+        
+        if mode == TEXT:
+            if char in NEWLINES:
+                line_ticks = 0
+            elif char == "`" and line_ticks >= 0:
+                line_ticks += 1
+                if line_ticks == 3:
+                    mode = FENCE_INFO
+            elif char not in " \t":
+                line_ticks = -1
+            continue
+        
+        # Resolve quote characters that may open a triple-quoted string
+        if opening:
+            if char == opening[0]:
+                if len(opening) == 1:
+                    opening += char
+                else:
+                    quote, opening, run = char * 3, "", 0
+                continue
+            if len(opening) == 1:
+                quote = opening
+            opening = ""
+        
+        if quote:
+            if escape:
+                escape = False
+                run = 0
+            elif char == "\\":
+                escape = True
+                run = 0
+            elif len(quote) == 1:
+                if char == quote:
+                    quote = ""
+                elif char in NEWLINES:
+                    return None
+            elif char == quote[0]:
+                run += 1
+                if run == 3:
+                    quote, run = "", 0
+            else:
+                run = 0
+            continue
+        
+        if comment:
+            if char in NEWLINES:
+                comment = False
+                line_ticks = 0
+            continue
+        
+        if 0 < line_ticks < 3 and char != "`":
+            return None
+        if char == "`":
+            if line_ticks < 0 or stack:
+                return None
+            line_ticks += 1
+            if line_ticks == 3:
+                # A fence before any code opens the block, otherwise it closes it
+                mode = FENCE_CLOSE if has_code else FENCE_INFO
+            continue
+        if char in NEWLINES:
+            line_ticks = 0
+            continue
+        if char in " \t":
+            continue
+        
+        line_ticks = -1
+        has_code = True
+        if char == "#":
+            comment = True
+        elif char in "'\"":
+            opening = char
+        elif char in OPENING:
+            stack += char
+        elif char in CLOSING:
+            if not stack or stack[-1] != CLOSING[char]:
+                return None
+            stack = stack[:-1]
+    return LexState(mode, stack, quote, opening, run, escape, comment, line_ticks, has_code)
+
+
+def is_complete(state: LexState) -> bool:
+    """
+    Check whether generation may stop in this state.
+    
+    Args:
+        state: Lexer state
+    
+    Returns:
+        True if no bracket, string or code fence prefix is left open
+    """
+    if state.mode != CODE:
+        return True
+    return (
+        not state.stack
+        and not state.quote
+        and len(state.opening) != 1
+        and not 0 < state.line_ticks < 3
+    )
+
+
+class TokenVocabulary:
+    """Decoded token texts of a tokenizer, split by whether they affect the lexer."""
+    
+    def __init__(self, tokenizer):
+        """
+        Decode and classify every token of a tokenizer.
+        
+        Args:
+            tokenizer: Hugging Face tokenizer
+        """
+        size = len(tokenizer)
+        self.size = size
+        self.texts: List[str] = tokenizer.batch_decode([[i] for i in range(size)])
+        self._end_set = (set(tokenizer.all_special_ids) | {tokenizer.eos_token_id}) - {None}
+        self.end_ids = sorted(self._end_set)
+        self.structural_ids = [
+            i for i, text in enumerate(self.texts)
+            if i not in self._end_set and not STRUCTURAL_CHARS.isdisjoint(text)
+        ]
+        self.plain_mask = torch.ones(size, dtype=torch.bool)
+        self.plain_mask[self.structural_ids] = False
+        self.plain_mask[self.end_ids] = False
+        
+        self._masks: "OrderedDict[LexState, torch.Tensor]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def allowed_mask(self, state: LexState) -> torch.Tensor:
+        """
+        Get the tokens allowed after a state.
+        
+        Args:
+            state: Lexer state
+        
+        Returns:
+            Boolean tensor over the vocabulary
+        """
+        state = state._replace(stack=state.stack[-MASK_STACK_DEPTH:])
+        with self._lock:
+            mask = self._masks.get(state)
+            if mask is not None:
+                self._masks.move_to_end(state)
+                return mask
+        
+        if state.mode == CODE and 0 < state.line_ticks < 3:
+            # Only backticks may follow a partial fence; check every token
+            mask = torch.zeros(self.size, dtype=torch.bool)
+            candidates = range(self.size)
+        else:
+            mask = self.plain_mask.clone()
+            candidates = self.structural_ids
+        texts = self.texts
+        allowed = [i for i in candidates if i not in self._end_set and advance(state, texts[i]) is not None]
+        mask[allowed] = True
+        if is_complete(state):
+            mask[self.end_ids] = True
+        
+        with self._lock:
+            self._masks[state] = mask
+            if len(self._masks) > MAX_CACHED_MASKS:
+                self._masks.popitem(last=False)
+        return mask
+
+
+_vocabularies: Dict[Tuple[str, str, int], TokenVocabulary] = {}
+_vocabularies_lock = threading.Lock()
+
+
+def get_token_vocabulary(tokenizer) -> TokenVocabulary:
+    """
+    Get the (cached) token vocabulary of a tokenizer.
+    
+    Args:
+        tokenizer: Hugging Face tokenizer
+    
+    Returns:
+        TokenVocabulary shared by every tokenizer instance of the same model
+    """
+    key = (tokenizer.__class__.__name__, getattr(tokenizer, "name_or_path", ""), len(tokenizer))
+    with _vocabularies_lock:
+        vocabulary = _vocabularies.get(key)
+        if vocabulary is None:
+            vocabulary = _vocabularies[key] = TokenVocabulary(tokenizer)
+        return vocabulary
+
+
+class PythonGrammarProcessor(LogitsProcessor):
+    """Mask tokens that would make the generated Python lexically invalid."""
+    
+    def __init__(self, tokenizer, start_in_text: bool = False):
+        """
+        Initialize the processor for one ``generate()`` call.
+        
+        Args:
+            tokenizer: Tokenizer of the model being decoded
+            start_in_text: Start outside code, expecting markdown with fenced
+                code blocks (as in refactoring answers) instead of bare code
+        """
+        self.vocabulary = get_token_vocabulary(tokenizer)
+        self.initial_state = LexState(mode=TEXT) if start_in_text else LexState()
+        self._states: Optional[List[Optional[LexState]]] = None
+        self._length = 0
+    
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        if self._states is None:
+            # The first call sees only the prompt
+            self._states = [self.initial_state] * input_ids.shape[0]
+        else:
+            for row, token_id in enumerate(input_ids[:, -1].tolist()):
+                state = self._states[row]
+                if state is not None and token_id < self.vocabulary.size:
+                    # Rows that leave the grammar (e.g. after end of sequence) stop being constrained
+                    self._states[row] = advance(state, self.vocabulary.texts[token_id])
+        
+        masks = []
+        for state in self._states:
+            if state is None:
+                masks.append(torch.ones(scores.shape[-1], dtype=torch.bool))
+                continue
+            mask = self.vocabulary.allowed_mask(state)
+            if scores.shape[-1] > mask.shape[0]:
+                # Padded embedding rows beyond the tokenizer are never valid
+                mask = torch.cat([mask, mask.new_zeros(scores.shape[-1] - mask.shape[0])])
+            masks.append(mask)
+        allowed = torch.stack(masks).to(scores.device)
+        return scores.masked_fill(~allowed, float("-inf"))
@@ -0,0 +1,178 @@
+"""
+Int8 key/value cache for long prompts.
+
+Keys and values are stored as int8 with one float scale per head and token
+(absmax over the head dimension), about a quarter of their float32 size.
+The most recent ``residual_length`` tokens are kept in full precision and
+moved into the int8 store in blocks. Attention layers receive dequantized
+keys and values for one layer at a time, so only that layer is ever
+expanded back to full precision.
+"""
+
+import math
+from typing import Any, Dict, NamedTuple, Optional
+
+import torch
+
+try:
+    from transformers.cache_utils import Cache, QuantizedLayer
+except ImportError as e:
+    raise ImportError(
+        "The int8 KV cache needs a transformers release with cache layers (4.56 or later)"
+    ) from e
+
+# Largest magnitude of a symmetric int8 value
+INT8_MAX = 127
+
+
+class Int8Tensor(NamedTuple):
+    """Symmetric int8 tensor with a scale per row of its last dimension."""
+    data: torch.Tensor    # int8, same shape as the original
+    scale: torch.Tensor   # original dtype, last dimension of size 1
+    dtype: torch.dtype
+    
+    def nbytes(self) -> int:
+        return self.data.numel() * self.data.element_size() + self.scale.numel() * self.scale.element_size()
+
+
+def quantize_int8(tensor: torch.Tensor) -> Int8Tensor:
+    """
+    Quantize a tensor with one scale per row of its last dimension.
+    
+    For (batch, heads, tokens, head_dim) keys and values this gives one
+    scale per head and token, so tokens added later never change the
+    scales of earlier ones.
+    
+    Args:
+        tensor: Floating point tensor
+    
+    Returns:
+        Int8Tensor approximating ``tensor``
+    """
+    scale = tensor.abs().amax(dim=-1, keepdim=True).clamp(min=1e-8) / INT8_MAX
+    data = torch.round(tensor / scale).clamp(-INT8_MAX, INT8_MAX).to(torch.int8)
+    return Int8Tensor(data, scale, tensor.dtype)
+
+
+def dequantize_int8(quantized: Int8Tensor) -> torch.Tensor:
+    """Expand an Int8Tensor back to its original dtype."""
+    return quantized.data.to(quantized.dtype) * quantized.scale
+
+
+class Int8QuantizedLayer(QuantizedLayer):
+    """Cache layer storing keys and values as int8 beyond a full-precision window."""
+    
+    def __init__(self, residual_length: int = 128):
+        super().__init__(nbits=8, axis_key=-1, axis_value=-1, residual_length=residual_length)
+    
+    def _quantize(self, tensor: torch.Tensor, axis: int) -> Int8Tensor:
+        return quantize_int8(tensor)
+    
+    def _dequantize(self, q_tensor: Int8Tensor) -> torch.Tensor:
+        return dequantize_int8(q_tensor)
+
+
+class Int8KVCache(Cache):
+    """
+    KV cache for decoder-only models keeping keys and values in int8.
+    
+    Pass it as ``past_key_values`` to ``generate()``. Only models whose
+    layers all use full attention are supported.
+    """
+    
+    def __init__(self, config, residual_length: int = 128):
+        """
+        Create an empty cache.
+        
+        Args:
+            config: Config of the model the cache is used with
+            residual_length: Recent tokens kept in full precision
+        
+        Raises:
+            ValueError: If the model has sliding-window or other non-standard layers
+        """
+        config = config.get_text_config(decoder=True)
+        layer_types = getattr(config, "layer_types", None) or ["full_attention"] * config.num_hidden_layers
+        unsupported = set(layer_types) - {"full_attention"}
+        if unsupported:
+            raise ValueError(f"Int8 KV cache only supports full attention layers, found {sorted(unsupported)}")
+        super().__init__(layers=[Int8QuantizedLayer(residual_length) for _ in range(config.num_hidden_layers)])
+
+
+def kv_cache_bytes(cache: Cache) -> int:
+    """
+    Measure the memory held by a KV cache.
+    
+    Args:
+        cache: DynamicCache or Int8KVCache after use
+    
+    Returns:
+        Bytes of stored keys, values and scales
+    """
+    total = 0
+    for layer in cache.layers:
+        for name in ("keys", "values"):
+            tensor = getattr(layer, name, None)
+            if isinstance(tensor, torch.Tensor):
+                total += tensor.numel() * tensor.element_size()
+        for name in ("_quantized_keys", "_quantized_values"):
+            quantized = getattr(layer, name, None)
+            if isinstance(quantized, Int8Tensor):
+                total += quantized.nbytes()
+    return total
+
+
+def measure_kv_quantization(
+    model,
+    input_ids: torch.Tensor,
+    prefix_tokens: Optional[int] = None,
+    residual_length: int = 128
+) -> Dict[str, Any]:
+    """
+    Compare the int8 cache against a full-precision cache on a text.
+    
+    The first ``prefix_tokens`` are prefilled into each cache and the rest
+    are scored one token at a time, as during decoding, so every scored
+    token attends to the quantized prefix.
+    
+    Args:
+        model: Causal language model
+        input_ids: (1, tokens) ids of a long sample text
+        prefix_tokens: Tokens prefilled before scoring (defaults to half)
+        residual_length: Recent tokens kept in full precision by the int8 cache
+    
+    Returns:
+        Dictionary with cache sizes in bytes, their ratio, perplexity with
+        each cache, the largest logit difference and how often both caches
+        agree on the most likely next token
+    """
+    prefix_tokens = prefix_tokens or input_ids.shape[1] // 2
+    results = {}
+    for name, cache in (
+        ("full", None),
+        ("int8", Int8KVCache(model.config, residual_length=residual_length)),
+    ):
+        with torch.no_grad():
+            output = model(input_ids[:, :prefix_tokens], past_key_values=cache, use_cache=True)
+            cache = output.past_key_values
+            logits = [output.logits[:, -1]]
+            for position in range(prefix_tokens, input_ids.shape[1] - 1):
+                output = model(input_ids[:, position:position + 1], past_key_values=cache, use_cache=True)
+                logits.append(output.logits[:, -1])
+        results[name] = (torch.cat(logits).float(), kv_cache_bytes(cache))
+    
+    targets = input_ids[0, prefix_tokens:]
+    full_logits, full_bytes = results["full"]
+    int8_logits, int8_bytes = results["int8"]
+    full_nll = torch.nn.functional.cross_entropy(full_logits, targets).item()
+    int8_nll = torch.nn.functional.cross_entropy(int8_logits, targets).item()
+    return {
+        "tokens": input_ids.shape[1],
+        "full_bytes": full_bytes,
+        "int8_bytes": int8_bytes,
+        "memory_ratio": int8_bytes / full_bytes if full_bytes else 0.0,
+        "full_perplexity": math.exp(full_nll),
+        "int8_perplexity": math.exp(int8_nll),
+        "max_logit_diff": (full_logits - int8_logits).abs().max().item(),
+        "top1_agreement": (full_logits.argmax(-1) == int8_logits.argmax(-1)).float().mean().item(),
+    }
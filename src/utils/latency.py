@@ -0,0 +1,52 @@
+"""Latency tracking with percentile summaries."""
+
+import threading
+from collections import defaultdict, deque
+from typing import Any, Dict
+
+import numpy as np
+
+
+class LatencyTracker:
+    """Record latencies per label over a sliding window and report percentiles."""
+    
+    def __init__(self, window: int = 10000):
+        """
+        Initialize the tracker.
+        
+        Args:
+            window: Number of most recent samples kept per label
+        """
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+    
+    def record(self, label: str, seconds: float):
+        """
+        Record one latency sample.
+        
+        Args:
+            label: What was measured (e.g. an agent name)
+            seconds: Latency in seconds
+        """
+        with self._lock:
+            self._samples[label].append(seconds)
+    
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Summarize the recorded latencies.
+        
+        Returns:
+            Dictionary mapping labels to count, mean, p50, p95 and p99 in seconds
+        """
+        with self._lock:
+            samples = {label: np.array(values) for label, values in self._samples.items() if values}
+        return {
+            label: {
+                "count": len(values),
+                "mean": float(values.mean()),
+                "p50": float(np.percentile(values, 50)),
+                "p95": float(np.percentile(values, 95)),
+                "p99": float(np.percentile(values, 99)),
+            }
+            for label, values in samples.items()
+        }
@@ -0,0 +1,159 @@
+"""Non-blocking structured logging."""
+
+import atexit
+import contextlib
+import contextvars
+import json
+import logging
+import logging.config
+import logging.handlers
+import queue
+import threading
+import uuid
+from typing import Any, Dict, Iterator, Optional
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed via ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+@contextlib.contextmanager
+def request_context(request_id: Optional[str] = None) -> Iterator[str]:
+    """
+    Tag log records emitted in this context with a request id.
+    
+    Args:
+        request_id: Request id to use; a random one is generated if omitted
+        
+    Yields:
+        The request id
+    """
+    request_id = request_id or uuid.uuid4().hex[:16]
+    token = request_id_var.set(request_id)
+    try:
+        yield request_id
+    finally:
+        request_id_var.reset(token)
+
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request id to log records."""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Format log records as single-line JSON objects."""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        # Fields passed via ``extra`` (e.g. request_id, duration_ms)
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that never blocks the logging thread.
+    
+    When the queue is full the record is dropped and counted; the listener
+    reports the number of dropped records once the queue has room again.
+    """
+    
+    def __init__(self, max_size: int = 10000):
+        super().__init__(queue.Queue(maxsize=max_size))
+        self.addFilter(RequestIdFilter())
+        self._lock = threading.Lock()
+        self.dropped = 0
+        self._reported = 0
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge args now so later mutation of the arguments cannot change
+        # the message, but leave formatting and I/O to the listener thread
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+    
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return
+        
+        with self._lock:
+            unreported = self.dropped - self._reported
+            self._reported = self.dropped
+        if unreported:
+            warning = logging.makeLogRecord({
+                "name": __name__,
+                "levelno": logging.WARNING,
+                "levelname": "WARNING",
+                "msg": f"Log queue overflowed; dropped {unreported} records",
+            })
+            try:
+                self.queue.put_nowait(warning)
+            except queue.Full:
+                with self._lock:
+                    self._reported -= unreported
+
+
+def setup_logging(config: Dict[str, Any], queue_config: Optional[Dict[str, Any]] = None) -> logging.handlers.QueueListener:
+    """
+    Configure logging with all root handlers behind a background listener.
+    
+    The handlers from ``config`` (a ``logging.config.dictConfig`` schema)
+    run on a listener thread. Log calls on request threads only enqueue
+    the record.
+    
+    Args:
+        config: Logging configuration dictionary
+        queue_config: Queue settings (``max_size``)
+        
+    Returns:
+        The started queue listener
+    """
+    queue_config = queue_config or {}
+    logging.config.dictConfig(config)
+    root = logging.getLogger()
+    handlers = list(root.handlers)
+    
+    queue_handler = BoundedQueueHandler(queue_config.get("max_size", 10000))
+    listener = logging.handlers.QueueListener(
+        queue_handler.queue,
+        *handlers,
+        respect_handler_level=True
+    )
+    for handler in handlers:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    
+    listener.start()
+    atexit.register(_stop_listener, listener)
+    return listener
+
+
+def _stop_listener(listener: logging.handlers.QueueListener):
+    # Flush pending records at exit unless the listener was already stopped
+    if listener._thread is not None:
+        listener.stop()
@@ -0,0 +1,309 @@
+"""
+Run models larger than RAM by keeping some decoder layers on disk.
+
+``plan_offload`` builds a device map for a RAM budget: embeddings, final
+norm and output head stay in memory, decoder layers stay resident in
+order while they fit, and the remaining layers are offloaded. Offloaded
+weights are read from memory-mapped files (the checkpoint's safetensors
+files, or files accelerate writes to the offload folder) each time their
+layer runs and released afterwards.
+
+``LayerPrefetcher`` overlaps that reading with compute: when a decoder
+layer starts, the weights of the next offloaded layers are loaded on a
+background thread, so they are usually ready by the time those layers run.
+"""
+
+import logging
+import threading
+import time
+from collections.abc import Mapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch
+from torch import nn
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class OffloadPlan:
+    """Placement of a model's weights between memory and disk."""
+    device_map: Dict[str, str]
+    resident_layers: int
+    offloaded_layers: int
+    resident_bytes: int
+    offloaded_bytes: int
+    
+    def describe(self) -> str:
+        total = self.resident_layers + self.offloaded_layers
+        return (
+            f"{self.resident_layers} of {total} decoder layers in memory "
+            f"({self.resident_bytes / 2**20:.1f} MiB), {self.offloaded_layers} on disk "
+            f"({self.offloaded_bytes / 2**20:.1f} MiB read per forward pass)"
+        )
+
+
+def find_decoder_layers(model: nn.Module) -> Tuple[str, nn.ModuleList]:
+    """
+    Find the list of repeated decoder layers of a causal language model.
+    
+    Args:
+        model: Model (real or on the meta device)
+    
+    Returns:
+        Tuple of (qualified name, module list)
+    
+    Raises:
+        ValueError: If the model has no list of decoder layers
+    """
+    block_classes = set(getattr(model, "_no_split_modules", None) or [])
+    candidates = []
+    for name, module in model.named_modules():
+        if isinstance(module, nn.ModuleList) and len(module) > 0:
+            if not block_classes or type(module[0]).__name__ in block_classes:
+                candidates.append((name, module))
+    if not candidates:
+        raise ValueError(f"Could not find decoder layers in {type(model).__name__}")
+    return max(candidates, key=lambda candidate: len(candidate[1]))
+
+
+def plan_offload(
+    model_path: str,
+    ram_budget_bytes: int,
+    torch_dtype: torch.dtype = torch.float32,
+    prefetch_layers: int = 1,
+    trust_remote_code: bool = False
+) -> OffloadPlan:
+    """
+    Decide which decoder layers fit in a RAM budget.
+    
+    Space for the layer being executed and the prefetched layers is
+    reserved from the budget before resident layers are placed.
+    
+    Args:
+        model_path: Model directory
+        ram_budget_bytes: Memory available for weights
+        torch_dtype: Dtype the weights are loaded in
+        prefetch_layers: Offloaded layers loaded ahead of execution
+        trust_remote_code: Allow custom model code (Qwen)
+    
+    Returns:
+        OffloadPlan whose ``device_map`` can be passed to ``from_pretrained``
+    
+    Raises:
+        MemoryError: If the budget cannot hold the layers that must stay in memory
+    """
+    from accelerate import init_empty_weights
+    from accelerate.utils import compute_module_sizes
+    from transformers import AutoConfig, AutoModelForCausalLM
+    
+    config = AutoConfig.from_pretrained(model_path, trust_remote_code=trust_remote_code)
+    with init_empty_weights():
+        meta_model = AutoModelForCausalLM.from_config(config, trust_remote_code=trust_remote_code)
+    sizes = compute_module_sizes(meta_model, dtype=torch_dtype)
+    layers_name, layers = find_decoder_layers(meta_model)
+    
+    layer_names = [f"{layers_name}.{i}" for i in range(len(layers))]
+    layer_sizes = [sizes[name] for name in layer_names]
+    # Everything outside the decoder layers (embeddings, norm, head) stays in memory
+    device_map = {}
+    path = layers_name.split(".")
+    for depth, part in enumerate(path):
+        parent_name = ".".join(path[:depth])
+        for child_name, _ in meta_model.get_submodule(parent_name).named_children():
+            if child_name != part:
+                device_map[f"{parent_name}.{child_name}" if parent_name else child_name] = "cpu"
+    fixed_bytes = sizes[""] - sum(layer_sizes)
+    
+    available = ram_budget_bytes - fixed_bytes - (prefetch_layers + 1) * max(layer_sizes)
+    if available < 0:
+        raise MemoryError(
+            f"RAM budget of {ram_budget_bytes / 2**30:.2f} GiB cannot hold the "
+            f"{fixed_bytes / 2**30:.2f} GiB of non-layer weights plus working space"
+        )
+    resident = 0
+    for name, size in zip(layer_names, layer_sizes):
+        if size <= available:
+            device_map[name] = "cpu"
+            available -= size
+            resident += 1
+        else:
+            device_map[name] = "disk"
+    # Keep offloading contiguous: once a layer is on disk, later ones are too
+    for name in layer_names[resident:]:
+        device_map[name] = "disk"
+    
+    return OffloadPlan(
+        device_map=device_map,
+        resident_layers=resident,
+        offloaded_layers=len(layers) - resident,
+        resident_bytes=fixed_bytes + sum(layer_sizes[:resident]),
+        offloaded_bytes=sum(layer_sizes[resident:])
+    )
+
+
+class _PrefetchedWeights(Mapping):
+    """Weights map of one offloaded module, serving prefetched tensors first."""
+    
+    def __init__(self, weights_map: Mapping, prefetcher: "LayerPrefetcher", layer: int, module_name: str):
+        self.weights_map = weights_map
+        self.prefetcher = prefetcher
+        self.layer = layer
+        self.module_name = module_name
+    
+    def __getitem__(self, key: str):
+        tensor = self.prefetcher._take(self.layer, f"{self.module_name}.{key}")
+        return tensor if tensor is not None else self.weights_map[key]
+    
+    def __iter__(self):
+        return iter(self.weights_map)
+    
+    def __len__(self):
+        return len(self.weights_map)
+
+
+@dataclass
+class _LayerWeights:
+    """Offloaded modules of one decoder layer."""
+    index: int
+    # (qualified tensor name, module name, tensor name within the module, original weights map)
+    tensors: List[Tuple[str, str, str, Mapping]] = field(default_factory=list)
+
+
+class LayerPrefetcher:
+    """
+    Load the weights of upcoming offloaded layers while the current layer runs.
+    
+    Loaded tensors are handed to accelerate's offload hooks in place of a
+    synchronous read and dropped after use, so at most ``depth`` layers are
+    held in memory ahead of execution. After the last layer the first
+    offloaded layer is prefetched for the next decoding step.
+    """
+    
+    def __init__(self, model: nn.Module, depth: int = 1):
+        """
+        Attach the prefetcher to a model loaded with disk offload.
+        
+        Args:
+            model: Model loaded with a device map containing "disk" entries
+            depth: Offloaded layers loaded ahead of the running layer
+        """
+        from accelerate.utils import named_module_tensors
+        
+        self.depth = depth
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="layer-prefetch")
+        self._pending: Dict[int, Future] = {}
+        self._ready: Dict[int, Dict[str, torch.Tensor]] = {}
+        self._hits = 0
+        self._misses = 0
+        self._stall_seconds = 0.0
+        self._load_seconds = 0.0
+        
+        layers_name, layers = find_decoder_layers(model)
+        self._layers: Dict[int, _LayerWeights] = {}
+        for index, layer in enumerate(layers):
+            weights = _LayerWeights(index)
+            for module_name, module in layer.named_modules():
+                hook = getattr(module, "_hf_hook", None)
+                if hook is None or not getattr(hook, "offload", False) or hook.weights_map is None:
+                    continue
+                original = hook.weights_map
+                for tensor_name, _ in named_module_tensors(
+                    module,
+                    include_buffers=hook.offload_buffers,
+                    recurse=hook.place_submodules,
+                    remove_non_persistent=True
+                ):
+                    weights.tensors.append((f"{module_name}.{tensor_name}", module_name, tensor_name, original))
+                hook.weights_map = _PrefetchedWeights(original, self, index, module_name)
+            if weights.tensors:
+                self._layers[index] = weights
+            layer.register_forward_pre_hook(self._make_pre_hook(index))
+            layer.register_forward_hook(self._make_post_hook(index))
+        
+        self._order = sorted(self._layers)
+        logger.info(
+            "Prefetching %d offloaded layers of %s, %d ahead",
+            len(self._order),
+            layers_name,
+            depth
+        )
+    
+    def _make_pre_hook(self, index: int):
+        def pre_hook(module, args):
+            self._schedule_after(index)
+        return pre_hook
+    
+    def _make_post_hook(self, index: int):
+        def post_hook(module, args, output):
+            # Drop anything the layer did not use
+            with self._lock:
+                self._ready.pop(index, None)
+        return post_hook
+    
+    def _schedule_after(self, index: int):
+        """Start loading the offloaded layers following ``index``."""
+        if not self._order:
+            return
+        upcoming = [i for i in self._order if i > index] + [i for i in self._order if i <= index]
+        with self._lock:
+            for layer in upcoming[:self.depth]:
+                if layer != index and layer not in self._pending:
+                    self._pending[layer] = self._executor.submit(self._load, layer)
+    
+    def _load(self, index: int) -> Dict[str, torch.Tensor]:
+        start = time.perf_counter()
+        tensors = {name: weights_map[key] for name, _, key, weights_map in self._layers[index].tensors}
+        with self._lock:
+            self._load_seconds += time.perf_counter() - start
+        return tensors
+    
+    def _take(self, layer: int, name: str) -> Optional[torch.Tensor]:
+        """Get a prefetched tensor, waiting for its layer if it is still loading."""
+        with self._lock:
+            tensors = self._ready.get(layer)
+            future = self._pending.pop(layer, None) if tensors is None else None
+        if tensors is None:
+            if future is None:
+                with self._lock:
+                    self._misses += 1
+                return None
+            start = time.perf_counter()
+            tensors = future.result()
+            with self._lock:
+                self._stall_seconds += time.perf_counter() - start
+                tensors = self._ready.setdefault(layer, tensors)
+        
+        with self._lock:
+            tensor = tensors.pop(name, None)
+            if not tensors:
+                self._ready.pop(layer, None)
+            if tensor is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        return tensor
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get prefetching statistics.
+        
+        Returns:
+            Dictionary with offloaded layer count, tensors served from
+            prefetched layers (hits) or read synchronously (misses), and
+            seconds spent loading in the background or waiting for a load
+        """
+        with self._lock:
+            return {
+                "offloaded_layers": len(self._order),
+                "hits": self._hits,
+                "misses": self._misses,
+                "load_seconds": self._load_seconds,
+                "stall_seconds": self._stall_seconds,
+            }
+    
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,120 @@
+"""Output length statistics used to size per-request token budgets."""
+
+import math
+import threading
+from collections import defaultdict, deque
+from typing import Any, Dict
+
+import numpy as np
+
+
+def input_size_bucket(input_size: int) -> int:
+    """Group input sizes into power-of-two buckets."""
+    return max(input_size, 1).bit_length()
+
+
+class OutputLengthPredictor:
+    """
+    Predict how many tokens a request will generate.
+    
+    Output lengths are recorded per (action, language, input size bucket),
+    where the input size is the length in characters of the prompt or code
+    the request operates on, so a budget can be predicted before the request
+    is tokenized.
+    The prediction is a high quantile of recent lengths times a safety
+    margin; buckets with too few samples fall back to all sizes of the same
+    action and language, then to the caller's maximum.
+    """
+    
+    def __init__(
+        self,
+        quantile: float = 0.95,
+        margin: float = 1.25,
+        min_samples: int = 20,
+        min_budget: int = 64,
+        window: int = 256
+    ):
+        """
+        Initialize the predictor.
+        
+        Args:
+            quantile: Quantile of recorded lengths used as the estimate
+            margin: Factor applied on top of the quantile
+            min_samples: Samples needed before a bucket is trusted
+            min_budget: Smallest budget ever predicted
+            window: Most recent lengths kept per bucket
+        """
+        self.quantile = quantile
+        self.margin = margin
+        self.min_samples = min_samples
+        self.min_budget = min_budget
+        self._lock = threading.Lock()
+        self._lengths = defaultdict(lambda: deque(maxlen=window))
+        self._predictions = 0
+    
+    def record(self, action: str, language: str, input_size: int, output_tokens: int):
+        """
+        Record the length of a finished generation.
+        
+        Args:
+            action: "generate", "explain", "refactor", ...
+            language: Programming language ("" if unknown)
+            input_size: Length of the request input in characters
+            output_tokens: Number of generated tokens
+        """
+        with self._lock:
+            self._lengths[(action, language, input_size_bucket(input_size))].append(output_tokens)
+            self._lengths[(action, language, None)].append(output_tokens)
+    
+    def predict(self, action: str, language: str, input_size: int, max_tokens: int) -> int:
+        """
+        Predict a token budget for a request.
+        
+        Args:
+            action: Request action
+            language: Programming language ("" if unknown)
+            input_size: Length of the request input in characters
+            max_tokens: Upper bound on the budget
+        
+        Returns:
+            Predicted budget between ``min_budget`` and ``max_tokens``
+        """
+        with self._lock:
+            samples = None
+            for key in ((action, language, input_size_bucket(input_size)), (action, language, None)):
+                lengths = self._lengths.get(key)
+                if lengths is not None and len(lengths) >= self.min_samples:
+                    samples = np.array(lengths)
+                    break
+            if samples is None:
+                return max_tokens
+            self._predictions += 1
+        
+        budget = math.ceil(np.quantile(samples, self.quantile) * self.margin)
+        return max(min(budget, max_tokens), min(self.min_budget, max_tokens))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get prediction statistics.
+        
+        Returns:
+            Dictionary with the number of predictions and per
+            (action, language) length percentiles
+        """
+        with self._lock:
+            per_task = {
+                f"{action}/{language or '-'}": np.array(lengths)
+                for (action, language, bucket), lengths in self._lengths.items()
+                if bucket is None and lengths
+            }
+            stats: Dict[str, Any] = {"predictions": self._predictions}
+        stats["lengths"] = {
+            task: {
+                "count": len(lengths),
+                "p50": float(np.percentile(lengths, 50)),
+                "p95": float(np.percentile(lengths, 95)),
+                "max": int(lengths.max()),
+            }
+            for task, lengths in per_task.items()
+        }
+        return stats
@@ -0,0 +1,106 @@
+"""Per-machine performance profiles produced by hardware autotuning."""
+
+import json
+import logging
+import os
+import platform
+from typing import Any, Dict, Optional
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+PROFILE_NAME = "perf_profile.json"
+
+
+def cpu_signature() -> Dict[str, Any]:
+    """
+    Describe the current CPU so profiles are only applied where measured.
+    
+    Returns:
+        Dictionary with the CPU model name and logical core count
+    """
+    model = platform.processor()
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    model = line.split(":", 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    return {"cpu_model": model, "cpu_count": os.cpu_count()}
+
+
+def save_performance_profile(model_path: str, profile: Dict[str, Any]) -> str:
+    """
+    Write a performance profile next to the model weights.
+    
+    Args:
+        model_path: Path to the model directory
+        profile: Tuned settings and measurements
+        
+    Returns:
+        Path of the written profile
+    """
+    path = os.path.join(model_path, PROFILE_NAME)
+    with open(path, "w") as f:
+        json.dump({**cpu_signature(), **profile}, f, indent=2)
+    return path
+
+
+def load_performance_profile(model_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Load the performance profile for a model if it matches this machine.
+    
+    Args:
+        model_path: Path to the model directory
+        
+    Returns:
+        Profile dictionary, or None if absent or measured on another CPU
+    """
+    try:
+        with open(os.path.join(model_path, PROFILE_NAME)) as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    signature = cpu_signature()
+    if any(profile.get(key) != value for key, value in signature.items()):
+        logger.warning("Ignoring performance profile measured on a different CPU")
+        return None
+    return profile
+
+
+def apply_performance_profile(profile: Dict[str, Any]):
+    """
+    Apply process-wide settings from a performance profile.
+    
+    Args:
+        profile: Profile returned by :func:`load_performance_profile`
+    """
+    if profile.get("cpu_affinity") and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, profile["cpu_affinity"])
+    if profile.get("num_threads"):
+        torch.set_num_threads(profile["num_threads"])
+    logger.info(
+        "Applied performance profile: %s threads, dtype %s",
+        profile.get("num_threads"),
+        profile.get("dtype")
+    )
+
+
+def profile_dtype(profile: Optional[Dict[str, Any]], default: torch.dtype) -> torch.dtype:
+    """
+    Get the tuned dtype from a profile.
+    
+    Args:
+        profile: Profile dictionary or None
+        default: dtype used when the profile does not set one
+        
+    Returns:
+        torch dtype
+    """
+    if profile is None or not profile.get("dtype"):
+        return default
+    return getattr(torch, profile["dtype"])
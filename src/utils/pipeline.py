@@ -0,0 +1,354 @@
+"""Resumable directory-wide explain/refactor/validate pipeline."""
+
+import fnmatch
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from .code_utils import get_language_from_file
+from .watch import scan_sources
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_ACTIONS = ("explain", "refactor", "validate")
+
+# Marks the end of the work queue
+_DONE = object()
+
+
+@dataclass
+class PipelineJob:
+    """One file moving through the pipeline."""
+    path: str
+    relative_path: str
+    language: str
+    code: str
+    sha256: str
+    output: Any = None
+    error: Optional[str] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class PipelineReport:
+    """Summary of a pipeline run."""
+    total: int = 0
+    processed: int = 0
+    skipped: int = 0
+    failed: int = 0
+    input_bytes: int = 0
+    elapsed: float = 0.0
+    stage_seconds: Dict[str, float] = field(default_factory=dict)
+    
+    @property
+    def files_per_second(self) -> float:
+        return self.processed / self.elapsed if self.elapsed else 0.0
+    
+    def format(self) -> str:
+        """Render the report for the terminal."""
+        lines = [
+            f"Files: {self.total} total, {self.processed} processed, "
+            f"{self.skipped} already done, {self.failed} failed",
+            f"Elapsed: {self.elapsed:.1f}s ({self.files_per_second:.2f} files/s, "
+            f"{self.input_bytes / max(self.elapsed, 1e-9) / 1024:.1f} KiB/s)",
+        ]
+        for stage, seconds in self.stage_seconds.items():
+            busy = 100 * seconds / self.elapsed if self.elapsed else 0.0
+            lines.append(f"  {stage}: {seconds:.1f}s busy ({busy:.0f}% of wall time)")
+        return "\n".join(lines)
+
+
+class Journal:
+    """Append-only JSONL record of finished files, used to resume runs."""
+    
+    def __init__(self, path: str):
+        """
+        Open a journal, loading entries from earlier runs.
+        
+        Args:
+            path: JSONL file (created if missing)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._done: Dict[Tuple[str, Optional[str], str], str] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A run killed mid-write leaves a truncated last line
+                        continue
+                    key = (entry["action"], entry.get("output_dir"), entry["path"])
+                    if entry["status"] == "done":
+                        self._done[key] = entry["sha256"]
+                    else:
+                        self._done.pop(key, None)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a")
+        if self._file.tell() > 0:
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    # Start a fresh line after a truncated entry
+                    self._file.write("\n")
+    
+    def is_done(self, action: str, path: str, sha256: str, output_dir: Optional[str] = None) -> bool:
+        """
+        Check whether a file with this content already finished.
+        
+        Results are only reused for the same output directory, so a rerun
+        writing somewhere else (or writing at all) processes the file again.
+        """
+        return self._done.get((action, output_dir, path)) == sha256
+    
+    def record(self, action: str, job: PipelineJob, output_dir: Optional[str] = None):
+        """Append a job's outcome and flush it to disk."""
+        entry = {
+            "action": action,
+            "path": job.relative_path,
+            "output_dir": output_dir,
+            "sha256": job.sha256,
+            "status": "failed" if job.error else "done",
+            "error": job.error,
+            "timings": job.timings,
+        }
+        if action != "refactor":
+            entry["output"] = job.output
+        with self._lock:
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            if job.error is None:
+                self._done[(action, output_dir, job.relative_path)] = job.sha256
+    
+    def close(self):
+        self._file.close()
+
+
+def discover_files(root: str, pattern: Optional[str] = None, exclude: Optional[List[str]] = None) -> List[str]:
+    """
+    Find Python and C++ source files under a directory.
+    
+    Args:
+        root: Directory to search
+        pattern: Optional file name glob (e.g. "*.py")
+        exclude: Directories whose files are skipped (e.g. an output
+            directory inside ``root``)
+    
+    Returns:
+        Sorted list of file paths
+    """
+    excluded = [os.path.abspath(directory) for directory in exclude or []]
+    return sorted(
+        path for path in scan_sources(root)
+        if (pattern is None or fnmatch.fnmatch(os.path.basename(path), pattern))
+        and not any(_is_within(path, directory) for directory in excluded)
+    )
+
+
+def _is_within(path: str, directory: str) -> bool:
+    path = os.path.abspath(path)
+    return os.path.commonpath([path, directory]) == directory
+
+
+def default_journal_path(root: str) -> str:
+    """
+    Journal location for a directory, outside the directory itself.
+    
+    Args:
+        root: Directory being processed
+    
+    Returns:
+        Path under the user's cache directory, unique per directory
+    """
+    root = os.path.abspath(root)
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    digest = hashlib.sha256(root.encode()).hexdigest()[:16]
+    return os.path.join(cache_home, "ai-code", "journals", f"{os.path.basename(root) or 'root'}-{digest}.jsonl")
+
+
+class DirectoryPipeline:
+    """
+    Run an action over many files with overlapping stages.
+    
+    A reader thread loads and hashes the next files while the model works
+    on the current one, and a pool of post-processing threads validates
+    and writes finished results. Tokenization is not a separate stage: the
+    agents build and tokenize their prompts inside each call, and hashing
+    is what the reader needs to skip finished files. Queues between the stages are bounded so
+    memory stays flat on large trees. Every finished file is appended to a
+    journal; rerunning with the same journal and output directory skips
+    files whose content is unchanged since they finished.
+    """
+    
+    def __init__(
+        self,
+        agent,
+        action: str,
+        journal_path: str,
+        output_dir: Optional[str] = None,
+        instructions: str = "Improve code quality and efficiency",
+        queue_size: int = 4,
+        post_workers: int = 2
+    ):
+        """
+        Initialize the pipeline.
+        
+        Args:
+            agent: Agent used for explain and refactor
+            action: "explain", "refactor" or "validate"
+            journal_path: JSONL journal recording finished files
+            output_dir: Directory receiving refactored files and explanations
+                (mirroring the input tree); nothing is written if None
+            instructions: Refactoring instructions
+            queue_size: Jobs buffered between stages
+            post_workers: Threads validating and writing results
+        """
+        if action not in PIPELINE_ACTIONS:
+            raise ValueError(f"Unknown pipeline action: {action}")
+        self.agent = agent
+        self.action = action
+        self.journal_path = journal_path
+        self.output_dir = output_dir
+        # Journal key of the output destination
+        self._journal_output = os.path.abspath(output_dir) if output_dir is not None else None
+        self.instructions = instructions
+        self.queue_size = queue_size
+        self.post_workers = post_workers
+    
+    def _read(
+        self,
+        root: str,
+        files: List[str],
+        journal: Journal,
+        jobs: queue.Queue,
+        report: PipelineReport,
+        lock: threading.Lock
+    ):
+        try:
+            for path in files:
+                start = time.perf_counter()
+                try:
+                    with open(path, encoding="utf-8", errors="replace") as f:
+                        code = f.read()
+                except OSError as e:
+                    logger.warning("Could not read %s: %s", path, e)
+                    with lock:
+                        report.failed += 1
+                    continue
+                relative_path = os.path.relpath(path, root)
+                sha256 = hashlib.sha256(code.encode()).hexdigest()
+                elapsed = time.perf_counter() - start
+                done = journal.is_done(self.action, relative_path, sha256, self._journal_output)
+                with lock:
+                    report.stage_seconds["read"] += elapsed
+                    if done:
+                        report.skipped += 1
+                    else:
+                        report.input_bytes += len(code)
+                if done:
+                    continue
+                job = PipelineJob(path, relative_path, get_language_from_file(path), code, sha256)
+                job.timings["read"] = elapsed
+                jobs.put(job)
+        finally:
+            jobs.put(_DONE)
+    
+    def _generate(self, job: PipelineJob):
+        if self.action == "explain":
+            return self.agent.explain_code(job.code, language=job.language)
+        if self.action == "refactor":
+            return self.agent.refactor_code(job.code, self.instructions, language=job.language)
+        return None
+    
+    def _finish(self, job: PipelineJob, journal: Journal, report: PipelineReport, lock: threading.Lock):
+        start = time.perf_counter()
+        try:
+            if job.error is None:
+                if self.action == "validate":
+                    job.output = self.agent.validate_code(job.code, job.language)
+                elif self.action == "refactor" and not self.agent.validate_code(job.output, job.language):
+                    job.error = "refactored code failed validation"
+                if job.error is None and self.output_dir is not None and self.action != "validate":
+                    suffix = ".md" if self.action == "explain" else ""
+                    destination = os.path.join(self.output_dir, job.relative_path + suffix)
+                    os.makedirs(os.path.dirname(destination), exist_ok=True)
+                    with open(destination, "w") as f:
+                        f.write(job.output)
+        except Exception as e:
+            job.error = str(e)
+        job.timings["finish"] = time.perf_counter() - start
+        journal.record(self.action, job, self._journal_output)
+        with lock:
+            report.stage_seconds["finish"] += job.timings["finish"]
+            if job.error:
+                report.failed += 1
+                logger.warning("Failed %s: %s", job.relative_path, job.error)
+            else:
+                report.processed += 1
+                logger.info("Finished %s", job.relative_path)
+    
+    def run(self, root: str, files: Optional[List[str]] = None) -> PipelineReport:
+        """
+        Process all files under ``root``.
+        
+        Args:
+            root: Directory being processed (paths are journaled relative to it)
+            files: Files to process (defaults to every source file under root)
+        
+        Returns:
+            PipelineReport with counts, throughput and per-stage busy time
+        """
+        if files is None:
+            files = discover_files(root, exclude=[self.output_dir] if self.output_dir else None)
+        report = PipelineReport(total=len(files))
+        report.stage_seconds = {"read": 0.0, "generate": 0.0, "finish": 0.0}
+        journal = Journal(self.journal_path)
+        jobs: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        lock = threading.Lock()
+        start = time.perf_counter()
+        
+        reader = threading.Thread(
+            target=self._read,
+            args=(root, files, journal, jobs, report, lock),
+            name="pipeline-reader",
+            daemon=True
+        )
+        reader.start()
+        try:
+            with ThreadPoolExecutor(max_workers=self.post_workers, thread_name_prefix="pipeline-finish") as finishers:
+                pending = []
+                while True:
+                    job = jobs.get()
+                    if job is _DONE:
+                        break
+                    generate_start = time.perf_counter()
+                    try:
+                        job.output = self._generate(job)
+                    except Exception as e:
+                        job.error = str(e)
+                    job.timings["generate"] = time.perf_counter() - generate_start
+                    with lock:
+                        report.stage_seconds["generate"] += job.timings["generate"]
+                    
+                    # Bound the jobs waiting for post-processing
+                    pending = [future for future in pending if not future.done()]
+                    while len(pending) >= self.queue_size:
+                        pending[0].result()
+                        pending = [future for future in pending if not future.done()]
+                    pending.append(finishers.submit(self._finish, job, journal, report, lock))
+            reader.join()
+        finally:
+            journal.close()
+        
+        report.elapsed = time.perf_counter() - start
+        return report
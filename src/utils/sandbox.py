@@ -0,0 +1,350 @@
+"""
+Pre-forked sandbox pool for running generated Python against tests.
+
+Each pool worker is a long-lived interpreter that imports common modules
+once and then forks a fresh child per check, so a check costs a ``fork()``
+instead of an interpreter start. Children run with CPU, memory, file size
+and process limits in a private temporary directory. This keeps runaway or
+careless code from affecting the host; it is not a security boundary
+against deliberately malicious code. POSIX only.
+"""
+
+import json
+import os
+import select
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from queue import Queue
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_PRELOAD_MODULES = (
+    "collections",
+    "dataclasses",
+    "functools",
+    "heapq",
+    "itertools",
+    "json",
+    "math",
+    "re",
+    "string",
+    "typing",
+    "unittest",
+)
+
+# Output kept per check; anything beyond is dropped
+MAX_OUTPUT_CHARS = 4096
+
+
+@dataclass
+class TestOutcome:
+    """Result of a single test function."""
+    
+    name: str
+    passed: bool
+    duration: float
+    error: Optional[str] = None
+
+
+@dataclass
+class ExecutionResult:
+    """Result of running code and its tests in the sandbox."""
+    
+    passed: bool
+    duration: float
+    tests: List[TestOutcome] = field(default_factory=list)
+    error: Optional[str] = None
+    output: str = ""
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> "ExecutionResult":
+        tests = [TestOutcome(**test) for test in data.pop("tests", [])]
+        return cls(tests=tests, **data)
+
+
+def _set_limits(timeout: float, memory_limit_mb: int):
+    import resource
+    
+    cpu_seconds = int(timeout) + 1
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+    if memory_limit_mb > 0:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (16 * 1024 * 1024, 16 * 1024 * 1024))
+    if hasattr(resource, "RLIMIT_NPROC"):
+        resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+
+
+def _run_tests(code: str, tests: str) -> Tuple[List[dict], Optional[str]]:
+    """Execute code and tests in a fresh namespace (runs in the forked child)."""
+    namespace = {"__name__": "__sandbox__"}
+    try:
+        exec(compile(code, "<code>", "exec"), namespace)
+    except BaseException:
+        return [], "code raised " + traceback.format_exc(limit=-3)
+    
+    start = time.perf_counter()
+    try:
+        # Top-level asserts in the tests count as one test
+        exec(compile(tests, "<tests>", "exec"), namespace)
+        outcomes = [dict(name="<module>", passed=True, duration=time.perf_counter() - start, error=None)]
+    except BaseException:
+        error = traceback.format_exc(limit=-3)
+        return [dict(name="<module>", passed=False, duration=time.perf_counter() - start, error=error)], None
+    
+    for name, test in list(namespace.items()):
+        if not name.startswith("test_") or not callable(test):
+            continue
+        start = time.perf_counter()
+        try:
+            test()
+            outcomes.append(dict(name=name, passed=True, duration=time.perf_counter() - start, error=None))
+        except BaseException:
+            error = traceback.format_exc(limit=-3)
+            outcomes.append(dict(name=name, passed=False, duration=time.perf_counter() - start, error=error))
+    return outcomes, None
+
+
+def _child_main(job: dict, result_fd: int):
+    """Run one job in the forked child and write its result to ``result_fd``."""
+    import io
+    
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+    output = io.StringIO()
+    sys.stdout = sys.stderr = output
+    
+    _set_limits(job["timeout"], job["memory_limit_mb"])
+    tests, error = _run_tests(job["code"], job["tests"])
+    result = {
+        "passed": error is None and all(test["passed"] for test in tests),
+        "tests": tests,
+        "error": error,
+        "output": output.getvalue()[:MAX_OUTPUT_CHARS],
+    }
+    with os.fdopen(result_fd, "w") as f:
+        json.dump(result, f)
+
+
+def _wait_child(pid: int, result_fd: int, timeout: float) -> dict:
+    """Collect a child's result, killing it when it runs past ``timeout``."""
+    deadline = time.monotonic() + timeout
+    chunks = []
+    timed_out = False
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            timed_out = True
+            break
+        ready, _, _ = select.select([result_fd], [], [], remaining)
+        if not ready:
+            continue
+        chunk = os.read(result_fd, 65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    os.close(result_fd)
+    
+    if timed_out:
+        os.kill(pid, signal.SIGKILL)
+    _, status = os.waitpid(pid, 0)
+    if timed_out:
+        return {"passed": False, "error": f"timed out after {timeout:.1f}s"}
+    try:
+        return json.loads(b"".join(chunks))
+    except ValueError:
+        if os.WIFSIGNALED(status):
+            signum = os.WTERMSIG(status)
+            reason = "CPU limit exceeded" if signum == signal.SIGXCPU else signal.Signals(signum).name
+            return {"passed": False, "error": f"killed ({reason})"}
+        return {"passed": False, "error": f"exited with status {os.waitstatus_to_exitcode(status)}"}
+
+
+def _worker_main(preload: Sequence[str]):
+    """Serve jobs read as JSON lines from stdin, forking a child per job."""
+    import importlib
+    
+    for module in preload:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+    
+    protocol_out = os.fdopen(os.dup(1), "w")
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    protocol_out.write("ready\n")
+    protocol_out.flush()
+    
+    for line in sys.stdin:
+        job = json.loads(line)
+        start = time.perf_counter()
+        workdir = tempfile.mkdtemp(prefix="sandbox-")
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            protocol_out.close()
+            try:
+                os.chdir(workdir)
+                _child_main(job, write_fd)
+            finally:
+                os._exit(0)
+        
+        os.close(write_fd)
+        result = _wait_child(pid, read_fd, job["timeout"])
+        shutil.rmtree(workdir, ignore_errors=True)
+        result["duration"] = time.perf_counter() - start
+        protocol_out.write(json.dumps(result) + "\n")
+        protocol_out.flush()
+
+
+class SandboxPool:
+    """Pool of pre-started interpreter workers that run code against tests."""
+    
+    def __init__(
+        self,
+        size: int = 2,
+        timeout: float = 5.0,
+        memory_limit_mb: int = 512,
+        preload_modules: Iterable[str] = DEFAULT_PRELOAD_MODULES
+    ):
+        """
+        Initialize the pool and start its workers.
+        
+        Args:
+            size: Number of worker interpreters (checks run concurrently)
+            timeout: Default wall-clock limit per check in seconds
+            memory_limit_mb: Address space limit per check (0 disables it)
+            preload_modules: Modules each worker imports once at startup
+        """
+        if os.name != "posix":
+            raise RuntimeError("SandboxPool requires a POSIX system")
+        self.size = size
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.preload_modules = list(preload_modules)
+        self._idle: Queue = Queue()
+        self._workers: List[subprocess.Popen] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        for _ in range(size):
+            self._idle.put(self._spawn())
+    
+    def _spawn(self) -> subprocess.Popen:
+        worker = subprocess.Popen(
+            [sys.executable, "-I", os.path.abspath(__file__), json.dumps(self.preload_modules)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True
+        )
+        if worker.stdout.readline() != b"ready\n":
+            worker.kill()
+            raise RuntimeError("Sandbox worker failed to start")
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+    
+    def _retire(self, worker: subprocess.Popen):
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        worker.kill()
+        worker.wait()
+    
+    def run(self, code: str, tests: str = "", timeout: Optional[float] = None) -> ExecutionResult:
+        """
+        Run code followed by its tests in a sandboxed child process.
+        
+        Tests may be top-level statements (e.g. asserts) and/or ``test_*``
+        functions, which are called one by one after the tests execute.
+        
+        Args:
+            code: Python code under test
+            tests: Test code run in the same namespace as ``code``
+            timeout: Wall-clock limit in seconds (defaults to the pool's)
+        
+        Returns:
+            ExecutionResult with overall and per-test outcomes
+        """
+        if self._closed:
+            raise RuntimeError("SandboxPool is closed")
+        timeout = timeout or self.timeout
+        job = {
+            "code": code,
+            "tests": tests,
+            "timeout": timeout,
+            "memory_limit_mb": self.memory_limit_mb,
+        }
+        
+        worker = self._idle.get()
+        start = time.perf_counter()
+        try:
+            worker.stdin.write((json.dumps(job) + "\n").encode())
+            worker.stdin.flush()
+            # The worker enforces the timeout; this only guards against a hung worker
+            ready, _, _ = select.select([worker.stdout], [], [], timeout + 5)
+            line = worker.stdout.readline() if ready else b""
+        except OSError:
+            line = b""
+        
+        if not line:
+            self._retire(worker)
+            if not self._closed:
+                worker = self._spawn()
+            self._idle.put(worker)
+            return ExecutionResult(
+                passed=False,
+                duration=time.perf_counter() - start,
+                error="sandbox worker crashed"
+            )
+        
+        self._idle.put(worker)
+        return ExecutionResult.from_dict(json.loads(line))
+    
+    def run_many(self, jobs: Sequence[Tuple[str, str]], timeout: Optional[float] = None) -> List[ExecutionResult]:
+        """
+        Run several (code, tests) pairs across the pool's workers.
+        
+        Args:
+            jobs: Pairs of code and tests
+            timeout: Wall-clock limit per check in seconds
+        
+        Returns:
+            Results in the order of ``jobs``
+        """
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            return list(executor.map(lambda job: self.run(job[0], job[1], timeout), jobs))
+    
+    def close(self):
+        """Stop all workers."""
+        self._closed = True
+        with self._lock:
+            workers = list(self._workers)
+            self._workers.clear()
+        for worker in workers:
+            try:
+                worker.stdin.close()
+            except OSError:
+                pass
+            worker.kill()
+            worker.wait()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+
+if __name__ == "__main__":
+    _worker_main(json.loads(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PRELOAD_MODULES)
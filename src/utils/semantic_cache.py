@@ -0,0 +1,124 @@
+"""Semantic near-duplicate cache for generated code."""
+
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """
+    Cache of generation results keyed by prompt embeddings.
+    
+    Entries are stored per language as rows of a normalized embedding
+    matrix, so a lookup is a single matrix-vector product followed by an
+    argmax. When the cache is full the least recently used entry is
+    replaced.
+    """
+    
+    def __init__(self, threshold: float = 0.92, max_entries: int = 1024):
+        """
+        Initialize the cache.
+        
+        Args:
+            threshold: Minimum cosine similarity for a hit
+            max_entries: Maximum number of entries per language
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._embeddings: Dict[str, np.ndarray] = {}
+        self._results: Dict[str, list] = {}
+        self._last_used: Dict[str, np.ndarray] = {}
+        self._clock = 0
+        self._hits = 0
+        self._misses = 0
+    
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+    
+    def lookup(self, language: str, embedding) -> Optional[str]:
+        """
+        Find a stored result for a similar prompt.
+        
+        Args:
+            language: Target programming language
+            embedding: Embedding of the new prompt
+            
+        Returns:
+            Stored result if a prompt above the threshold exists, else None
+        """
+        language = language.lower()
+        query = self._normalize(embedding)
+        with self._lock:
+            matrix = self._embeddings.get(language)
+            if matrix is None or matrix.shape[1] != query.shape[0]:
+                self._misses += 1
+                return None
+            
+            similarities = matrix @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self._misses += 1
+                return None
+            
+            self._hits += 1
+            self._clock += 1
+            self._last_used[language][best] = self._clock
+            logger.debug("Semantic cache hit (similarity %.3f)", similarities[best])
+            return self._results[language][best]
+    
+    def add(self, language: str, embedding, result: str):
+        """
+        Store a result for a prompt.
+        
+        Args:
+            language: Target programming language
+            embedding: Embedding of the prompt
+            result: Validated generation result
+        """
+        language = language.lower()
+        vector = self._normalize(embedding)
+        with self._lock:
+            self._clock += 1
+            matrix = self._embeddings.get(language)
+            if matrix is None or matrix.shape[1] != vector.shape[0]:
+                self._embeddings[language] = vector[None, :]
+                self._results[language] = [result]
+                self._last_used[language] = np.array([self._clock], dtype=np.int64)
+            elif matrix.shape[0] < self.max_entries:
+                self._embeddings[language] = np.vstack([matrix, vector])
+                self._results[language].append(result)
+                self._last_used[language] = np.append(self._last_used[language], self._clock)
+            else:
+                victim = int(np.argmin(self._last_used[language]))
+                matrix[victim] = vector
+                self._results[language][victim] = result
+                self._last_used[language][victim] = self._clock
+    
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._embeddings.clear()
+            self._results.clear()
+            self._last_used.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+        
+        Returns:
+            Dictionary with hit/miss counts and entries per language
+        """
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "entries": {lang: len(results) for lang, results in self._results.items()},
+            }
@@ -0,0 +1,211 @@
+"""Coalescing of identical in-flight agent requests."""
+
+import contextvars
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from .cancellation import CancellationToken, GenerationCancelled, SharedCancellationToken, token_from_kwargs
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of a waiting caller's cancellation token
+POLL_INTERVAL = 0.05
+
+
+class _Call:
+    """State shared between the callers attached to one computation."""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+        self.token = SharedCancellationToken()
+
+
+class SingleFlight:
+    """
+    Execute a function at most once per key at any given time.
+    
+    The first caller for a key (the leader) starts the function on a
+    background thread; callers that arrive with the same key while it is
+    still running attach to it. Every caller waits for the result on its
+    own and receives the same result or exception, unless its cancellation
+    token stops first. The function's own token only stops once the tokens
+    of all attached callers have.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._executed = 0
+        self._coalesced = 0
+        self._saved_seconds = 0.0
+    
+    def do(
+        self,
+        key: Hashable,
+        fn: Callable[[CancellationToken], Any],
+        cancel_token: Optional[CancellationToken] = None
+    ) -> Any:
+        """
+        Run ``fn`` or wait for an identical in-flight call.
+        
+        Args:
+            key: Key identifying identical requests
+            fn: Callable computing the result, given a token that stops
+                once every attached caller has stopped
+            cancel_token: This caller's token (None waits for the result)
+            
+        Returns:
+            Result of the (possibly shared) call
+            
+        Raises:
+            GenerationCancelled: If ``cancel_token`` stops while other
+                callers still need the result
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self._executed += 1
+            else:
+                call.followers += 1
+                self._coalesced += 1
+            # Attached under the lock so the running call always sees this caller
+            call.token.add(cancel_token)
+        
+        if leader:
+            # Run in the caller's context so request ids reach the log records
+            context = contextvars.copy_context()
+            threading.Thread(
+                target=context.run,
+                args=(self._run, key, call, fn),
+                name="single-flight",
+                daemon=True
+            ).start()
+        
+        while not call.done.wait(None if cancel_token is None else POLL_INTERVAL):
+            reason = cancel_token.stop_reason
+            # Once every caller has stopped the call ends promptly with its partial output
+            if reason is not None and call.token.stop_reason is None:
+                if not leader:
+                    with self._lock:
+                        call.followers -= 1
+                raise GenerationCancelled(reason)
+        if call.error is not None:
+            raise call.error
+        return call.result
+    
+    def _run(self, key: Hashable, call: _Call, fn: Callable[[CancellationToken], Any]):
+        start = time.perf_counter()
+        try:
+            call.result = fn(call.token)
+        except BaseException as e:
+            call.error = e
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                del self._calls[key]
+                self._saved_seconds += elapsed * call.followers
+            if call.followers:
+                logger.debug("Coalesced %d duplicate calls for %s", call.followers, key)
+            call.done.set()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get deduplication statistics.
+        
+        Returns:
+            Dictionary with executed and coalesced call counts and the
+            compute time saved by coalescing
+        """
+        with self._lock:
+            total = self._executed + self._coalesced
+            return {
+                "executed": self._executed,
+                "coalesced": self._coalesced,
+                "in_flight": len(self._calls),
+                "dedup_ratio": self._coalesced / total if total else 0.0,
+                "saved_seconds": self._saved_seconds,
+            }
+
+
+def make_request_key(model: str, action: str, text: str, params: Dict[str, Any]) -> str:
+    """
+    Build a key identifying an agent request.
+    
+    Args:
+        model: Model name or path
+        action: Agent action (generate, explain, refactor)
+        text: Prompt or code the action operates on
+        params: Remaining request parameters
+        
+    Returns:
+        Hex digest identifying the request
+    """
+    input_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    payload = json.dumps([model, action, input_hash, params], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CoalescingAgent:
+    """
+    Agent wrapper that deduplicates identical concurrent requests.
+    
+    Calls with a ``streamer`` are passed straight through, since each
+    streaming caller needs its own token stream. Cancellation tokens and
+    deadlines are not part of the request key: a caller whose token stops
+    returns with :class:`GenerationCancelled` right away, while the shared
+    computation is only cancelled once every attached caller has cancelled
+    or timed out.
+    """
+    
+    def __init__(self, agent):
+        """
+        Initialize the wrapper.
+        
+        Args:
+            agent: Agent whose action methods should be coalesced
+        """
+        self.agent = agent
+        self.single_flight = SingleFlight()
+        self._model = agent.config.get("model_name", agent.model_path)
+    
+    def __getattr__(self, name):
+        return getattr(self.agent, name)
+    
+    def _call(self, action: str, method: Callable[..., str], text: str, *args, **kwargs) -> str:
+        if kwargs.get("streamer") is not None:
+            return method(text, *args, **kwargs)
+        
+        caller_token = token_from_kwargs(kwargs)
+        params = {k: v for k, v in kwargs.items() if k not in ("cancel_token", "deadline")}
+        key = make_request_key(self._model, action, text, {"args": args, "kwargs": params})
+        return self.single_flight.do(
+            key,
+            lambda shared: method(text, *args, cancel_token=shared, **params),
+            caller_token
+        )
+    
+    def generate_code(self, prompt: str, language: str, **kwargs) -> str:
+        """Generate code, sharing the result with identical in-flight requests."""
+        return self._call("generate", self.agent.generate_code, prompt, language, **kwargs)
+    
+    def explain_code(self, code: str, **kwargs) -> str:
+        """Explain code, sharing the result with identical in-flight requests."""
+        return self._call("explain", self.agent.explain_code, code, **kwargs)
+    
+    def refactor_code(self, code: str, instructions: str, **kwargs) -> str:
+        """Refactor code, sharing the result with identical in-flight requests."""
+        return self._call("refactor", self.agent.refactor_code, code, instructions, **kwargs)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get deduplication statistics."""
+        return self.single_flight.get_stats()
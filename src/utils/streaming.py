@@ -0,0 +1,93 @@
+"""Streamers that post-process generated text while decoding continues."""
+
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+
+from transformers import TextStreamer
+from transformers.generation.streamers import BaseStreamer
+
+from .code_utils import CodeFenceParser
+
+logger = logging.getLogger(__name__)
+
+
+class CodeBlockStreamer(TextStreamer):
+    """
+    Parse code fences from the token stream and process each closed block.
+    
+    ``process_block(language, code)`` is submitted to a thread pool as soon
+    as a block's closing fence is decoded, so formatting and validation of
+    one block overlap with generation of the next.
+    """
+    
+    def __init__(
+        self,
+        tokenizer,
+        process_block: Callable[[str, str], Any],
+        downstream: Optional[BaseStreamer] = None,
+        max_workers: int = 2,
+    ):
+        """
+        Initialize the streamer.
+        
+        Args:
+            tokenizer: Tokenizer used to decode generated tokens
+            process_block: Callable applied to each (language, code) block
+            downstream: Optional streamer that also receives every token
+            max_workers: Number of blocks processed concurrently
+        """
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        self.parser = CodeFenceParser()
+        self.process_block = process_block
+        self.downstream = downstream
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="block-postprocess"
+        )
+        self._blocks: List[Tuple[str, Future]] = []
+        self._received_text = False
+    
+    def put(self, value):
+        super().put(value)
+        if self.downstream is not None:
+            self.downstream.put(value)
+    
+    def end(self):
+        super().end()
+        if self.downstream is not None:
+            self.downstream.end()
+    
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        if text:
+            self._received_text = True
+        for block in self.parser.feed(text):
+            self._submit(block)
+        if stream_end:
+            for block in self.parser.close():
+                self._submit(block)
+    
+    def _submit(self, block: Tuple[str, str]):
+        language, code = block
+        logger.debug("Code block closed (%s, %d chars)", language or "untagged", len(code))
+        self._blocks.append((language, self._executor.submit(self.process_block, language, code)))
+    
+    def results(self, generated_text: Optional[str] = None) -> List[Tuple[str, Any]]:
+        """
+        Wait for all blocks to be processed.
+        
+        Args:
+            generated_text: Full generated text, parsed instead of the stream
+                if the model did not call the streamer
+            
+        Returns:
+            List of (language, processed block) tuples in output order
+        """
+        if not self._received_text and generated_text:
+            for block in self.parser.feed(generated_text) + self.parser.close():
+                self._submit(block)
+        try:
+            return [(language, future.result()) for language, future in self._blocks]
+        finally:
+            self._executor.shutdown(wait=False)
+
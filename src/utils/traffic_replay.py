@@ -0,0 +1,414 @@
+"""Replay recorded request traffic against an agent or a running server."""
+
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .latency import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+REPLAY_ACTIONS = ("generate", "explain", "refactor")
+
+# Marks the end of the work queue
+_DONE = object()
+
+
+@dataclass
+class ReplayRequest:
+    """One recorded request."""
+    action: str
+    input: str
+    language: str = ""
+    arrival_time: float = 0.0
+    instructions: str = "Improve code quality and efficiency"
+
+
+def load_request_log(path: str) -> List[ReplayRequest]:
+    """
+    Load a JSONL request log.
+    
+    Each line holds ``action``, ``input`` (prompt or code), ``language`` and
+    ``arrival_time`` (seconds, on any clock), plus optional
+    ``instructions`` for refactor requests.
+    
+    Args:
+        path: JSONL file
+    
+    Returns:
+        Requests sorted by arrival, with arrival times relative to the first
+    
+    Raises:
+        ValueError: If a line has an unknown action or no input
+    """
+    requests = []
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry.get("action") not in REPLAY_ACTIONS or "input" not in entry:
+                raise ValueError(f"{path}:{number}: expected an action in {REPLAY_ACTIONS} and an input")
+            requests.append(ReplayRequest(
+                action=entry["action"],
+                input=entry["input"],
+                language=entry.get("language", ""),
+                arrival_time=float(entry.get("arrival_time", 0.0)),
+                instructions=entry.get("instructions", ReplayRequest.instructions)
+            ))
+    requests.sort(key=lambda request: request.arrival_time)
+    if requests:
+        first = requests[0].arrival_time
+        for request in requests:
+            request.arrival_time -= first
+    return requests
+
+
+def arrival_offsets(
+    requests: List[ReplayRequest],
+    qps: Optional[float] = None,
+    speed: float = 1.0,
+    poisson: bool = False,
+    seed: int = 0
+) -> List[float]:
+    """
+    Compute when each request is sent, relative to the start of the run.
+    
+    Args:
+        requests: Requests in arrival order
+        qps: Send at this rate instead of the recorded arrival times
+        speed: Replay the recorded arrivals this many times faster
+        poisson: With ``qps``, draw exponential gaps instead of even spacing
+        seed: Random seed for Poisson arrivals
+    
+    Returns:
+        Send offsets in seconds
+    """
+    if qps is None:
+        return [request.arrival_time / speed for request in requests]
+    if not poisson:
+        return [i / qps for i in range(len(requests))]
+    rng = random.Random(seed)
+    offsets, now = [], 0.0
+    for _ in requests:
+        offsets.append(now)
+        now += rng.expovariate(qps)
+    return offsets
+
+
+class FirstTokenStreamer:
+    """Streamer recording when the first generated token arrives."""
+    
+    def __init__(self):
+        self.first_token_time: Optional[float] = None
+        self._seen_prompt = False
+    
+    def put(self, value):
+        # The first put carries the prompt
+        if not self._seen_prompt:
+            self._seen_prompt = True
+        elif self.first_token_time is None:
+            self.first_token_time = time.perf_counter()
+    
+    def end(self):
+        pass
+
+
+class InProcessTarget:
+    """Send requests straight to an agent."""
+    
+    def __init__(self, agent, stream: bool = True):
+        """
+        Initialize the target.
+        
+        Args:
+            agent: Agent handling the requests
+            stream: Pass a streamer to measure time to first token (this
+                bypasses the semantic cache and best-of sampling)
+        """
+        self.agent = agent
+        self.stream = stream
+    
+    def send(self, request: ReplayRequest) -> Tuple[str, Optional[float]]:
+        """
+        Run one request.
+        
+        Args:
+            request: Request to run
+        
+        Returns:
+            Tuple of (result, first token time or None)
+        """
+        kwargs = {}
+        streamer = None
+        if self.stream:
+            streamer = kwargs["streamer"] = FirstTokenStreamer()
+        if request.action == "generate":
+            result = self.agent.generate_code(request.input, request.language, **kwargs)
+        elif request.action == "explain":
+            result = self.agent.explain_code(request.input, language=request.language, **kwargs)
+        else:
+            result = self.agent.refactor_code(
+                request.input, request.instructions, language=request.language, **kwargs
+            )
+        return result, streamer.first_token_time if streamer is not None else None
+    
+    def queue_depth(self) -> Optional[int]:
+        return None
+
+
+class HttpTarget:
+    """Send requests to a running API server."""
+    
+    def __init__(self, base_url: str, stream: bool = True, timeout: float = 600.0):
+        """
+        Initialize the target.
+        
+        Args:
+            base_url: Server address (e.g. "http://localhost:8000")
+            stream: Request server-sent events to measure time to first token
+            timeout: Seconds before a request is abandoned
+        """
+        self.base_url = base_url.rstrip("/")
+        self.stream = stream
+        self.timeout = timeout
+        self._local = threading.local()
+    
+    @property
+    def _session(self):
+        # Sessions are not thread-safe; each worker keeps its own connection pool
+        session = getattr(self._local, "session", None)
+        if session is None:
+            import requests
+            session = self._local.session = requests.Session()
+        return session
+    
+    def send(self, request: ReplayRequest) -> Tuple[str, Optional[float]]:
+        """
+        Run one request.
+        
+        Args:
+            request: Request to run
+        
+        Returns:
+            Tuple of (result, first token time or None)
+        
+        Raises:
+            RuntimeError: If the server answers with an error
+        """
+        if request.action == "generate":
+            body = {"prompt": request.input, "language": request.language}
+        else:
+            body = {"code": request.input, "language": request.language}
+            if request.action == "refactor":
+                body["instructions"] = request.instructions
+        body["stream"] = self.stream
+        
+        with self._session.post(
+            f"{self.base_url}/{request.action}",
+            json=body,
+            stream=self.stream,
+            timeout=self.timeout
+        ) as response:
+            if response.status_code != 200:
+                raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+            if not self.stream:
+                return response.json()["result"], None
+            
+            first_token_time = None
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                elif line.startswith("data: "):
+                    data = json.loads(line[len("data: "):])
+                    if event == "token" and first_token_time is None:
+                        first_token_time = time.perf_counter()
+                    elif event == "done":
+                        return data["result"], first_token_time
+                    elif event == "error":
+                        raise RuntimeError(data["detail"])
+        raise RuntimeError("Stream ended without a result")
+    
+    def queue_depth(self) -> Optional[int]:
+        """Read the server's scheduler queue depth from its health endpoint."""
+        try:
+            response = self._session.get(f"{self.base_url}/health", timeout=5)
+            return response.json()["scheduler"]["queue_depth"]
+        except Exception:
+            return None
+
+
+@dataclass
+class LoadTestReport:
+    """Summary of a load test run."""
+    sent: int = 0
+    completed: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+    latency: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # (seconds since start, waiting locally, in flight, server queue depth)
+    queue_samples: List[Tuple[float, int, int, Optional[int]]] = field(default_factory=list)
+    
+    @property
+    def throughput(self) -> float:
+        return self.completed / self.elapsed if self.elapsed else 0.0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "sent": self.sent,
+            "completed": self.completed,
+            "failed": self.failed,
+            "elapsed": self.elapsed,
+            "throughput": self.throughput,
+            "latency": self.latency,
+            "queue_samples": self.queue_samples,
+        }
+    
+    def format(self) -> str:
+        """Render the report for the terminal."""
+        lines = [
+            f"Requests: {self.sent} sent, {self.completed} completed, {self.failed} failed",
+            f"Elapsed: {self.elapsed:.1f}s ({self.throughput:.2f} requests/s)",
+        ]
+        for label in sorted(self.latency):
+            stats = self.latency[label]
+            lines.append(
+                f"  {label}: n={stats['count']} p50={stats['p50'] * 1000:.0f}ms "
+                f"p95={stats['p95'] * 1000:.0f}ms p99={stats['p99'] * 1000:.0f}ms"
+            )
+        if self.queue_samples:
+            waiting = np.array([sample[1] for sample in self.queue_samples])
+            lines.append(f"Queue depth: mean {waiting.mean():.1f}, max {int(waiting.max())}")
+            server = [sample[3] for sample in self.queue_samples if sample[3] is not None]
+            if server:
+                lines.append(f"Server queue depth: mean {np.mean(server):.1f}, max {max(server)}")
+        return "\n".join(lines)
+
+
+class LoadTester:
+    """
+    Send requests on a schedule with bounded concurrency and measure latency.
+    
+    Requests are released at their send offsets into a queue served by
+    ``concurrency`` workers, so requests that arrive while all workers are
+    busy wait as they would in front of a real service. End-to-end latency
+    counts from the scheduled send time and therefore includes that wait.
+    """
+    
+    def __init__(self, target, concurrency: int = 1, sample_interval: float = 0.5):
+        """
+        Initialize the load tester.
+        
+        Args:
+            target: ``InProcessTarget`` or ``HttpTarget``
+            concurrency: Requests in flight at once
+            sample_interval: Seconds between queue depth samples
+        """
+        self.target = target
+        self.concurrency = concurrency
+        self.sample_interval = sample_interval
+    
+    def run(
+        self,
+        requests: List[ReplayRequest],
+        offsets: List[float],
+        on_result: Optional[Callable[[ReplayRequest, Optional[str], Optional[str]], None]] = None
+    ) -> LoadTestReport:
+        """
+        Replay requests.
+        
+        Args:
+            requests: Requests to send
+            offsets: Send offset of each request in seconds (see ``arrival_offsets``)
+            on_result: Called with each request, its result and its error
+        
+        Returns:
+            LoadTestReport with throughput, latency percentiles per action and
+            queue depth over time
+        """
+        tracker = LatencyTracker(window=max(len(requests), 1))
+        report = LoadTestReport(sent=len(requests))
+        pending: queue.Queue = queue.Queue()
+        lock = threading.Lock()
+        state = {"waiting": 0, "in_flight": 0}
+        start = time.perf_counter()
+        
+        def work():
+            while True:
+                item = pending.get()
+                if item is _DONE:
+                    return
+                request, scheduled = item
+                with lock:
+                    state["waiting"] -= 1
+                    state["in_flight"] += 1
+                result, error = None, None
+                try:
+                    result, first_token_time = self.target.send(request)
+                    finished = time.perf_counter()
+                    tracker.record("e2e", finished - scheduled)
+                    tracker.record(f"e2e/{request.action}", finished - scheduled)
+                    if first_token_time is not None:
+                        tracker.record("ttft", first_token_time - scheduled)
+                        tracker.record(f"ttft/{request.action}", first_token_time - scheduled)
+                except Exception as e:
+                    error = str(e)
+                    logger.warning("Request failed (%s): %s", request.action, e)
+                with lock:
+                    state["in_flight"] -= 1
+                    if error is None:
+                        report.completed += 1
+                    else:
+                        report.failed += 1
+                if on_result is not None:
+                    on_result(request, result, error)
+        
+        workers = [
+            threading.Thread(target=work, name=f"load-test-{i}", daemon=True)
+            for i in range(self.concurrency)
+        ]
+        for worker in workers:
+            worker.start()
+        
+        stop_sampling = threading.Event()
+        
+        def sample():
+            while not stop_sampling.is_set():
+                with lock:
+                    waiting, in_flight = state["waiting"], state["in_flight"]
+                report.queue_samples.append((
+                    round(time.perf_counter() - start, 3),
+                    waiting,
+                    in_flight,
+                    self.target.queue_depth()
+                ))
+                stop_sampling.wait(self.sample_interval)
+        
+        sampler = threading.Thread(target=sample, name="load-test-sampler", daemon=True)
+        sampler.start()
+        
+        for request, offset in zip(requests, offsets):
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            with lock:
+                state["waiting"] += 1
+            pending.put((request, start + offset))
+        for _ in workers:
+            pending.put(_DONE)
+        for worker in workers:
+            worker.join()
+        stop_sampling.set()
+        sampler.join()
+        
+        report.elapsed = time.perf_counter() - start
+        report.latency = tracker.get_stats()
+        return report
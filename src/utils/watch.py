@@ -0,0 +1,235 @@
+"""Incremental analysis of a source tree, reusing results for unchanged units."""
+
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from .code_utils import get_language_from_file, normalized_code_hash, split_code_units
+
+logger = logging.getLogger(__name__)
+
+WATCH_MODES = ("explain", "validate")
+
+# Directories never scanned
+IGNORED_DIRS = {".git", "__pycache__", "node_modules", "build", "dist", ".venv", "venv"}
+
+
+@dataclass
+class UnitAnalysis:
+    """Analysis result for one function or class."""
+    name: str
+    hash: str
+    result: Any
+    reused: bool
+    error: Optional[str] = None  # Why the unit could not be analyzed
+
+
+class UnitResultStore:
+    """Analysis results keyed by normalized unit hash, optionally persisted as JSON."""
+    
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize the store.
+        
+        Args:
+            path: JSON file to load results from and save them to (None keeps
+                them in memory only)
+        """
+        self.path = path
+        self._results: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self._results = json.load(f)
+    
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key in self._results:
+                self.hits += 1
+                return self._results[key]
+            self.misses += 1
+            return None
+    
+    def put(self, key: str, result: Any):
+        with self._lock:
+            self._results[key] = result
+    
+    def save(self):
+        """Write the results to ``path`` (atomically) if one was given."""
+        if not self.path:
+            return
+        with self._lock:
+            data = dict(self._results)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(temp_path, self.path)
+
+
+class IncrementalAnalyzer:
+    """
+    Explain or validate the functions and classes of source files.
+    
+    Each unit is looked up by the hash of its normalized AST (Python) or
+    comment- and whitespace-insensitive text (C++), so only units whose code
+    actually changed reach the model. Validation also hashes the file's
+    surrounding context (imports, includes, globals), since a unit is
+    validated together with it.
+    
+    Python files are validated as a whole instead: units of a file that
+    parses can only fail when compiled, and compiling the whole file once
+    is cheaper than checking each unit with its context.
+    """
+    
+    def __init__(self, agent, mode: str = "validate", store: Optional[UnitResultStore] = None):
+        """
+        Initialize the analyzer.
+        
+        Args:
+            agent: Agent used for analysis
+            mode: "explain" or "validate"
+            store: Result store shared across runs
+        """
+        if mode not in WATCH_MODES:
+            raise ValueError(f"Unknown watch mode: {mode}")
+        self.agent = agent
+        self.mode = mode
+        self.store = store or UnitResultStore()
+    
+    def _analyze_unit(self, code: str, context: str, language: str) -> Any:
+        if self.mode == "explain":
+            return self.agent.explain_code(code, language=language)
+        return self.agent.validate_code(context + code, language)
+    
+    def _validate_python_file(self, path: str, code: str) -> UnitAnalysis:
+        try:
+            # Also finds errors the parser accepts, e.g. ``break`` outside a loop
+            compile(code, path, "exec")
+        except (SyntaxError, ValueError) as e:
+            logger.warning("%s does not compile: %s", path, e)
+            return UnitAnalysis("<file>", "", False, False, error=f"syntax error: {e}")
+        return UnitAnalysis("<file>", normalized_code_hash(code, "python"), True, False)
+    
+    def analyze_file(self, path: str) -> Optional[List[UnitAnalysis]]:
+        """
+        Analyze the units of one file, reusing stored results.
+        
+        Args:
+            path: Path to the source file
+        
+        Returns:
+            Analyses in file order, or None if the file's language is not
+            supported. Validating a Python file, or a file that does not
+            parse, yields a single analysis named "<file>", carrying the
+            syntax error if there is one.
+        """
+        language = get_language_from_file(path)
+        if language not in ("python", "cpp"):
+            return None
+        with open(path, encoding="utf-8", errors="replace") as f:
+            code = f.read()
+        if self.mode == "validate" and language == "python":
+            return [self._validate_python_file(path, code)]
+        try:
+            segments = split_code_units(code, language)
+        except SyntaxError as e:
+            logger.warning("%s does not parse: %s", path, e)
+            # Broken files are what validation should report
+            result = False if self.mode == "validate" else None
+            return [UnitAnalysis("<file>", "", result, False, error=f"syntax error: {e}")]
+        
+        context = "".join(segment.text for segment in segments if not segment.is_unit)
+        context_hash = normalized_code_hash(context, language) if self.mode == "validate" else ""
+        analyses = []
+        for segment in segments:
+            if not segment.is_unit:
+                continue
+            unit_hash = normalized_code_hash(segment.text, language)
+            key = f"{self.mode}:{unit_hash}:{context_hash}"
+            result = self.store.get(key)
+            reused = result is not None
+            if not reused:
+                result = self._analyze_unit(segment.text, context, language)
+                self.store.put(key, result)
+            analyses.append(UnitAnalysis(segment.name, unit_hash, result, reused))
+        return analyses
+
+
+def scan_sources(root: str) -> Dict[str, float]:
+    """
+    Find supported source files under a directory.
+    
+    Args:
+        root: Directory to scan
+    
+    Returns:
+        Dictionary mapping file paths to modification times
+    """
+    sources = {}
+    for directory, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if d not in IGNORED_DIRS and not d.startswith(".")]
+        for name in files:
+            if get_language_from_file(name) in ("python", "cpp"):
+                path = os.path.join(directory, name)
+                try:
+                    sources[path] = os.path.getmtime(path)
+                except OSError:
+                    continue
+    return sources
+
+
+def watch_directory(
+    root: str,
+    analyzer: IncrementalAnalyzer,
+    on_result: Callable[[str, List[UnitAnalysis]], None],
+    interval: float = 1.0,
+    stop_event: Optional[threading.Event] = None
+):
+    """
+    Analyze all source files under ``root``, then re-analyze files as they change.
+    
+    Changes are detected by polling modification times, which works the same
+    on every platform and needs no extra dependency.
+    
+    Args:
+        root: Directory to watch
+        analyzer: Analyzer doing the per-unit work
+        on_result: Called with each analyzed file and its unit analyses
+        interval: Seconds between scans
+        stop_event: Set to stop watching (runs until interrupted otherwise)
+    """
+    stop_event = stop_event or threading.Event()
+    seen: Dict[str, float] = {}
+    while not stop_event.is_set():
+        sources = scan_sources(root)
+        changed = [path for path, mtime in sources.items() if seen.get(path) != mtime]
+        for path in sorted(changed):
+            start = time.perf_counter()
+            try:
+                analyses = analyzer.analyze_file(path)
+            except OSError as e:
+                logger.warning("Could not read %s: %s", path, e)
+                continue
+            except Exception as e:
+                # A failed model call is reported for the file and does not stop watching
+                logger.error("Analysis of %s failed: %s", path, e)
+                analyses = [UnitAnalysis("<file>", "", None, False, error=f"analysis failed: {e}")]
+            if analyses is not None:
+                logger.info(
+                    "Analyzed %s: %d of %d units reused in %.2fs",
+                    path,
+                    sum(analysis.reused for analysis in analyses),
+                    len(analyses),
+                    time.perf_counter() - start
+                )
+                on_result(path, analyses)
+        if changed:
+            analyzer.store.save()
+        seen = sources
+        stop_event.wait(interval)
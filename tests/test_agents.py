@@ -72,7 +72,127 @@ class TestClaudeAgent(unittest.TestCase):
         
         # Assert result
         self.assertEqual(result, "# Generated Python code")
-
+    
+    @patch('src.agents.claude_agent.AutoModelForCausalLM')
+    @patch('src.agents.claude_agent.AutoTokenizer')
+    @patch('os.path.exists', return_value=True)
+    def test_generate_code_best_of(self, mock_exists, mock_tokenizer, mock_model):
+        """Test that best-of-N generation returns a valid candidate."""
+        mock_tokenizer.from_pretrained.return_value = MagicMock()
+        mock_model.from_pretrained.return_value = MagicMock()
+        
+        agent = ClaudeAgent("dummy_path", {"best_of": 3})
+        agent._generate_candidates = MagicMock(return_value=["def (", "x = 1", "y = 2"])
+        agent.format_code = MagicMock(side_effect=lambda code, language: code)
+        
+        result = agent.generate_code("User prompt", "python")
+        
+        agent._generate_candidates.assert_called_once()
+        self.assertEqual(agent._generate_candidates.call_args[0][1], 3)
+        self.assertIn(result, ["x = 1", "y = 2"])
+    
+    @patch('src.agents.claude_agent.AutoModelForCausalLM')
+    @patch('src.agents.claude_agent.AutoTokenizer')
+    @patch('os.path.exists', return_value=True)
+    def test_generate_code_best_of_with_tests(self, mock_exists, mock_tokenizer, mock_model):
+        """Test that best-of-N generation keeps the candidate passing the tests."""
+        mock_tokenizer.from_pretrained.return_value = MagicMock()
+        mock_model.from_pretrained.return_value = MagicMock()
+        
+        agent = ClaudeAgent("dummy_path", {"best_of": 3, "sandbox": {"workers": 1}})
+        agent._generate_candidates = MagicMock(return_value=["x = 1", "x = 2", "x = 3"])
+        agent.format_code = MagicMock(side_effect=lambda code, language: code)
+        
+        result = agent.generate_code("User prompt", "python", tests="assert x == 2")
+        
+        self.assertEqual(result, "x = 2")
+    
+    @patch('src.agents.claude_agent.AutoModelForCausalLM')
+    @patch('src.agents.claude_agent.AutoTokenizer')
+    @patch('os.path.exists', return_value=True)
+    def test_generate_code_single_candidate_with_tests(self, mock_exists, mock_tokenizer, mock_model):
+        """Test that tests are run when only one candidate is generated."""
+        mock_tokenizer.from_pretrained.return_value = MagicMock()
+        mock_model.from_pretrained.return_value = MagicMock()
+        
+        agent = ClaudeAgent("dummy_path", {"best_of": 1})
+        agent._generate = MagicMock(return_value="x = 2\n")
+        agent.format_code = MagicMock(side_effect=lambda code, language: code)
+        agent.run_tests = MagicMock(return_value=MagicMock(passed=True))
+        
+        result = agent.generate_code("User prompt", "python", tests="assert x == 2")
+        
+        self.assertEqual(result, "x = 2")
+        agent.run_tests.assert_called_once_with("x = 2", "assert x == 2")
+    
+    @patch('src.agents.claude_agent.AutoModelForCausalLM')
+    @patch('src.agents.claude_agent.AutoTokenizer')
+    @patch('os.path.exists', return_value=True)
+    def test_refactor_code_chunked(self, mock_exists, mock_tokenizer, mock_model):
+        """Test that chunked refactoring reassembles refactored units."""
+        mock_tokenizer.from_pretrained.return_value = MagicMock()
+        mock_model.from_pretrained.return_value = MagicMock()
+        
+        agent = ClaudeAgent("dummy_path", {"chunk_batch_size": 2})
+        agent._generate_batch = MagicMock(return_value=[
+            "```python\ndef f() -> int:\n    return 1\n```",
+            "not code",
+        ])
+        agent.format_code = MagicMock(side_effect=lambda code, language: code)
+        
+        code = "import os\n\ndef f():\n    return 1\n\ndef g():\n    return 2\n"
+        result = agent.refactor_code(code, "Add type hints", language="python", mode="chunked")
+        
+        self.assertEqual(
+            result,
+            "import os\n\ndef f() -> int:\n    return 1\n\ndef g():\n    return 2\n"
+        )
+    
+    
+    @patch('src.agents.claude_agent.AutoModelForCausalLM')
+    @patch('src.agents.claude_agent.AutoTokenizer')
+    @patch('os.path.exists', return_value=True)
+    def test_refactor_code_blocks_use_fence_language(self, mock_exists, mock_tokenizer, mock_model):
+        """Test that each block is formatted and validated in its fence's language."""
+        mock_tokenizer.from_pretrained.return_value = MagicMock()
+        mock_model.from_pretrained.return_value = MagicMock()
+        
+        agent = ClaudeAgent("dummy_path", {})
+        agent._generate = MagicMock(return_value=(
+            "```cpp\nint f();\n```\n```\nx = 1\n```\n```python\ny = 2\n```\n"
+        ))
+        agent.format_code = MagicMock(side_effect=lambda code, language: code)
+        agent.validate_code = MagicMock(return_value=True)
+        
+        result = agent.refactor_code("x = 0", "Tidy", language="python")
+        
+        self.assertEqual(result, "y = 2")
+        agent.validate_code.assert_any_call("int f();", "cpp")
+        agent.validate_code.assert_any_call("x = 1", "python")
+        agent.validate_code.assert_any_call("y = 2", "python")
+    
+    @patch('src.agents.claude_agent.AutoModelForCausalLM')
+    @patch('src.agents.claude_agent.AutoTokenizer')
+    @patch('os.path.exists', return_value=True)
+    def test_refactor_code_chunked_skips_other_languages(self, mock_exists, mock_tokenizer, mock_model):
+        """Test that a unit is not replaced by a block in another language."""
+        mock_tokenizer.from_pretrained.return_value = MagicMock()
+        mock_model.from_pretrained.return_value = MagicMock()
+        
+        agent = ClaudeAgent("dummy_path", {"chunk_batch_size": 2})
+        agent._generate_batch = MagicMock(return_value=[
+            "```bash\npython f.py\n```\n```python\ndef f() -> int:\n    return 1\n```",
+            "```bash\npython g.py\n```",
+        ])
+        agent.format_code = MagicMock(side_effect=lambda code, language: code)
+        
+        code = "import os\n\ndef f():\n    return 1\n\ndef g():\n    return 2\n"
+        result = agent.refactor_code(code, "Add type hints", language="python", mode="chunked")
+        
+        self.assertEqual(
+            result,
+            "import os\n\ndef f() -> int:\n    return 1\n\ndef g():\n    return 2\n"
+        )
 
 class TestQwenAgent(unittest.TestCase):
     """Tests for the QwenAgent class."""
@@ -0,0 +1,74 @@
+"""
+Tests for deadlines and cooperative cancellation.
+"""
+
+import os
+import sys
+import time
+import unittest
+
+import torch
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.cancellation import (
+    CancellationCriteria,
+    CancellationToken,
+    SharedCancellationToken,
+    token_from_kwargs,
+)
+
+
+class TestCancellationToken(unittest.TestCase):
+    """Tests for cancellation tokens."""
+    
+    def test_cancel_and_deadline(self):
+        """Test stop reasons for cancelled and expired tokens."""
+        token = CancellationToken()
+        self.assertIsNone(token.stop_reason)
+        token.cancel()
+        self.assertEqual(token.stop_reason, "cancelled")
+        
+        expired = CancellationToken(deadline=time.monotonic() - 1)
+        self.assertEqual(expired.stop_reason, "timed out")
+    
+    def test_token_from_kwargs(self):
+        """Test that deadlines are merged into the caller's token."""
+        self.assertIsNone(token_from_kwargs({}))
+        deadline = time.monotonic() + 5
+        self.assertEqual(token_from_kwargs({"deadline": deadline}).deadline, deadline)
+        
+        token = CancellationToken(deadline=deadline + 10)
+        self.assertIs(token_from_kwargs({"cancel_token": token, "deadline": deadline}), token)
+        self.assertEqual(token.deadline, deadline)
+    
+    def test_shared_token(self):
+        """Test that shared work stops only when every caller has stopped."""
+        shared = SharedCancellationToken()
+        first, second = CancellationToken(), CancellationToken()
+        shared.add(first)
+        shared.add(second)
+        
+        first.cancel()
+        self.assertIsNone(shared.stop_reason)
+        second.cancel()
+        self.assertEqual(shared.stop_reason, "cancelled")
+        
+        shared.add(None)
+        self.assertIsNone(shared.stop_reason)
+    
+    def test_stopping_criteria(self):
+        """Test that the criteria stops every sequence once cancelled."""
+        token = CancellationToken()
+        criteria = CancellationCriteria(token)
+        input_ids = torch.zeros(3, 4, dtype=torch.long)
+        
+        self.assertFalse(criteria(input_ids, None).any())
+        token.cancel()
+        self.assertTrue(criteria(input_ids, None).all())
+        self.assertTrue(criteria.triggered)
+
+
+if __name__ == '__main__':
+    unittest.main()
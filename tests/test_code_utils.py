@@ -0,0 +1,167 @@
+"""
+Tests for code utilities.
+"""
+
+import os
+import sys
+import unittest
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.code_utils import (
+    CodeFenceParser,
+    EditApplyError,
+    apply_edit_hunks,
+    extract_code_blocks,
+    normalized_code_hash,
+    parse_edit_hunks,
+    split_code_units,
+)
+
+
+class TestExtractCodeBlocks(unittest.TestCase):
+    """Tests for extract_code_blocks."""
+    
+    def test_language_tags(self):
+        """Test tags with symbols, aliases and untagged fences."""
+        text = "Here:\n```c++\nint x;\n```\n```Python\nx = 1\n```\n```\nplain\n```\n"
+        self.assertEqual(
+            extract_code_blocks(text),
+            {"cpp": ["int x;"], "python": ["x = 1"], "": ["plain"]}
+        )
+    
+    def test_multiple_blocks_same_language(self):
+        """Test that blocks of the same language are kept in order."""
+        text = "```python\na = 1\n```\ntext\n```python\nb = 2\n```"
+        self.assertEqual(extract_code_blocks(text), {"python": ["a = 1", "b = 2"]})
+
+
+class TestCodeFenceParser(unittest.TestCase):
+    """Tests for the CodeFenceParser class."""
+    
+    def test_blocks_emitted_when_closed(self):
+        """Test that a block is returned as soon as its fence closes."""
+        parser = CodeFenceParser()
+        text = "Intro\n```python\ndef f():\n    return 1\n```\nMore text\n```cpp\nint y;\n```\n"
+        emitted = []
+        for i, char in enumerate(text):
+            for block in parser.feed(char):
+                emitted.append((i, block))
+        
+        first_close = text.index("```\n", text.index("return")) + 3
+        self.assertEqual(emitted[0], (first_close, ("python", "def f():\n    return 1")))
+        self.assertEqual(emitted[1][1], ("cpp", "int y;"))
+        self.assertEqual(parser.close(), [])
+    
+    def test_fence_inside_code_does_not_close(self):
+        """Test that only a fence on its own line, at least as long as the opening one, closes a block."""
+        text = (
+            "```python\n"
+            "x = 1  # markdown uses ```\n"
+            "doc = \"\"\"\n"
+            "  ```\n"
+            "\"\"\"\n"
+            "````\n"
+            "After\n"
+        )
+        code = "x = 1  # markdown uses ```\ndoc = \"\"\"\n  ```\n\"\"\""
+        # The ``` line inside the docstring closes the shorter fence
+        self.assertEqual(extract_code_blocks(text)["python"][0], "x = 1  # markdown uses ```\ndoc = \"\"\"")
+        # A longer opening fence is only closed by a fence at least as long
+        self.assertEqual(extract_code_blocks("`" + text)["python"], [code])
+    
+    def test_unterminated_block(self):
+        """Test that close() returns a block cut off by the end of the text."""
+        parser = CodeFenceParser()
+        self.assertEqual(parser.feed("```python\nx = 1\ny = "), [])
+        self.assertTrue(parser.in_block)
+        self.assertEqual(parser.close(), [("python", "x = 1\ny =")])
+
+
+class TestEditHunks(unittest.TestCase):
+    """Tests for parsing and applying edit hunks."""
+    
+    CODE = "def a():\n    return 1\n\n\ndef b():\n    return 2\n"
+    
+    def test_parse_and_apply(self):
+        """Test that hunks replace only the matched lines."""
+        text = (
+            "Here are the edits:\n"
+            "<<<<<<< SEARCH\n"
+            "def b():\n"
+            "    return 2\n"
+            "=======\n"
+            "def b() -> int:\n"
+            "    return 2\n"
+            ">>>>>>> REPLACE\n"
+        )
+        hunks = parse_edit_hunks(text)
+        self.assertEqual(hunks, [("def b():\n    return 2", "def b() -> int:\n    return 2")])
+        self.assertEqual(
+            apply_edit_hunks(self.CODE, hunks),
+            "def a():\n    return 1\n\n\ndef b() -> int:\n    return 2\n"
+        )
+    
+    def test_missing_and_ambiguous_search(self):
+        """Test that unmatched or ambiguous hunks are rejected."""
+        with self.assertRaises(EditApplyError):
+            apply_edit_hunks(self.CODE, [("def c():", "")])
+        with self.assertRaises(EditApplyError):
+            apply_edit_hunks(self.CODE, [("    return 1\n", ""), ("", "x")])
+        code = "x = 1\nx = 1\n"
+        with self.assertRaises(EditApplyError):
+            apply_edit_hunks(code, [("x = 1", "x = 2")])
+    
+    def test_unterminated_hunk(self):
+        """Test that a truncated hunk is reported."""
+        with self.assertRaises(EditApplyError):
+            parse_edit_hunks("<<<<<<< SEARCH\nx = 1\n=======\nx = 2\n")
+
+
+class TestSplitCodeUnits(unittest.TestCase):
+    """Tests for split_code_units."""
+    
+    def test_python_units(self):
+        """Test splitting Python at top-level functions and classes."""
+        code = "import os\n\n@cache\ndef f():\n    return 1\n\nclass C:\n    x = 1\n"
+        segments = split_code_units(code, "python")
+        self.assertEqual("".join(s.text for s in segments), code)
+        self.assertEqual([s.name for s in segments if s.is_unit], ["f", "C"])
+        self.assertTrue(segments[1].text.startswith("@cache"))
+    
+    def test_cpp_units(self):
+        """Test that braces in strings and comments do not split C++ units."""
+        code = (
+            "#include <string>\n"
+            "// not a block {\n"
+            "struct P { int x; };\n"
+            "int f() {\n  const char* s = \"}\";\n  return 0;\n}\n"
+        )
+        segments = split_code_units(code, "c++")
+        self.assertEqual("".join(s.text for s in segments), code)
+        self.assertEqual([s.name for s in segments if s.is_unit], ["struct P", "int f()"])
+
+
+
+class TestNormalizedCodeHash(unittest.TestCase):
+    """Tests for normalized_code_hash."""
+    
+    def test_python_ignores_formatting_and_comments(self):
+        a = normalized_code_hash("def f(x):\n    return x  # id\n", "python")
+        b = normalized_code_hash("def f( x ):\n\n    return x\n", "python")
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, normalized_code_hash("def f(x):\n    return -x\n", "python"))
+    
+    def test_cpp_ignores_comments_but_not_strings(self):
+        a = normalized_code_hash("int f() { // one\n  return 1;\n}", "cpp")
+        b = normalized_code_hash("int f() {\n    /* one */ return 1;\n}", "cpp")
+        self.assertEqual(a, b)
+        self.assertNotEqual(
+            normalized_code_hash('auto s = "a  b";', "cpp"),
+            normalized_code_hash('auto s = "a b";', "cpp")
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
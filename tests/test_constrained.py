@@ -0,0 +1,111 @@
+"""
+Tests for grammar-constrained decoding.
+"""
+
+import os
+import sys
+import unittest
+
+import torch
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.constrained import (
+    TEXT,
+    LexState,
+    PythonGrammarProcessor,
+    advance,
+    get_token_vocabulary,
+    is_complete,
+)
+
+
+class FakeTokenizer:
+    """Tokenizer with a fixed list of token texts (id 0 is end of sequence)."""
+    
+    name_or_path = "fake"
+    
+    def __init__(self, texts):
+        self.texts = texts
+        self.eos_token_id = 0
+        self.all_special_ids = [0]
+    
+    def __len__(self):
+        return len(self.texts)
+    
+    def batch_decode(self, sequences):
+        return ["".join(self.texts[i] for i in ids) for ids in sequences]
+
+
+def lex(text, state=None):
+    return advance(state or LexState(), text)
+
+
+class TestLexer(unittest.TestCase):
+    """Tests for the lexical state machine."""
+    
+    def test_brackets(self):
+        self.assertEqual(lex("f(a[1], {[").stack, "({[")
+        self.assertIsNone(lex("f(a]"))
+        self.assertIsNone(lex(")"))
+        self.assertTrue(is_complete(lex("f(a[1], {2: 3})\n")))
+    
+    def test_strings(self):
+        self.assertEqual(lex("x = 'a(").quote, "'")
+        self.assertTrue(is_complete(lex("x = 'a(' + \"]\"")))
+        self.assertIsNone(lex("x = 'a\nb'"))
+        self.assertTrue(is_complete(lex("x = 'it\\'s'")))
+        self.assertEqual(lex('"""doc\n(').quote, '"""')
+        self.assertTrue(is_complete(lex('"""doc\n("""')))
+        self.assertTrue(is_complete(lex('x = ""')))
+    
+    def test_comments(self):
+        self.assertTrue(is_complete(lex("x = 1  # closes ) nothing\n")))
+        self.assertIsNone(lex("# comment\n)"))
+    
+    def test_code_fences(self):
+        state = lex("```python\ndef f():\n    return 1\n```\nSome text with ' and (\n")
+        self.assertEqual(state.mode, TEXT)
+        self.assertTrue(is_complete(state))
+        self.assertEqual(lex("Here:\n```py\nx = (", LexState(mode=TEXT)).stack, "(")
+        self.assertIsNone(lex("x = `y`"))
+        self.assertIsNone(lex("f(\n```"))
+
+
+class TestPythonGrammarProcessor(unittest.TestCase):
+    """Tests for the PythonGrammarProcessor class."""
+    
+    def setUp(self):
+        self.tokenizer = FakeTokenizer(["</s>", "x", "(", ")", "]", "'", "\n", " = 1"])
+    
+    def allowed(self, processor, input_ids):
+        scores = processor(torch.tensor(input_ids), torch.zeros(len(input_ids), 8))
+        return [[i for i, s in enumerate(row) if s != float("-inf")] for row in scores]
+    
+    def test_masks_per_row(self):
+        """Test that each batch row is constrained by its own text."""
+        processor = PythonGrammarProcessor(self.tokenizer)
+        # Prompt only: closers and nothing else are masked
+        self.assertEqual(self.allowed(processor, [[1], [1]]), [[0, 1, 2, 5, 6, 7]] * 2)
+        
+        # Row 0 opened a bracket, row 1 opened a string
+        rows = self.allowed(processor, [[1, 2], [1, 5]])
+        self.assertEqual(rows[0], [1, 2, 3, 5, 6, 7])
+        self.assertEqual(rows[1], [1, 2, 3, 4, 5, 7])
+    
+    def test_vocabulary_is_cached(self):
+        """Test that the vocabulary analysis is shared between processors."""
+        first = get_token_vocabulary(self.tokenizer)
+        self.assertIs(get_token_vocabulary(FakeTokenizer(list(self.tokenizer.texts))), first)
+        self.assertEqual(first.structural_ids, [2, 3, 4, 5, 6])
+    
+    def test_padded_vocabulary(self):
+        """Test that scores wider than the tokenizer mask the padding."""
+        processor = PythonGrammarProcessor(self.tokenizer)
+        scores = processor(torch.tensor([[1]]), torch.zeros(1, 10))
+        self.assertEqual(scores[0, 8:].tolist(), [float("-inf")] * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
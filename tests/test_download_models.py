@@ -0,0 +1,125 @@
+"""
+Tests for the model download script, run against a local mirror.
+"""
+
+import hashlib
+import importlib.util
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import torch
+from safetensors.torch import load_file
+
+SCRIPT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts', 'download_models.py'))
+_spec = importlib.util.spec_from_file_location("download_models", SCRIPT_PATH)
+download_models = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(download_models)
+
+
+class TestDownloadModels(unittest.TestCase):
+    """Tests for fetching, verifying and converting model files."""
+    
+    def setUp(self):
+        """Create a fake model repository to mirror from."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.mirror = os.path.join(self.tmpdir.name, "mirror")
+        self.output = os.path.join(self.tmpdir.name, "model")
+        os.makedirs(os.path.join(self.mirror, "sub"))
+        self.files = {
+            "config.json": b'{"model_type": "llama"}',
+            os.path.join("sub", "tokenizer.json"): b'{"vocab": {}}',
+            "weights.h5": b"ignored",
+        }
+        for name, data in self.files.items():
+            with open(os.path.join(self.mirror, name), "wb") as f:
+                f.write(data)
+    
+    def tearDown(self):
+        self.tmpdir.cleanup()
+    
+    def download(self, convert=False):
+        download_models.download_model("fake/model", self.output, "claude", mirror_dir=self.mirror, workers=2, convert=convert)
+        with open(os.path.join(self.output, download_models.MANIFEST_NAME)) as f:
+            return json.load(f)
+    
+    def test_verify_file(self):
+        """Test size, SHA-256 and git blob checks."""
+        path = os.path.join(self.mirror, "config.json")
+        data = self.files["config.json"]
+        sha256 = hashlib.sha256(data).hexdigest()
+        blob_id = hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+        
+        self.assertEqual(download_models.verify_file(path, {"size": len(data), "sha256": sha256}), sha256)
+        self.assertEqual(download_models.verify_file(path, {"size": len(data), "blob_id": blob_id}), sha256)
+        self.assertIsNone(download_models.verify_file(path, {"size": len(data) + 1}))
+        self.assertIsNone(download_models.verify_file(path, {"size": len(data), "sha256": "0" * 64}))
+        self.assertIsNone(download_models.verify_file(path + ".missing", {"size": len(data)}))
+    
+    def test_mirror_download(self):
+        """Test that mirrored files are copied, ignored patterns skipped and checksums recorded."""
+        manifest = self.download()
+        
+        self.assertEqual(sorted(manifest), ["config.json", os.path.join("sub", "tokenizer.json")])
+        with open(os.path.join(self.output, "sub", "tokenizer.json"), "rb") as f:
+            self.assertEqual(f.read(), self.files[os.path.join("sub", "tokenizer.json")])
+        self.assertFalse(os.path.exists(os.path.join(self.output, "weights.h5")))
+        self.assertEqual(manifest["config.json"]["sha256"], hashlib.sha256(self.files["config.json"]).hexdigest())
+    
+    def test_mirror_manifest_checksums_are_enforced(self):
+        """Test that a mirror's own manifest is used to verify its files."""
+        with open(os.path.join(self.mirror, download_models.MANIFEST_NAME), "w") as f:
+            json.dump({"config.json": {"size": len(self.files["config.json"]), "sha256": "0" * 64}}, f)
+        with self.assertRaises(ValueError):
+            self.download()
+    
+    def test_rerun_skips_unchanged_files_without_hashing(self):
+        """Test that a rerun trusts the manifest and only refetches changed files."""
+        self.download()
+        with open(os.path.join(self.output, "config.json"), "wb") as f:
+            f.write(b'{"model_type": "gpt2"}')
+        
+        with patch.object(download_models.shutil, "copyfile", wraps=download_models.shutil.copyfile) as copyfile, \
+                patch.object(download_models, "file_sha256", wraps=download_models.file_sha256) as file_sha256:
+            manifest = self.download()
+        
+        copied = [os.path.relpath(call.args[0], self.mirror) for call in copyfile.call_args_list]
+        self.assertEqual(copied, ["config.json"])
+        # Only the modified file (before and after refetching) is hashed
+        hashed = {os.path.relpath(call.args[0], self.output) for call in file_sha256.call_args_list}
+        self.assertEqual(hashed, {"config.json"})
+        with open(os.path.join(self.output, "config.json"), "rb") as f:
+            self.assertEqual(f.read(), self.files["config.json"])
+        self.assertEqual(manifest["config.json"]["sha256"], hashlib.sha256(self.files["config.json"]).hexdigest())
+    
+    def test_convert_to_safetensors(self):
+        """Test that sharded .bin weights are converted and not fetched again."""
+        weights = {
+            "pytorch_model-00001-of-00002.bin": {"a": torch.arange(4.0)},
+            "pytorch_model-00002-of-00002.bin": {"b": torch.ones(2, 2)},
+        }
+        for name, state_dict in weights.items():
+            torch.save(state_dict, os.path.join(self.mirror, name))
+        with open(os.path.join(self.mirror, "pytorch_model.bin.index.json"), "w") as f:
+            json.dump({"weight_map": {"a": "pytorch_model-00001-of-00002.bin", "b": "pytorch_model-00002-of-00002.bin"}}, f)
+        
+        manifest = self.download(convert=True)
+        
+        self.assertTrue(torch.equal(load_file(os.path.join(self.output, "model-00001-of-00002.safetensors"))["a"], torch.arange(4.0)))
+        self.assertFalse(os.path.exists(os.path.join(self.output, "pytorch_model-00001-of-00002.bin")))
+        with open(os.path.join(self.output, "model.safetensors.index.json")) as f:
+            self.assertEqual(json.load(f)["weight_map"]["b"], "model-00002-of-00002.safetensors")
+        self.assertEqual(
+            manifest["pytorch_model-00002-of-00002.bin"]["converted_to"],
+            "model-00002-of-00002.safetensors"
+        )
+        
+        with patch.object(download_models.shutil, "copyfile", wraps=download_models.shutil.copyfile) as copyfile:
+            self.download(convert=True)
+        copyfile.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+"""
+Tests for hedged requests across agents.
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.agents.hedged_agent import HedgedAgent
+from src.utils.cancellation import CancellationToken, GenerationCancelled
+from src.utils.latency import LatencyTracker
+
+
+def make_agent(name, delay, result, valid=True):
+    """Create a mock agent that honours its cancellation token."""
+    agent = MagicMock()
+    agent.config = {"model_name": name}
+    agent.cancelled = False
+    
+    def generate_code(prompt, language, cancel_token=None, **kwargs):
+        end = time.monotonic() + delay
+        while time.monotonic() < end:
+            if cancel_token is not None and cancel_token.cancelled:
+                agent.cancelled = True
+                return ""
+            time.sleep(0.005)
+        return result
+    
+    agent.generate_code.side_effect = generate_code
+    agent.validate_code.return_value = valid
+    return agent
+
+
+def make_partial_agent(name, partial):
+    """Create a mock agent that runs until stopped and then behaves like BaseAgent."""
+    agent = MagicMock()
+    agent.config = {"model_name": name}
+    
+    def generate_code(prompt, language, cancel_token=None, return_partial=False, **kwargs):
+        while cancel_token.stop_reason is None:
+            time.sleep(0.005)
+        if not return_partial:
+            raise GenerationCancelled(cancel_token.stop_reason, partial)
+        return partial
+    
+    agent.generate_code.side_effect = generate_code
+    return agent
+
+
+class TestHedgedAgent(unittest.TestCase):
+    """Tests for the HedgedAgent class."""
+    
+    def test_fastest_valid_result_wins(self):
+        """Test that the faster agent's result is returned and the loser cancelled."""
+        slow = make_agent("slow", 1.0, "slow")
+        fast = make_agent("fast", 0.05, "fast")
+        hedged = HedgedAgent([slow, fast], hedge_delay=0.0)
+        
+        start = time.perf_counter()
+        result = hedged.generate_code("prompt", "python")
+        
+        self.assertEqual(result, "fast")
+        self.assertLess(time.perf_counter() - start, 0.5)
+        time.sleep(0.05)
+        self.assertTrue(slow.cancelled)
+        self.assertEqual(hedged.get_stats()["wins"], {"fast": 1})
+    
+    def test_backup_not_started_before_delay(self):
+        """Test that a fast primary answers without starting the backup."""
+        primary = make_agent("primary", 0.01, "primary")
+        backup = make_agent("backup", 0.01, "backup")
+        hedged = HedgedAgent([primary, backup], hedge_delay=0.5)
+        
+        self.assertEqual(hedged.generate_code("prompt", "python"), "primary")
+        backup.generate_code.assert_not_called()
+    
+    def test_invalid_result_waits_for_backup(self):
+        """Test that an invalid result does not win over a valid one."""
+        invalid = make_agent("invalid", 0.01, "bad", valid=False)
+        valid = make_agent("valid", 0.1, "good")
+        hedged = HedgedAgent([invalid, valid], hedge_delay=0.0)
+        
+        self.assertEqual(hedged.generate_code("prompt", "python"), "good")
+    
+    def test_all_invalid_returns_first_result(self):
+        """Test the fallback when no agent produces valid code."""
+        first = make_agent("first", 0.01, "first", valid=False)
+        second = make_agent("second", 0.1, "second", valid=False)
+        hedged = HedgedAgent([first, second], hedge_delay=0.0)
+        
+        self.assertEqual(hedged.generate_code("prompt", "python"), "first")
+    
+    def test_refactor_validates_with_language(self):
+        """Test that refactored code is validated in the requested language."""
+        agent = make_agent("a", 0.01, "a")
+        agent.refactor_code.return_value = "refactored"
+        hedged = HedgedAgent([agent])
+        
+        self.assertEqual(hedged.refactor_code("code", "tidy", language="cpp"), "refactored")
+        agent.validate_code.assert_called_with("refactored", "cpp")
+    
+    def test_cancelled_call_returns_partial_output(self):
+        """Test that return_partial yields the preferred agent's partial output."""
+        hedged = HedgedAgent([make_partial_agent("a", "first"), make_partial_agent("b", "second")])
+        token = CancellationToken()
+        threading.Timer(0.1, token.cancel).start()
+        
+        result = hedged.generate_code("prompt", "python", cancel_token=token, return_partial=True)
+        self.assertEqual(result, "first")
+    
+    def test_timed_out_call_raises_with_partial_output(self):
+        """Test that a deadline stops the agents and the error carries their output."""
+        hedged = HedgedAgent([make_partial_agent("a", ""), make_partial_agent("b", "second")])
+        
+        with self.assertRaises(GenerationCancelled) as context:
+            hedged.generate_code("prompt", "python", deadline=time.monotonic() + 0.1)
+        self.assertEqual(context.exception.reason, "timed out")
+        self.assertEqual(context.exception.partial_output, "second")
+    
+    def test_close(self):
+        """Test that closing shuts down the workers and closes every agent."""
+        agents = [make_agent("a", 0.01, "a"), make_agent("b", 0.01, "b")]
+        hedged = HedgedAgent(agents)
+        hedged.close()
+        
+        for agent in agents:
+            agent.close.assert_called_once()
+        with self.assertRaises(RuntimeError):
+            hedged.generate_code("prompt", "python")
+    
+    def test_latency_tracking(self):
+        """Test that percentiles are reported per agent and overall."""
+        hedged = HedgedAgent([make_agent("a", 0.01, "a")])
+        for _ in range(3):
+            hedged.generate_code("prompt", "python")
+        
+        latency = hedged.get_stats()["latency"]
+        self.assertEqual(latency["hedged"]["count"], 3)
+        self.assertEqual(latency["a"]["count"], 3)
+        self.assertLessEqual(latency["hedged"]["p50"], latency["hedged"]["p99"])
+
+
+class TestLatencyTracker(unittest.TestCase):
+    """Tests for the LatencyTracker class."""
+    
+    def test_percentiles(self):
+        """Test percentile computation over recorded samples."""
+        tracker = LatencyTracker()
+        for value in range(1, 101):
+            tracker.record("x", value / 100)
+        
+        stats = tracker.get_stats()["x"]
+        self.assertEqual(stats["count"], 100)
+        self.assertAlmostEqual(stats["p50"], 0.505)
+        self.assertAlmostEqual(stats["p99"], 0.9901)
+    
+    def test_window(self):
+        """Test that only the most recent samples are kept."""
+        tracker = LatencyTracker(window=2)
+        for value in (10.0, 1.0, 1.0):
+            tracker.record("x", value)
+        self.assertEqual(tracker.get_stats()["x"]["mean"], 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
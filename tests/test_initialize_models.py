@@ -0,0 +1,36 @@
+"""
+Tests for the model initialization script.
+"""
+
+import importlib.util
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+import torch
+
+SCRIPT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts', 'initialize_models.py'))
+_spec = importlib.util.spec_from_file_location("initialize_models", SCRIPT_PATH)
+initialize_models = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(initialize_models)
+
+
+class TestAutotune(unittest.TestCase):
+    """Tests for CPU autotuning."""
+    
+    def test_every_dtype_failing(self):
+        """Test that autotuning stops with a clear error when no dtype loads."""
+        tokenizer = MagicMock()
+        tokenizer.return_value.input_ids = torch.tensor([[1, 2, 3]])
+        with patch.object(initialize_models, "AutoTokenizer") as auto_tokenizer, \
+                patch.object(initialize_models, "AutoModelForCausalLM") as auto_model, \
+                patch.object(initialize_models, "save_performance_profile") as save:
+            auto_tokenizer.from_pretrained.return_value = tokenizer
+            auto_model.from_pretrained.side_effect = OSError("out of memory")
+            with self.assertRaisesRegex(RuntimeError, "No dtype"):
+                initialize_models.autotune_model("model", "claude")
+        save.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
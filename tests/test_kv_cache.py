@@ -0,0 +1,123 @@
+"""
+Tests for the int8 KV cache.
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+
+import torch
+from transformers import DynamicCache, LlamaConfig, LlamaForCausalLM
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.kv_cache import (
+    Int8KVCache,
+    dequantize_int8,
+    kv_cache_bytes,
+    measure_kv_quantization,
+    quantize_int8,
+)
+
+
+class TestKVCache(unittest.TestCase):
+    """Tests for int8 quantization of keys and values."""
+    
+    @classmethod
+    def setUpClass(cls):
+        """Create a small random model."""
+        cls.config = LlamaConfig(
+            vocab_size=64,
+            hidden_size=64,
+            intermediate_size=128,
+            num_hidden_layers=2,
+            num_attention_heads=4,
+            num_key_value_heads=2,
+            max_position_embeddings=256
+        )
+        torch.manual_seed(0)
+        cls.model = LlamaForCausalLM(cls.config).eval()
+    
+    def test_round_trip_error(self):
+        """Test that dequantized values are within half a step of the original."""
+        torch.manual_seed(0)
+        tensor = torch.randn(1, 2, 10, 16) * torch.linspace(0.01, 100, 10).view(1, 1, 10, 1)
+        quantized = quantize_int8(tensor)
+        
+        self.assertEqual(quantized.data.dtype, torch.int8)
+        self.assertEqual(quantized.scale.shape, (1, 2, 10, 1))
+        restored = dequantize_int8(quantized)
+        self.assertEqual(restored.dtype, tensor.dtype)
+        self.assertTrue(torch.all((restored - tensor).abs() <= quantized.scale / 2 + 1e-6))
+        # Quantizing again loses nothing more
+        self.assertTrue(torch.equal(quantize_int8(restored).data, quantized.data))
+    
+    def test_zero_tensor(self):
+        """Test that all-zero rows do not divide by zero."""
+        restored = dequantize_int8(quantize_int8(torch.zeros(1, 1, 3, 8)))
+        self.assertTrue(torch.equal(restored, torch.zeros(1, 1, 3, 8)))
+    
+    def test_rejects_sliding_window_models(self):
+        """Test that models with non-full attention layers are rejected."""
+        config = LlamaConfig(num_hidden_layers=2)
+        config.layer_types = ["full_attention", "sliding_attention"]
+        with self.assertRaises(ValueError):
+            Int8KVCache(config)
+    
+    def test_memory_smaller(self):
+        """Test that the int8 cache holds about a quarter of the float32 bytes."""
+        torch.manual_seed(1)
+        input_ids = torch.randint(0, 64, (1, 200))
+        with torch.no_grad():
+            full = self.model(input_ids, past_key_values=DynamicCache(), use_cache=True).past_key_values
+            int8 = self.model(input_ids, past_key_values=Int8KVCache(self.config, residual_length=8), use_cache=True).past_key_values
+        
+        self.assertEqual(int8.get_seq_length(), 200)
+        # Int8 values plus one float32 scale per 16 values
+        self.assertLess(kv_cache_bytes(int8), 0.35 * kv_cache_bytes(full))
+    
+    def test_generation_matches(self):
+        """Test that greedy generation with the int8 cache matches full precision."""
+        torch.manual_seed(1)
+        input_ids = torch.randint(0, 64, (1, 40))
+        expected = self.model.generate(input_ids, max_new_tokens=12, do_sample=False)
+        output = self.model.generate(
+            input_ids,
+            max_new_tokens=12,
+            do_sample=False,
+            past_key_values=Int8KVCache(self.config, residual_length=4)
+        )
+        self.assertTrue(torch.equal(output, expected))
+    
+    def test_measure(self):
+        """Test the memory and quality report."""
+        torch.manual_seed(1)
+        input_ids = torch.randint(0, 64, (1, 64))
+        result = measure_kv_quantization(self.model, input_ids, residual_length=4)
+        
+        self.assertEqual(result["tokens"], 64)
+        self.assertLess(result["memory_ratio"], 0.5)
+        self.assertAlmostEqual(result["int8_perplexity"], result["full_perplexity"], delta=0.01 * result["full_perplexity"])
+        self.assertGreater(result["top1_agreement"], 0.9)
+    
+    def test_agents_import_without_kv_cache(self):
+        """Test that the agents do not load the cache module unless int8 caching is used."""
+        result = subprocess.run(
+            [
+                sys.executable, "-c",
+                "import sys; import src.agents.claude_agent, src.agents.qwen_agent; "
+                "print('src.utils.kv_cache' in sys.modules)"
+            ],
+            cwd=os.path.abspath(os.path.join(os.path.dirname(__file__), '..')),
+            capture_output=True,
+            text=True,
+            timeout=300
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "False")
+
+
+if __name__ == '__main__':
+    unittest.main()
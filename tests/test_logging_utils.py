@@ -0,0 +1,78 @@
+"""
+Tests for non-blocking structured logging.
+"""
+
+import json
+import logging
+import os
+import sys
+import unittest
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.logging_utils import BoundedQueueHandler, JsonFormatter, request_context
+
+
+class TestBoundedQueueHandler(unittest.TestCase):
+    """Tests for the BoundedQueueHandler class."""
+    
+    def setUp(self):
+        self.handler = BoundedQueueHandler(max_size=2)
+        self.logger = logging.getLogger("test_logging_utils")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self.logger.addHandler(self.handler)
+    
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+    
+    def test_overflow_is_counted(self):
+        """Test that records are dropped instead of blocking when full."""
+        for i in range(5):
+            self.logger.info("message %d", i)
+        self.assertEqual(self.handler.dropped, 3)
+        
+        # Once there is room again the drop count is reported
+        self.handler.queue.get_nowait()
+        self.handler.queue.get_nowait()
+        self.logger.info("after overflow")
+        self.handler.queue.get_nowait()
+        warning = self.handler.queue.get_nowait()
+        self.assertIn("dropped 3 records", warning.getMessage())
+    
+    def test_record_is_formatted_with_request_id(self):
+        """Test that queued records carry the merged message and request id."""
+        args = ["original"]
+        with request_context("req-1"):
+            self.logger.info("value %s", args)
+        args.append("mutated")
+        
+        record = self.handler.queue.get_nowait()
+        self.assertEqual(record.getMessage(), "value ['original']")
+        self.assertEqual(record.request_id, "req-1")
+
+
+class TestJsonFormatter(unittest.TestCase):
+    """Tests for the JsonFormatter class."""
+    
+    def test_extra_fields(self):
+        """Test that extra fields are included in the JSON output."""
+        record = logging.makeLogRecord({
+            "name": "agent",
+            "levelno": logging.INFO,
+            "levelname": "INFO",
+            "msg": "done in %d ms",
+            "args": (5,),
+            "duration_ms": 5,
+            "request_id": "abc",
+        })
+        entry = json.loads(JsonFormatter().format(record))
+        self.assertEqual(entry["message"], "done in 5 ms")
+        self.assertEqual(entry["duration_ms"], 5)
+        self.assertEqual(entry["request_id"], "abc")
+        self.assertEqual(entry["level"], "INFO")
+
+
+if __name__ == '__main__':
+    unittest.main()
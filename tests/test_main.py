@@ -0,0 +1,46 @@
+"""
+Smoke tests for the command line entry point.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+class TestMain(unittest.TestCase):
+    """Tests that the CLI starts."""
+    
+    def test_cli_starts_as_script(self):
+        """Test that ``python src/main.py`` imports the agents and parses arguments."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            result = subprocess.run(
+                [sys.executable, os.path.join(REPO_ROOT, "src", "main.py"), "--help"],
+                cwd=temp_dir,
+                capture_output=True,
+                text=True,
+                timeout=300
+            )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("--model-path", result.stdout)
+    
+    def test_cli_entry_point_imports(self):
+        """Test that the ``ai-code`` entry point module imports as a package."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            result = subprocess.run(
+                [sys.executable, "-c", "import src.main; print(callable(src.main.main))"],
+                cwd=temp_dir,
+                env={**os.environ, "PYTHONPATH": REPO_ROOT},
+                capture_output=True,
+                text=True,
+                timeout=300
+            )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "True")
+
+
+if __name__ == '__main__':
+    unittest.main()
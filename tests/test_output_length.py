@@ -0,0 +1,139 @@
+"""
+Tests for output length prediction.
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock
+
+import torch
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.agents.base_agent import BaseAgent
+from src.utils.cancellation import CancellationToken
+from src.utils.output_length import OutputLengthPredictor, input_size_bucket
+
+
+class TestOutputLengthPredictor(unittest.TestCase):
+    """Tests for the OutputLengthPredictor class."""
+    
+    def setUp(self):
+        """Set up a predictor that trusts small buckets."""
+        self.predictor = OutputLengthPredictor(quantile=0.9, margin=1.0, min_samples=5, min_budget=8)
+    
+    def test_falls_back_to_max_tokens(self):
+        """Test that the maximum is used until enough samples exist."""
+        for _ in range(4):
+            self.predictor.record("generate", "python", 100, 50)
+        self.assertEqual(self.predictor.predict("generate", "python", 100, 2048), 2048)
+    
+    def test_predicts_quantile(self):
+        """Test that the prediction follows recorded lengths."""
+        for length in range(10, 110, 10):
+            self.predictor.record("generate", "python", 100, length)
+        budget = self.predictor.predict("generate", "python", 100, 2048)
+        self.assertGreaterEqual(budget, 90)
+        self.assertLessEqual(budget, 100)
+    
+    def test_budget_bounds(self):
+        """Test that predictions stay between min_budget and max_tokens."""
+        for _ in range(5):
+            self.predictor.record("explain", "", 10, 1)
+            self.predictor.record("refactor", "cpp", 10, 5000)
+        self.assertEqual(self.predictor.predict("explain", "", 10, 2048), 8)
+        self.assertEqual(self.predictor.predict("refactor", "cpp", 10, 2048), 2048)
+    
+    def test_bucket_fallback(self):
+        """Test that unseen input sizes use all sizes of the same task."""
+        for _ in range(5):
+            self.predictor.record("generate", "python", 10, 40)
+        self.assertNotEqual(input_size_bucket(10), input_size_bucket(5000))
+        self.assertEqual(self.predictor.predict("generate", "python", 5000, 2048), 40)
+        self.assertEqual(self.predictor.predict("generate", "cpp", 10, 2048), 2048)
+    
+    def test_stats(self):
+        """Test prediction statistics."""
+        for _ in range(5):
+            self.predictor.record("generate", "python", 10, 40)
+        self.predictor.predict("generate", "python", 10, 2048)
+        
+        stats = self.predictor.get_stats()
+        self.assertEqual(stats["predictions"], 1)
+        self.assertEqual(stats["lengths"]["generate/python"]["count"], 5)
+        self.assertEqual(stats["lengths"]["generate/python"]["max"], 40)
+
+
+class _StubAgent(BaseAgent):
+    """Agent around a fake model emitting three tokens per call."""
+    device = torch.device("cpu")
+    
+    def _load_model(self):
+        tokenizer = MagicMock()
+        tokenizer.return_value.to.return_value.input_ids = torch.tensor([[1, 2]])
+        tokenizer.decode.return_value = "prompt output"
+        tokenizer.eos_token_id = 0
+        model = MagicMock()
+        model.generate.side_effect = lambda input_ids, **kwargs: torch.cat(
+            [input_ids, torch.tensor([[5, 6, 7]])], dim=-1
+        )
+        return {"model": model, "tokenizer": tokenizer}
+    
+    def generate_code(self, prompt, language, **kwargs):
+        return self._generate(prompt, length_key=("generate", language, len(prompt)), **kwargs)
+    
+    def explain_code(self, code, **kwargs):
+        raise NotImplementedError
+    
+    def refactor_code(self, code, instructions, **kwargs):
+        raise NotImplementedError
+
+
+class TestAdaptiveBudgetRecording(unittest.TestCase):
+    """Tests for recording output lengths from agent generations."""
+    
+    def setUp(self):
+        self.agent = _StubAgent("stub", {"max_tokens": 512, "adaptive_max_tokens": {"enabled": True, "min_samples": 1}})
+        self.agent.output_lengths.record = MagicMock(wraps=self.agent.output_lengths.record)
+    
+    def test_finished_generation_is_recorded(self):
+        """Test that completed outputs are recorded with their length."""
+        self.agent.generate_code("prompt", "python")
+        self.agent.output_lengths.record.assert_called_once_with("generate", "python", 6, 3)
+    
+    def test_generation_uses_max_tokens(self):
+        """Test that predictions never limit the generation itself."""
+        self.agent.generate_code("prompt", "python")
+        self.agent.generate_code("prompt", "python")
+        for call in self.agent.model["model"].generate.call_args_list:
+            self.assertEqual(call.kwargs["max_new_tokens"], 512)
+    
+    def test_predict_max_tokens(self):
+        """Test the budget reported for admission before and after recording."""
+        self.assertEqual(self.agent.predict_max_tokens("generate", "prompt", "python"), 512)
+        self.agent.generate_code("prompt", "python")
+        self.assertEqual(self.agent.predict_max_tokens("generate", "prompt", "python"), 64)
+        self.assertEqual(self.agent.predict_max_tokens("explain", "prompt", "python"), 512)
+        
+        disabled = _StubAgent("stub", {"max_tokens": 512})
+        self.assertEqual(disabled.predict_max_tokens("generate", "prompt", "python"), 512)
+    
+    def test_cancelled_generation_is_not_recorded(self):
+        """Test that outputs cut short by a cancellation do not bias the budget."""
+        token = CancellationToken()
+        
+        def cancelled_generate(input_ids, stopping_criteria=None, **kwargs):
+            token.cancel()
+            for criteria in stopping_criteria:
+                criteria(input_ids, None)
+            return torch.cat([input_ids, torch.tensor([[5]])], dim=-1)
+        
+        self.agent.model["model"].generate.side_effect = cancelled_generate
+        self.agent.generate_code("prompt", "python", cancel_token=token, return_partial=True)
+        self.agent.output_lengths.record.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+"""
+Tests for performance profiles.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+import torch
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.perf_profile import (
+    PROFILE_NAME,
+    load_performance_profile,
+    profile_dtype,
+    save_performance_profile,
+)
+
+
+class TestPerformanceProfile(unittest.TestCase):
+    """Tests for saving and loading performance profiles."""
+    
+    def test_round_trip(self):
+        """Test that a saved profile is loaded on the same machine."""
+        with tempfile.TemporaryDirectory() as model_path:
+            save_performance_profile(model_path, {"dtype": "bfloat16", "num_threads": 2})
+            profile = load_performance_profile(model_path)
+        
+        self.assertEqual(profile["num_threads"], 2)
+        self.assertEqual(profile_dtype(profile, torch.float32), torch.bfloat16)
+    
+    def test_other_machine_ignored(self):
+        """Test that a profile measured on another CPU is ignored."""
+        with tempfile.TemporaryDirectory() as model_path:
+            with open(os.path.join(model_path, PROFILE_NAME), "w") as f:
+                json.dump({"cpu_model": "other", "cpu_count": 1, "num_threads": 2}, f)
+            self.assertIsNone(load_performance_profile(model_path))
+    
+    def test_missing_profile(self):
+        """Test that models without a profile use defaults."""
+        self.assertIsNone(load_performance_profile("/nonexistent"))
+        self.assertEqual(profile_dtype(None, torch.float32), torch.float32)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+Tests for the directory pipeline.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.pipeline import DirectoryPipeline, default_journal_path, discover_files
+
+
+class TestDirectoryPipeline(unittest.TestCase):
+    """Tests for the DirectoryPipeline class."""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmpdir.name, "src")
+        self.journal = os.path.join(self.tmpdir.name, "journal.jsonl")
+        os.makedirs(os.path.join(self.root, "pkg"))
+        for name, code in [("a.py", "x = 1\n"), ("pkg/b.py", "y = 2\n"), ("c.cpp", "int z;\n"), ("notes.txt", "")]:
+            with open(os.path.join(self.root, name), "w") as f:
+                f.write(code)
+        self.agent = MagicMock()
+        self.agent.refactor_code.side_effect = lambda code, instructions, **kwargs: code.upper()
+        self.agent.validate_code.return_value = True
+    
+    def tearDown(self):
+        self.tmpdir.cleanup()
+    
+    def test_discover_files(self):
+        """Test that only source files matching the pattern are found."""
+        files = discover_files(self.root, "*.py")
+        self.assertEqual([os.path.relpath(f, self.root) for f in files], ["a.py", os.path.join("pkg", "b.py")])
+        self.assertEqual(len(discover_files(self.root)), 3)
+    
+    def test_output_dir_inside_tree_is_not_input(self):
+        """Test that a rerun does not pick up results written inside the input tree."""
+        output_dir = os.path.join(self.root, "out")
+        DirectoryPipeline(self.agent, "refactor", self.journal, output_dir).run(self.root)
+        self.assertTrue(os.path.exists(os.path.join(output_dir, "a.py")))
+        
+        rerun = DirectoryPipeline(self.agent, "refactor", self.journal, output_dir).run(self.root)
+        self.assertEqual((rerun.total, rerun.skipped), (3, 3))
+        self.assertEqual(len(discover_files(self.root, exclude=[output_dir])), 3)
+    
+    def test_default_journal_outside_tree(self):
+        """Test that the default journal is per directory and outside it."""
+        journal = default_journal_path(self.root)
+        self.assertFalse(os.path.abspath(journal).startswith(self.root + os.sep))
+        self.assertEqual(journal, default_journal_path(self.root + os.sep))
+        self.assertNotEqual(journal, default_journal_path(self.tmpdir.name))
+    
+    def test_refactor_writes_outputs(self):
+        """Test that refactored files mirror the input tree."""
+        output_dir = os.path.join(self.tmpdir.name, "out")
+        report = DirectoryPipeline(self.agent, "refactor", self.journal, output_dir).run(self.root)
+        
+        self.assertEqual((report.processed, report.failed), (3, 0))
+        with open(os.path.join(output_dir, "pkg", "b.py")) as f:
+            self.assertEqual(f.read(), "Y = 2\n")
+    
+    def test_resume_skips_finished_files(self):
+        """Test that a rerun only processes failed and changed files."""
+        self.agent.validate_code.side_effect = lambda code, language: language == "python"
+        first = DirectoryPipeline(self.agent, "refactor", self.journal).run(self.root)
+        self.assertEqual((first.processed, first.failed), (2, 1))
+        
+        with open(os.path.join(self.root, "a.py"), "w") as f:
+            f.write("x = 3\n")
+        self.agent.validate_code.side_effect = None
+        self.agent.refactor_code.reset_mock()
+        second = DirectoryPipeline(self.agent, "refactor", self.journal).run(self.root)
+        
+        self.assertEqual((second.processed, second.skipped, second.failed), (2, 1, 0))
+        refactored = sorted(call.args[0] for call in self.agent.refactor_code.call_args_list)
+        self.assertEqual(refactored, ["int z;\n", "x = 3\n"])
+    
+    def test_rerun_with_output_dir_writes_outputs(self):
+        """Test that files finished without an output directory are redone when one is given."""
+        DirectoryPipeline(self.agent, "refactor", self.journal).run(self.root)
+        output_dir = os.path.join(self.tmpdir.name, "out")
+        report = DirectoryPipeline(self.agent, "refactor", self.journal, output_dir).run(self.root)
+        
+        self.assertEqual((report.processed, report.skipped), (3, 0))
+        with open(os.path.join(output_dir, "a.py")) as f:
+            self.assertEqual(f.read(), "X = 1\n")
+        rerun = DirectoryPipeline(self.agent, "refactor", self.journal, output_dir).run(self.root)
+        self.assertEqual((rerun.processed, rerun.skipped), (0, 3))
+    
+    def test_truncated_journal_line_is_ignored(self):
+        """Test resuming after a run killed mid-write."""
+        DirectoryPipeline(self.agent, "validate", self.journal).run(self.root)
+        with open(self.journal, "a") as f:
+            f.write('{"action": "validate", "pa')
+        report = DirectoryPipeline(self.agent, "validate", self.journal).run(self.root)
+        
+        self.assertEqual(report.skipped, 3)
+        self.agent.validate_code.return_value = False
+        with open(os.path.join(self.root, "a.py"), "w") as f:
+            f.write("x = 2\n")
+        DirectoryPipeline(self.agent, "validate", self.journal).run(self.root)
+        with open(self.journal) as f:
+            self.assertIs(json.loads(f.readlines()[-1])["output"], False)
+        with open(self.journal) as f:
+            entry = json.loads(f.readline())
+        self.assertEqual(entry["status"], "done")
+        self.assertTrue(entry["output"])
+
+
+if __name__ == '__main__':
+    unittest.main()
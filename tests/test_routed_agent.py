@@ -0,0 +1,112 @@
+"""
+Tests for complexity-based routing.
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.agents.routed_agent import RoutedAgent, count_ast_nodes
+
+
+def make_agent(name, result="code", valid=True):
+    """Create a mock agent with a whitespace tokenizer."""
+    agent = MagicMock()
+    agent.config = {"model_name": name}
+    agent.model = {"tokenizer": lambda text, **kw: {"input_ids": text.split()}}
+    agent.generate_code.return_value = result
+    agent.refactor_code.return_value = result
+    agent.explain_code.return_value = result
+    agent.validate_code.return_value = valid
+    return agent
+
+
+class TestRoutedAgent(unittest.TestCase):
+    """Tests for the RoutedAgent class."""
+    
+    def test_simple_request_uses_small_agent(self):
+        """Test that a short generation stays on the small agent."""
+        small, large = make_agent("small"), make_agent("large")
+        router = RoutedAgent([small, large])
+        
+        router.generate_code("Write a function that adds two numbers", "python")
+        
+        small.generate_code.assert_called_once()
+        large.generate_code.assert_not_called()
+    
+    def test_complex_request_starts_at_large_agent(self):
+        """Test that a large refactoring skips the small agent."""
+        small, large = make_agent("small"), make_agent("large")
+        router = RoutedAgent([small, large])
+        code = "\n".join(f"def f{i}(x):\n    return x * {i}" for i in range(200))
+        
+        router.refactor_code(code, "Add type hints", language="python")
+        
+        small.refactor_code.assert_not_called()
+        large.refactor_code.assert_called_once()
+    
+    def test_escalates_on_invalid_code(self):
+        """Test that invalid output is retried on the larger agent."""
+        small = make_agent("small", "bad", valid=False)
+        large = make_agent("large", "good")
+        router = RoutedAgent([small, large])
+        
+        self.assertEqual(router.generate_code("Write a function", "python"), "good")
+        self.assertEqual(router.get_stats()["escalations"], 1)
+    
+    def test_skips_agent_with_low_success_rate(self):
+        """Test that history of failures routes straight to the larger agent."""
+        small = make_agent("small", "bad", valid=False)
+        large = make_agent("large", "good")
+        router = RoutedAgent([small, large], min_samples=2)
+        
+        for _ in range(2):
+            router.generate_code("Write a function", "python")
+        small.generate_code.reset_mock()
+        router.generate_code("Write a function", "python")
+        
+        small.generate_code.assert_not_called()
+        self.assertEqual(router.get_stats()["success_rates"]["small/generate/python"], 0.0)
+    
+    def test_skipped_agent_is_probed_and_recovers(self):
+        """Test that a skipped agent still gets occasional requests and is used again once it succeeds."""
+        small = make_agent("small", "bad", valid=False)
+        large = make_agent("large", "good")
+        router = RoutedAgent([small, large], min_samples=2, window=2, probe_interval=3)
+        for _ in range(2):
+            router.generate_code("Write a function", "python")
+        
+        small.generate_code.reset_mock()
+        small.validate_code.return_value = True
+        small.generate_code.return_value = "good"
+        for _ in range(6):
+            router.generate_code("Write a function", "python")
+        
+        # The third and sixth skipping requests probe the small agent; after
+        # two successes the window holds no failures and it is used again
+        self.assertEqual(small.generate_code.call_count, 2)
+        self.assertEqual(router.get_stats()["probes"], 2)
+        self.assertEqual(router.get_stats()["success_rates"]["small/generate/python"], 1.0)
+        router.generate_code("Write a function", "python")
+        self.assertEqual(small.generate_code.call_count, 3)
+    
+    def test_explain_is_not_escalated(self):
+        """Test that explanations are returned without validation."""
+        small, large = make_agent("small", "explanation", valid=False), make_agent("large")
+        router = RoutedAgent([small, large])
+        
+        self.assertEqual(router.explain_code("x = 1"), "explanation")
+        large.explain_code.assert_not_called()
+    
+    def test_count_ast_nodes(self):
+        """Test the structural size estimate."""
+        self.assertGreater(count_ast_nodes("def f(x):\n    return x + 1\n", "python"), 5)
+        self.assertEqual(count_ast_nodes("int main() {\n\n  return 0;\n}\n", "cpp"), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+"""
+Tests for the sandbox pool.
+"""
+
+import os
+import sys
+import unittest
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.sandbox import SandboxPool
+
+
+@unittest.skipUnless(os.name == "posix", "SandboxPool requires POSIX")
+class TestSandboxPool(unittest.TestCase):
+    """Tests for the SandboxPool class."""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = SandboxPool(size=2, timeout=1.0, memory_limit_mb=256)
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+    
+    def test_passing_and_failing_tests(self):
+        """Test per-test outcomes for asserts and test functions."""
+        code = "def add(a, b):\n    return a + b\n"
+        tests = (
+            "assert add(1, 2) == 3\n"
+            "def test_ok():\n    assert add(2, 2) == 4\n"
+            "def test_wrong():\n    assert add(2, 2) == 5\n"
+        )
+        result = self.pool.run(code, tests)
+        
+        self.assertFalse(result.passed)
+        outcomes = {test.name: test.passed for test in result.tests}
+        self.assertEqual(outcomes, {"<module>": True, "test_ok": True, "test_wrong": False})
+        self.assertIn("AssertionError", result.tests[2].error)
+    
+    def test_output_is_captured(self):
+        """Test that printed output is returned instead of leaking."""
+        result = self.pool.run("print('hello')", "")
+        self.assertTrue(result.passed)
+        self.assertEqual(result.output, "hello\n")
+    
+    def test_timeout(self):
+        """Test that runaway code is killed."""
+        result = self.pool.run("while True:\n    pass\n", "", timeout=0.3)
+        self.assertFalse(result.passed)
+        self.assertIn("timed out", result.error)
+        # The worker is still usable afterwards
+        self.assertTrue(self.pool.run("x = 1", "assert x == 1").passed)
+    
+    def test_memory_limit(self):
+        """Test that allocations beyond the limit fail."""
+        result = self.pool.run("data = bytearray(1024 ** 3)", "")
+        self.assertFalse(result.passed)
+        self.assertIn("MemoryError", result.error)
+    
+    def test_checks_are_isolated(self):
+        """Test that state does not leak between checks."""
+        self.pool.run("import math\nmath.pi = 3", "")
+        self.assertTrue(self.pool.run("import math", "assert math.pi > 3.14").passed)
+    
+    def test_run_many(self):
+        """Test running several checks across workers."""
+        results = self.pool.run_many([("x = %d" % i, "assert x == %d" % i) for i in range(6)])
+        self.assertTrue(all(result.passed for result in results))
+
+
+if __name__ == '__main__':
+    unittest.main()
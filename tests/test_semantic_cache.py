@@ -0,0 +1,87 @@
+"""
+Tests for the semantic prompt cache.
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.agents.claude_agent import ClaudeAgent
+from src.utils.semantic_cache import SemanticCache
+
+
+class TestSemanticCache(unittest.TestCase):
+    """Tests for the SemanticCache class."""
+    
+    def test_similar_prompt_hits(self):
+        """Test that a nearby embedding returns the stored result."""
+        cache = SemanticCache(threshold=0.9)
+        cache.add("python", [1.0, 0.0, 0.0], "def f(): pass")
+        
+        self.assertEqual(cache.lookup("python", [0.95, 0.05, 0.0]), "def f(): pass")
+        self.assertIsNone(cache.lookup("python", [0.0, 1.0, 0.0]))
+        self.assertEqual(cache.get_stats()["hits"], 1)
+        self.assertEqual(cache.get_stats()["misses"], 1)
+    
+    def test_languages_are_separate(self):
+        """Test that results are only returned for the same language."""
+        cache = SemanticCache()
+        cache.add("python", [1.0, 0.0], "def f(): pass")
+        self.assertIsNone(cache.lookup("cpp", [1.0, 0.0]))
+        self.assertIsNotNone(cache.lookup("Python", [1.0, 0.0]))
+    
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted when full."""
+        cache = SemanticCache(threshold=0.99, max_entries=2)
+        cache.add("python", [1.0, 0.0, 0.0], "a")
+        cache.add("python", [0.0, 1.0, 0.0], "b")
+        cache.lookup("python", [1.0, 0.0, 0.0])
+        cache.add("python", [0.0, 0.0, 1.0], "c")
+        
+        self.assertEqual(cache.lookup("python", np.array([1.0, 0.0, 0.0])), "a")
+        self.assertIsNone(cache.lookup("python", [0.0, 1.0, 0.0]))
+        self.assertEqual(cache.lookup("python", [0.0, 0.0, 1.0]), "c")
+        self.assertEqual(cache.get_stats()["entries"], {"python": 2})
+
+
+
+class TestAgentSemanticCache(unittest.TestCase):
+    """Tests for semantic cache use in generate_code."""
+    
+    @patch('src.agents.claude_agent.AutoModelForCausalLM')
+    @patch('src.agents.claude_agent.AutoTokenizer')
+    @patch('os.path.exists', return_value=True)
+    def setUp(self, mock_exists, mock_tokenizer, mock_model):
+        self.agent = ClaudeAgent("dummy_path", {"semantic_cache": {"enabled": True}})
+        self.agent._embed_prompt = MagicMock(return_value=np.array([1.0, 0.0]))
+        self.agent.semantic_cache.add("python", [1.0, 0.0], "cached = True")
+        self.agent._generate = MagicMock(return_value="generated = True")
+        self.agent._generate_candidates = MagicMock(return_value=["generated = True"])
+    
+    def test_plain_request_hits(self):
+        """Test that a paraphrased plain request is served from the cache."""
+        self.assertEqual(self.agent.generate_code("prompt", "python"), "cached = True")
+        self.agent._generate.assert_not_called()
+    
+    def test_tests_and_best_of_bypass_cache(self):
+        """Test that requests asking for tests or best-of-N are generated, not served syntax-checked code."""
+        self.assertEqual(self.agent.generate_code("prompt", "python", tests="assert generated"), "generated = True")
+        self.assertEqual(self.agent.generate_code("prompt", "python", best_of=2), "generated = True")
+        self.agent._generate_candidates.assert_called_once()
+        self.assertEqual(self.agent.semantic_cache.get_stats()["hits"], 0)
+    
+    def test_tests_that_do_not_run_use_cache(self):
+        """Test that tests for a language they are not run for do not bypass the cache."""
+        self.agent.semantic_cache.add("cpp", [1.0, 0.0], "int cached;")
+        self.assertEqual(self.agent.generate_code("prompt", "cpp", tests="assert cached"), "int cached;")
+        self.agent._generate.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
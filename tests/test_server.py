@@ -0,0 +1,353 @@
+"""
+Tests for the HTTP server and request scheduler.
+"""
+
+import asyncio
+import logging
+import logging.config
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+
+from configs.agent_config import LOGGING_CONFIG, LOGGING_QUEUE_CONFIG
+from src.server import app as app_module
+from src.server.app import create_app
+from src.server.host import AgentHost
+from src.utils.cancellation import GenerationCancelled
+from src.server.scheduler import Priority, QueueFullError, RequestScheduler
+
+
+class TestRequestScheduler(unittest.TestCase):
+    """Tests for the RequestScheduler class."""
+    
+    def test_priority_order(self):
+        """Test that interactive requests run before queued batch requests."""
+        async def scenario():
+            scheduler = RequestScheduler(max_queue_size=8, num_workers=1)
+            await scheduler.start()
+            gate = threading.Event()
+            order = []
+            
+            blocker = scheduler.submit(gate.wait)
+            await asyncio.sleep(0.05)
+            batch = scheduler.submit(lambda: order.append("batch"), Priority.BATCH)
+            interactive = scheduler.submit(lambda: order.append("interactive"))
+            gate.set()
+            await asyncio.gather(blocker, batch, interactive)
+            await scheduler.stop()
+            return order
+        
+        self.assertEqual(asyncio.run(scenario()), ["interactive", "batch"])
+    
+    def test_backpressure(self):
+        """Test that a full queue rejects requests instead of growing."""
+        async def scenario():
+            scheduler = RequestScheduler(max_queue_size=2, num_workers=1, batch_watermark=0.5)
+            await scheduler.start()
+            gate = threading.Event()
+            futures = [scheduler.submit(gate.wait)]
+            await asyncio.sleep(0.05)
+            
+            futures.append(scheduler.submit(lambda: None, Priority.BATCH))
+            with self.assertRaises(QueueFullError):
+                scheduler.submit(lambda: None, Priority.BATCH)
+            futures.append(scheduler.submit(lambda: None))
+            with self.assertRaises(QueueFullError):
+                scheduler.submit(lambda: None)
+            
+            gate.set()
+            await asyncio.gather(*futures)
+            stats = scheduler.get_stats()
+            await scheduler.stop()
+            return stats
+        
+        stats = asyncio.run(scenario())
+        self.assertEqual(stats["rejected"], 2)
+        self.assertEqual(stats["completed"], 3)
+    
+    
+    def test_token_budget_admission(self):
+        """Test that requests start only while their reserved tokens fit the budget."""
+        async def scenario():
+            scheduler = RequestScheduler(max_queue_size=8, num_workers=3, max_tokens_in_flight=1000)
+            await scheduler.start()
+            gates = [threading.Event() for _ in range(3)]
+            started = []
+            
+            def job(index):
+                started.append(index)
+                gates[index].wait()
+            
+            futures = [
+                scheduler.submit(lambda: job(0), tokens=600),
+                scheduler.submit(lambda: job(1), tokens=600),
+                scheduler.submit(lambda: job(2), tokens=300),
+            ]
+            await asyncio.sleep(0.1)
+            # The second request waits for room and the third may not overtake it
+            first = (list(started), scheduler.get_stats()["reserved_tokens"])
+            gates[0].set()
+            await asyncio.sleep(0.1)
+            second = (list(started), scheduler.get_stats()["reserved_tokens"])
+            for gate in gates:
+                gate.set()
+            await asyncio.gather(*futures)
+            stats = scheduler.get_stats()
+            await scheduler.stop()
+            return first, second, stats
+        
+        first, second, stats = asyncio.run(scenario())
+        self.assertEqual(first, ([0], 600))
+        self.assertEqual(second, ([0, 1, 2], 900))
+        self.assertEqual(stats["reserved_tokens"], 0)
+    
+    def test_oversized_request_runs_alone(self):
+        """Test that a request larger than the whole budget still runs."""
+        async def scenario():
+            scheduler = RequestScheduler(max_queue_size=8, num_workers=2, max_tokens_in_flight=100)
+            await scheduler.start()
+            result = await scheduler.submit(lambda: "done", tokens=500)
+            await scheduler.stop()
+            return result
+        
+        self.assertEqual(asyncio.run(scenario()), "done")
+
+
+class TestServerApp(unittest.TestCase):
+    """Tests for the FastAPI application."""
+    
+    def setUp(self):
+        self.agent = MagicMock()
+        self.agent.model = {"tokenizer": MagicMock()}
+        
+        def generate_code(prompt, language, streamer=None, **kwargs):
+            if streamer is not None:
+                streamer.on_finalized_text("def ")
+                streamer.on_finalized_text("f(): pass")
+            return "def f(): pass"
+        
+        self.agent.generate_code.side_effect = generate_code
+        self.agent.explain_code.return_value = "An explanation"
+    
+    def test_generate(self):
+        """Test a non-streaming generation request."""
+        with TestClient(create_app(self.agent)) as client:
+            response = client.post("/generate", json={"prompt": "p", "language": "python"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"result": "def f(): pass"})
+    
+    def test_generate_stream(self):
+        """Test that streamed tokens and the final result are sent as SSE."""
+        with TestClient(create_app(self.agent)) as client:
+            response = client.post(
+                "/generate",
+                json={"prompt": "p", "language": "python", "stream": True}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('event: token\ndata: {"text": "def "}', response.text)
+        self.assertIn('event: done\ndata: {"result": "def f(): pass"}', response.text)
+    
+    def test_timeout(self):
+        """Test that a request past its deadline returns 504 with partial output."""
+        def slow_generate(prompt, language, cancel_token=None, **kwargs):
+            while cancel_token.stop_reason is None:
+                time.sleep(0.01)
+            raise GenerationCancelled(cancel_token.stop_reason, "def")
+        
+        self.agent.generate_code.side_effect = slow_generate
+        with TestClient(create_app(self.agent)) as client:
+            response = client.post(
+                "/generate",
+                json={"prompt": "p", "language": "python", "timeout": 0.1}
+            )
+        self.assertEqual(response.status_code, 504)
+        self.assertEqual(response.json()["partial_output"], "def")
+    
+    def test_predicted_budget_reserved(self):
+        """Test that requests reserve the agent's predicted output length."""
+        self.agent.predict_max_tokens.return_value = 128
+        app = create_app(self.agent, {"max_tokens_in_flight": 1024})
+        with patch.object(app.state.scheduler, "submit", wraps=app.state.scheduler.submit) as submit, \
+                TestClient(app) as client:
+            response = client.post("/explain", json={"code": "x = 1", "language": "python"})
+        
+        self.assertEqual(response.status_code, 200)
+        self.agent.predict_max_tokens.assert_called_once_with("explain", "x = 1", "python")
+        self.assertEqual(submit.call_args.args[2], 128)
+    
+    def test_failed_submit_releases_lease(self):
+        """Test that the model lease is released when a request cannot be queued."""
+        app = create_app(self.agent)
+        with patch.object(app.state.scheduler, "submit", side_effect=RuntimeError("boom")), \
+                TestClient(app, raise_server_exceptions=False) as client:
+            for stream in (False, True):
+                response = client.post(
+                    "/generate",
+                    json={"prompt": "p", "language": "python", "stream": stream}
+                )
+                self.assertEqual(response.status_code, 500)
+        
+        self.assertEqual(app.state.host.get_stats()["active_requests"], 0)
+    
+    def test_unknown_priority(self):
+        """Test that an unknown priority is rejected."""
+        with TestClient(create_app(self.agent)) as client:
+            response = client.post("/explain", json={"code": "x = 1", "priority": "urgent"})
+        self.assertEqual(response.status_code, 422)
+
+
+def make_agent(model_path, result="def f(): pass"):
+    """Create a mock agent for a model path."""
+    agent = MagicMock()
+    agent.model_path = model_path
+    agent.config = {}
+    agent.model = {"tokenizer": MagicMock()}
+    agent.generate_code.return_value = result
+    return agent
+
+
+class TestAgentHost(unittest.TestCase):
+    """Tests for the AgentHost class."""
+    
+    def test_swap_after_in_flight_requests(self):
+        """Test that in-flight requests keep the old model until they finish."""
+        old = make_agent("old")
+        new = make_agent("new")
+        host = AgentHost(old, loader=lambda path: new, warmup=None)
+        
+        lease = host.acquire()
+        host.reload("new")
+        self.assertTrue(host.wait_for_reload(5))
+        
+        # New requests use the new model, the leased one still the old
+        self.assertIs(host.agent, new)
+        self.assertIs(lease.agent, old)
+        self.assertEqual(lease.version, 1)
+        stats = host.get_stats()
+        self.assertEqual(stats["version"], 2)
+        self.assertEqual(stats["draining"], [{"version": 1, "active_requests": 1}])
+        old.close.assert_not_called()
+        
+        lease.release()
+        lease.release()
+        old.close.assert_called_once()
+        self.assertEqual(host.get_stats()["draining"], [])
+    
+    def test_warmup_before_switch(self):
+        """Test that the new model is warmed up before serving."""
+        new = make_agent("new")
+        warmed = []
+        
+        def warmup(agent):
+            warmed.append(agent)
+            self.assertIsNot(host.agent, agent)
+        
+        host = AgentHost(make_agent("old"), loader=lambda path: new, warmup=warmup)
+        host.reload("new")
+        host.wait_for_reload(5)
+        self.assertEqual(warmed, [new])
+        self.assertIs(host.agent, new)
+    
+    def test_failed_reload_keeps_model(self):
+        """Test that a failing load leaves the current model serving."""
+        old = make_agent("old")
+        
+        def loader(path):
+            raise OSError("missing weights")
+        
+        host = AgentHost(old, loader=loader, warmup=None)
+        host.reload("broken")
+        host.wait_for_reload(5)
+        self.assertIs(host.agent, old)
+        self.assertEqual(host.get_stats()["reload"]["state"], "failed")
+        old.close.assert_not_called()
+    
+    def test_concurrent_reload_rejected(self):
+        """Test that only one reload runs at a time."""
+        gate = threading.Event()
+        
+        def loader(path):
+            gate.wait()
+            return make_agent(path)
+        
+        host = AgentHost(make_agent("old"), loader=loader, warmup=None)
+        host.reload("a")
+        with self.assertRaises(RuntimeError):
+            host.reload("b")
+        gate.set()
+        host.wait_for_reload(5)
+        self.assertEqual(host.get_stats()["model_path"], "a")
+        
+        with self.assertRaises(RuntimeError):
+            AgentHost(make_agent("old")).reload("a")
+
+
+class TestServerReload(unittest.TestCase):
+    """Tests for reloading the model through the API."""
+    
+    def test_reload_endpoint(self):
+        """Test that new requests are served by the reloaded model."""
+        old = make_agent(os.getcwd(), result="old")
+        new = make_agent(os.getcwd(), result="new")
+        app = create_app(old, loader=lambda path: new)
+        app.state.host._warmup = None
+        with TestClient(app) as client:
+            before = client.post("/generate", json={"prompt": "p", "language": "python"})
+            response = client.post("/admin/reload", json={"model_path": os.getcwd()})
+            self.assertEqual(response.status_code, 202)
+            app.state.host.wait_for_reload(5)
+            after = client.post("/generate", json={"prompt": "p", "language": "python"})
+            status = client.get("/admin/model").json()
+            missing = client.post("/admin/reload", json={"model_path": "/does/not/exist"})
+        
+        self.assertEqual(before.json(), {"result": "old"})
+        self.assertEqual(after.json(), {"result": "new"})
+        self.assertEqual(status["version"], 2)
+        self.assertEqual(status["active_requests"], 0)
+        self.assertEqual(missing.status_code, 422)
+        old.close.assert_called_once()
+    
+    def test_reload_without_loader(self):
+        """Test that reloading is refused when the server cannot load models."""
+        with TestClient(create_app(make_agent(os.getcwd()))) as client:
+            response = client.post("/admin/reload", json={"model_path": os.getcwd()})
+        self.assertEqual(response.status_code, 409)
+
+
+
+class TestServerMain(unittest.TestCase):
+    """Tests for the server entry point."""
+    
+    def test_main_configures_logging(self):
+        """Test that starting the server sets up the queued log handlers."""
+        with patch.object(sys, "argv", ["ai-code-server", "--model-path", "model"]), \
+                patch.object(app_module, "setup_logging") as setup_logging, \
+                patch.object(app_module, "ClaudeAgent"), \
+                patch.object(app_module, "create_app"), \
+                patch.object(app_module.uvicorn, "run") as run:
+            app_module.main()
+        
+        setup_logging.assert_called_once_with(LOGGING_CONFIG, LOGGING_QUEUE_CONFIG)
+        run.assert_called_once()
+    
+    def test_json_formatter_sees_request_id(self):
+        """Test that the configured JSON formatter shares the server's request context."""
+        path = LOGGING_CONFIG["formatters"]["json"]["()"]
+        formatter_class = logging.config.BaseConfigurator({}).resolve(path)
+        logging_module = sys.modules[formatter_class.__module__]
+        record = logging.LogRecord("test", logging.INFO, __file__, 1, "handled", None, None)
+        with app_module.request_context("req-42"):
+            logging_module.RequestIdFilter().filter(record)
+        self.assertIn('"request_id": "req-42"', formatter_class().format(record))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+Tests for multi-turn sessions.
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+import torch
+from transformers import DynamicCache
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.agents.session import SessionManager
+
+
+def _make_cache(length):
+    cache = DynamicCache()
+    cache.update(torch.ones(1, 2, length, 4), torch.zeros(1, 2, length, 4), 0)
+    return cache
+
+
+class TestSessionManager(unittest.TestCase):
+    """Tests for the SessionManager class."""
+    
+    def test_idle_cache_is_dropped(self):
+        """Test that idle caches are dropped but history is kept."""
+        manager = SessionManager(idle_timeout=0)
+        session = manager.create()
+        session.token_ids = torch.ones(1, 4, dtype=torch.long)
+        session.cache = _make_cache(3)
+        
+        other = manager.create()
+        manager.get(other.session_id)
+        
+        self.assertIsNone(session.cache)
+        self.assertEqual(session.num_tokens, 4)
+        self.assertIsNone(manager.load_cache(session))
+    
+    def test_spill_and_reload(self):
+        """Test that evicted caches are spilled to disk and reloaded."""
+        with tempfile.TemporaryDirectory() as spill_dir:
+            manager = SessionManager(idle_timeout=0, spill_dir=spill_dir)
+            session = manager.create()
+            session.cache = _make_cache(3)
+            
+            manager.evict_idle()
+            self.assertIsNone(session.cache)
+            self.assertTrue(os.path.exists(session.spill_path))
+            
+            cache = manager.load_cache(session)
+            self.assertEqual(cache.get_seq_length(), 3)
+            self.assertEqual(os.listdir(spill_dir), [])
+    
+    def test_max_cached(self):
+        """Test that the least recently used caches are evicted beyond the limit."""
+        manager = SessionManager(max_cached=1)
+        first, second = manager.create(), manager.create()
+        first.cache = _make_cache(1)
+        second.cache = _make_cache(1)
+        
+        manager.get(second.session_id)
+        self.assertIsNone(first.cache)
+        self.assertIsNotNone(second.cache)
+        
+        manager.close(first.session_id)
+        self.assertEqual(len(manager), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+"""
+Tests for request coalescing.
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.cancellation import CancellationToken, GenerationCancelled
+from src.utils.single_flight import CoalescingAgent, SingleFlight, make_request_key
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Tests for the SingleFlight class."""
+    
+    def test_concurrent_calls_share_result(self):
+        """Test that identical concurrent calls run the function once."""
+        flight = SingleFlight()
+        calls = []
+        
+        def work(token):
+            calls.append(1)
+            time.sleep(0.1)
+            return "result"
+        
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(lambda _: flight.do("key", work), range(4)))
+        
+        self.assertEqual(results, ["result"] * 4)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.get_stats()["coalesced"], 3)
+    
+    def test_error_propagates_to_followers(self):
+        """Test that followers receive the leader's exception."""
+        flight = SingleFlight()
+        started = threading.Event()
+        
+        def fail(token):
+            started.set()
+            time.sleep(0.1)
+            raise ValueError("boom")
+        
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            leader = pool.submit(flight.do, "key", fail)
+            started.wait()
+            follower = pool.submit(flight.do, "key", lambda token: "unused")
+            with self.assertRaises(ValueError):
+                leader.result()
+            with self.assertRaises(ValueError):
+                follower.result()
+    
+    def test_sequential_calls_not_cached(self):
+        """Test that completed calls are not reused."""
+        flight = SingleFlight()
+        self.assertEqual(flight.do("key", lambda token: 1), 1)
+        self.assertEqual(flight.do("key", lambda token: 2), 2)
+    
+    def test_follower_stops_at_its_deadline(self):
+        """Test that a caller gives up at its own deadline while others keep waiting."""
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        seen = []
+        
+        def work(token):
+            started.set()
+            release.wait()
+            seen.append(token.stop_reason)
+            return "result"
+        
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            leader = pool.submit(flight.do, "key", work)
+            started.wait()
+            begin = time.monotonic()
+            with self.assertRaises(GenerationCancelled) as context:
+                flight.do("key", work, CancellationToken.with_timeout(0.1))
+            elapsed = time.monotonic() - begin
+            release.set()
+            self.assertEqual(leader.result(), "result")
+        
+        self.assertEqual(context.exception.reason, "timed out")
+        self.assertLess(elapsed, 1.0)
+        # The leader still needed the result, so the work was not stopped
+        self.assertEqual(seen, [None])
+    
+    def test_follower_token_reaches_running_call(self):
+        """Test that every caller's token is checked by the call it attached to."""
+        flight = SingleFlight()
+        started = threading.Event()
+        tokens = []
+        
+        def work(token):
+            tokens.append(token)
+            started.set()
+            while token.stop_reason is None:
+                time.sleep(0.01)
+            return "partial"
+        
+        leader_token = CancellationToken()
+        follower_token = CancellationToken()
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            leader = pool.submit(flight.do, "key", work, leader_token)
+            started.wait()
+            follower = pool.submit(flight.do, "key", work, follower_token)
+            time.sleep(0.1)
+            leader_token.cancel()
+            with self.assertRaises(GenerationCancelled):
+                leader.result(timeout=5)
+            self.assertIsNone(tokens[0].stop_reason)
+            follower_token.cancel()
+            # The last caller to stop receives the call's partial output
+            self.assertEqual(follower.result(timeout=5), "partial")
+        self.assertEqual(len(tokens), 1)
+
+
+class TestCoalescingAgent(unittest.TestCase):
+    """Tests for the CoalescingAgent class."""
+    
+    def test_request_key(self):
+        """Test that keys depend on action, input and parameters."""
+        key = make_request_key("m", "explain", "x = 1", {})
+        self.assertEqual(key, make_request_key("m", "explain", "x = 1", {}))
+        self.assertNotEqual(key, make_request_key("m", "refactor", "x = 1", {}))
+        self.assertNotEqual(key, make_request_key("m", "explain", "x = 2", {}))
+        self.assertNotEqual(key, make_request_key("m", "explain", "x = 1", {"language": "cpp"}))
+    
+    def test_streaming_bypasses_coalescing(self):
+        """Test that streaming calls are passed straight through."""
+        agent = MagicMock()
+        agent.config = {"model_name": "m"}
+        agent.explain_code.return_value = "explanation"
+        wrapper = CoalescingAgent(agent)
+        
+        wrapper.explain_code("x = 1", streamer=MagicMock())
+        self.assertEqual(wrapper.get_stats()["executed"], 0)
+        wrapper.explain_code("x = 1")
+        self.assertEqual(wrapper.get_stats()["executed"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+"""
+Tests for the traffic replay tool.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.traffic_replay import (
+    InProcessTarget,
+    LoadTester,
+    ReplayRequest,
+    arrival_offsets,
+    load_request_log,
+)
+
+
+class SlowTarget:
+    """Target taking a fixed time per request and tracking concurrency."""
+    
+    def __init__(self, delay=0.05, fail_action=None):
+        self.delay = delay
+        self.fail_action = fail_action
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+    
+    def send(self, request):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay / 2)
+            first_token_time = time.perf_counter()
+            time.sleep(self.delay / 2)
+            if request.action == self.fail_action:
+                raise RuntimeError("boom")
+            return "result", first_token_time
+        finally:
+            with self._lock:
+                self.active -= 1
+    
+    def queue_depth(self):
+        return None
+
+
+class TestRequestLog(unittest.TestCase):
+    """Tests for loading request logs and computing arrivals."""
+    
+    def setUp(self):
+        """Write a small request log."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "requests.jsonl")
+        entries = [
+            {"action": "explain", "input": "x = 1", "language": "python", "arrival_time": 1002.0},
+            {"action": "generate", "input": "add two numbers", "language": "python", "arrival_time": 1000.0},
+            {"action": "refactor", "input": "y=2", "arrival_time": 1003.5, "instructions": "Rename"},
+        ]
+        with open(self.path, "w") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+            f.write("\n")
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.temp_dir.cleanup()
+    
+    def test_load_request_log(self):
+        """Test that requests are sorted and arrivals made relative."""
+        requests = load_request_log(self.path)
+        self.assertEqual([request.action for request in requests], ["generate", "explain", "refactor"])
+        self.assertEqual([request.arrival_time for request in requests], [0.0, 2.0, 3.5])
+        self.assertEqual(requests[2].instructions, "Rename")
+        self.assertEqual(requests[2].language, "")
+    
+    def test_invalid_action(self):
+        """Test that unknown actions are rejected."""
+        with open(self.path, "a") as f:
+            f.write(json.dumps({"action": "chat", "input": "hi"}) + "\n")
+        with self.assertRaises(ValueError):
+            load_request_log(self.path)
+    
+    def test_arrival_offsets(self):
+        """Test recorded, fixed-rate and Poisson schedules."""
+        requests = load_request_log(self.path)
+        self.assertEqual(arrival_offsets(requests, speed=2.0), [0.0, 1.0, 1.75])
+        self.assertEqual(arrival_offsets(requests, qps=4.0), [0.0, 0.25, 0.5])
+        
+        poisson = arrival_offsets(requests, qps=4.0, poisson=True, seed=1)
+        self.assertEqual(poisson, arrival_offsets(requests, qps=4.0, poisson=True, seed=1))
+        self.assertEqual(poisson[0], 0.0)
+        self.assertEqual(poisson, sorted(poisson))
+
+
+class TestLoadTester(unittest.TestCase):
+    """Tests for the LoadTester class."""
+    
+    def test_report(self):
+        """Test throughput, latency percentiles and failures."""
+        requests = [ReplayRequest("generate", "p"), ReplayRequest("explain", "c"), ReplayRequest("refactor", "c")] * 2
+        target = SlowTarget(fail_action="refactor")
+        results = []
+        report = LoadTester(target, concurrency=2, sample_interval=0.01).run(
+            requests,
+            arrival_offsets(requests, qps=100.0),
+            on_result=lambda request, result, error: results.append((request.action, error))
+        )
+        
+        self.assertEqual(report.sent, 6)
+        self.assertEqual(report.completed, 4)
+        self.assertEqual(report.failed, 2)
+        self.assertEqual(len(results), 6)
+        self.assertEqual(report.latency["e2e"]["count"], 4)
+        self.assertEqual(report.latency["ttft/generate"]["count"], 2)
+        self.assertNotIn("e2e/refactor", report.latency)
+        self.assertLess(report.latency["ttft"]["p50"], report.latency["e2e"]["p50"])
+        self.assertGreater(report.throughput, 0)
+        self.assertIn("e2e/explain", report.format())
+    
+    def test_concurrency_and_queue_depth(self):
+        """Test that concurrency is bounded and waiting requests are sampled."""
+        requests = [ReplayRequest("generate", "p")] * 8
+        target = SlowTarget(delay=0.05)
+        report = LoadTester(target, concurrency=2, sample_interval=0.01).run(requests, [0.0] * 8)
+        
+        self.assertEqual(target.max_active, 2)
+        self.assertGreater(max(sample[1] for sample in report.queue_samples), 0)
+        self.assertTrue(all(sample[2] <= 2 for sample in report.queue_samples))
+        # Queued requests count their wait in the end-to-end latency
+        self.assertGreater(report.latency["e2e"]["p99"], 0.15)
+
+
+class TestInProcessTarget(unittest.TestCase):
+    """Tests for the InProcessTarget class."""
+    
+    def test_first_token_time(self):
+        """Test that the streamer skips the prompt when timing the first token."""
+        class Agent:
+            def explain_code(self, code, language="", streamer=None):
+                streamer.put("prompt")
+                assert streamer.first_token_time is None
+                streamer.put("token")
+                streamer.end()
+                return "explanation"
+        
+        result, first_token_time = InProcessTarget(Agent()).send(ReplayRequest("explain", "x"))
+        self.assertEqual(result, "explanation")
+        self.assertIsNotNone(first_token_time)
+    
+    def test_without_streaming(self):
+        """Test that no streamer is passed when streaming is disabled."""
+        class Agent:
+            def generate_code(self, prompt, language, **kwargs):
+                assert "streamer" not in kwargs
+                return "code"
+        
+        self.assertEqual(InProcessTarget(Agent(), stream=False).send(ReplayRequest("generate", "p")), ("code", None))
+
+
+if __name__ == '__main__':
+    unittest.main()
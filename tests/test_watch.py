@@ -0,0 +1,143 @@
+"""
+Tests for incremental watch-mode analysis.
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+# Add the src directory to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.watch import IncrementalAnalyzer, UnitResultStore, watch_directory
+
+
+class TestIncrementalAnalyzer(unittest.TestCase):
+    """Tests for the IncrementalAnalyzer class."""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "module.py")
+        self.agent = MagicMock()
+        self.agent.explain_code.side_effect = lambda code, **kwargs: f"explains {code.split('(')[0]}"
+        self.agent.validate_code.return_value = True
+    
+    def tearDown(self):
+        self.tmpdir.cleanup()
+    
+    def write(self, code):
+        with open(self.path, "w") as f:
+            f.write(code)
+    
+    def test_unchanged_units_are_reused(self):
+        """Test that only the edited function is explained again."""
+        analyzer = IncrementalAnalyzer(self.agent, "explain")
+        self.write("import os\n\ndef f():\n    return 1\n\ndef g():\n    return 2\n")
+        first = analyzer.analyze_file(self.path)
+        
+        # Reformatting f and changing g's body
+        self.write("import os\n\ndef f( ):\n    # comment\n    return 1\n\ndef g():\n    return 3\n")
+        second = analyzer.analyze_file(self.path)
+        
+        self.assertEqual([a.reused for a in first], [False, False])
+        self.assertEqual([(a.name, a.reused) for a in second], [("f", True), ("g", False)])
+        self.assertEqual(self.agent.explain_code.call_count, 3)
+    
+    def test_validate_rechecks_when_context_changes(self):
+        """Test that changed includes invalidate validation results."""
+        path = os.path.join(self.tmpdir.name, "module.cpp")
+        analyzer = IncrementalAnalyzer(self.agent, "validate")
+        with open(path, "w") as f:
+            f.write("#include <vector>\n\nint f() {\n    return 1;\n}\n")
+        analyzer.analyze_file(path)
+        with open(path, "w") as f:
+            f.write("#include <string>\n\nint f() {\n    return 1;\n}\n")
+        analyses = analyzer.analyze_file(path)
+        
+        self.assertFalse(analyses[0].reused)
+        self.assertEqual(self.agent.validate_code.call_count, 2)
+        code, language = self.agent.validate_code.call_args.args
+        self.assertIn("#include <string>", code)
+        self.assertEqual(language, "cpp")
+    
+    def test_python_validation_compiles_file(self):
+        """Test that Python files are validated by compiling them as a whole."""
+        analyzer = IncrementalAnalyzer(self.agent, "validate")
+        self.write("def f():\n    return 1\n")
+        valid = analyzer.analyze_file(self.path)
+        # Parses, but does not compile
+        self.write("def f():\n    break\n")
+        invalid = analyzer.analyze_file(self.path)
+        
+        self.assertEqual([(a.name, a.result) for a in valid], [("<file>", True)])
+        self.assertEqual([(a.name, a.result) for a in invalid], [("<file>", False)])
+        self.assertIn("'break' outside loop", invalid[0].error)
+        self.agent.validate_code.assert_not_called()
+    
+    def test_store_persists(self):
+        """Test that results survive a restart through the cache file."""
+        cache_file = os.path.join(self.tmpdir.name, "cache.json")
+        self.write("def f():\n    return 1\n")
+        store = UnitResultStore(cache_file)
+        IncrementalAnalyzer(self.agent, "explain", store).analyze_file(self.path)
+        store.save()
+        
+        analyses = IncrementalAnalyzer(self.agent, "explain", UnitResultStore(cache_file)).analyze_file(self.path)
+        self.assertTrue(analyses[0].reused)
+        self.assertEqual(self.agent.explain_code.call_count, 1)
+    
+    def test_unsupported_files_are_skipped(self):
+        """Test that files of other languages are not analyzed."""
+        path = os.path.join(self.tmpdir.name, "notes.txt")
+        with open(path, "w") as f:
+            f.write("text")
+        self.assertIsNone(IncrementalAnalyzer(self.agent).analyze_file(path))
+    
+    def test_unparseable_file_is_reported_invalid(self):
+        """Test that a file with a syntax error is reported rather than skipped."""
+        self.write("def f(:\n    return 1\n")
+        analyses = IncrementalAnalyzer(self.agent).analyze_file(self.path)
+        
+        self.assertEqual(len(analyses), 1)
+        self.assertEqual(analyses[0].name, "<file>")
+        self.assertIs(analyses[0].result, False)
+        self.assertIn("syntax error", analyses[0].error)
+        self.agent.validate_code.assert_not_called()
+    
+    def test_watch_directory_initial_scan(self):
+        """Test that the first scan analyzes every source file once."""
+        self.write("def f():\n    return 1\n")
+        stop = threading.Event()
+        results = []
+        
+        def on_result(path, analyses):
+            results.append((path, [a.name for a in analyses]))
+            stop.set()
+        
+        watch_directory(self.tmpdir.name, IncrementalAnalyzer(self.agent), on_result, 0.01, stop)
+        self.assertEqual(results, [(self.path, ["<file>"])])
+    
+    def test_watch_directory_survives_failed_analysis(self):
+        """Test that a failing model call is reported and watching continues."""
+        self.write("def f():\n    return 1\n")
+        with open(os.path.join(self.tmpdir.name, "other.py"), "w") as f:
+            f.write("def g():\n    return 2\n")
+        self.agent.explain_code.side_effect = [RuntimeError("out of memory"), "explains g"]
+        stop = threading.Event()
+        results = {}
+        
+        def on_result(path, analyses):
+            results[os.path.basename(path)] = [(a.name, a.result, a.error) for a in analyses]
+            if len(results) == 2:
+                stop.set()
+        
+        watch_directory(self.tmpdir.name, IncrementalAnalyzer(self.agent, "explain"), on_result, 0.01, stop)
+        self.assertEqual(results["module.py"], [("<file>", None, "analysis failed: out of memory")])
+        self.assertEqual(results["other.py"], [("g", "explains g", None)])
+
+
+if __name__ == '__main__':
+    unittest.main()